@@ -14,10 +14,25 @@ class handler(BaseHTTPRequestHandler):
             post_data = self.rfile.read(content_length)
             data = json.loads(post_data.decode('utf-8'))
             
+            from deadline import Deadline, decode_continuation
+            
+            # A continuation token from a previous response carries the remaining rows
+            if data.get('continuationToken'):
+                try:
+                    data = dict(decode_continuation(data['continuationToken']), timeBudget=data.get('timeBudget'))
+                except ValueError as e:
+                    self.send_response(400)
+                    self.send_header('Content-type', 'application/json')
+                    self.send_header('Access-Control-Allow-Origin', '*')
+                    self.end_headers()
+                    self.wfile.write(json.dumps({'error': str(e), 'success': False}).encode())
+                    return
+            
             # Extract parameters
             selected_rows = data.get('selectedRows', [])
             sheet_id = data.get('sheetId')
             gid = data.get('gid')
+            deadline = Deadline(data.get('timeBudget'))
             
             if not selected_rows:
                 self.send_response(400)
@@ -31,7 +46,7 @@ class handler(BaseHTTPRequestHandler):
             # Import here to avoid cold start issues
             from sheets_api import detect_ai_and_write_to_sheet
             
-            result = detect_ai_and_write_to_sheet(selected_rows, sheet_id, gid)
+            result = detect_ai_and_write_to_sheet(selected_rows, sheet_id, gid, deadline=deadline)
             
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
@@ -14,6 +14,23 @@ class handler(BaseHTTPRequestHandler):
             post_data = self.rfile.read(content_length)
             data = json.loads(post_data.decode('utf-8'))
             
+            # Import here to avoid cold start issues
+            from sheets_api import analyze_within_deadline
+            from deadline import decode_continuation
+            from calibration import group_from_request
+            
+            # A continuation token from a previous response carries the remaining work
+            if data.get('continuationToken'):
+                try:
+                    data = dict(decode_continuation(data['continuationToken']), timeBudget=data.get('timeBudget'))
+                except ValueError as e:
+                    self.send_response(400)
+                    self.send_header('Content-type', 'application/json')
+                    self.send_header('Access-Control-Allow-Origin', '*')
+                    self.end_headers()
+                    self.wfile.write(json.dumps({'error': str(e), 'success': False}).encode())
+                    return
+            
             # Extract parameters
             selected_rows = data.get('selectedRows', [])
             client = data.get('client')
@@ -21,17 +38,21 @@ class handler(BaseHTTPRequestHandler):
             supporting_references = data.get('supportingReferences', '')
             sheet_id = data.get('sheetId')
             gid = data.get('gid')
+            time_budget = data.get('timeBudget')
+            scoring_mode = data.get('scoringMode')
             
-            # Import here to avoid cold start issues
-            from sheets_api import analyze_and_write_to_sheet
-            
-            result = analyze_and_write_to_sheet(
+            # Stop starting new LLM work before the function's execution limit
+            result = analyze_within_deadline(
                 selected_rows,
                 client,
                 job_description,
                 supporting_references,
                 sheet_id,
-                gid
+                gid,
+                time_budget=time_budget,
+                scoring_mode=scoring_mode,
+                # Batches of one selection, and continued requests, share a calibration group
+                calibration_group=group_from_request(data)
             )
             
             self.send_response(200)
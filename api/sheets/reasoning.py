@@ -0,0 +1,59 @@
+from http.server import BaseHTTPRequestHandler
+import json
+import sys
+import os
+from urllib.parse import urlparse, parse_qs
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+class handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        try:
+            # Parse query parameters
+            parsed_url = urlparse(self.path)
+            params = parse_qs(parsed_url.query)
+            row_number = params.get('row', [None])[0]
+            sheet_id = params.get('sheetId', [None])[0]
+            gid = params.get('gid', [None])[0]
+            client = params.get('client', [None])[0]
+            refresh = params.get('refresh', [''])[0].lower() in ('1', 'true', 'yes')
+            
+            if not row_number or not row_number.isdigit():
+                self.send_response(400)
+                self.send_header('Content-type', 'application/json')
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.end_headers()
+                self.wfile.write(json.dumps({'error': 'row is required'}).encode())
+                return
+            
+            # Import here to avoid cold start issues
+            from reasoning import get_detailed_reasoning
+            
+            response = get_detailed_reasoning(int(row_number), client, sheet_id, gid, refresh=refresh)
+            
+            self.send_response(404 if 'error' in response else 200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            
+            self.wfile.write(json.dumps(response).encode())
+            
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            
+            self.send_response(500)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            
+            response = {'error': str(e)}
+            self.wfile.write(json.dumps(response).encode())
+    
+    def do_OPTIONS(self):
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.end_headers()
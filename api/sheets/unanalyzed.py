@@ -15,11 +15,12 @@ class handler(BaseHTTPRequestHandler):
             params = parse_qs(parsed_url.query)
             sheet_id = params.get('sheetId', [None])[0]
             gid = params.get('gid', [None])[0]
+            client = params.get('client', [None])[0]
             
             # Import here to avoid cold start issues
             from sheets_api import get_unanalyzed_applications
             
-            applications = get_unanalyzed_applications(sheet_id, gid)
+            applications = get_unanalyzed_applications(sheet_id, gid, client)
             
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
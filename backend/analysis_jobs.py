@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Asynchronous analysis jobs for the Flask backend.
+Submitting a job returns a job id immediately; a bounded worker pool scores the
+selected rows in chunks (each chunk runs the normal analyze_and_write_to_sheet
+pipeline) while clients poll for progress, per-row results and failures.
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import calibration
+from batch_controller import request_batch
+
+# Worker pool size and rows per chunk (one chunk = one analyze_and_write_to_sheet call).
+# Without ANALYSIS_JOB_CHUNK_SIZE the adaptive per-request batch size is used.
+ANALYSIS_JOB_WORKERS = int(os.getenv('ANALYSIS_JOB_WORKERS', '4'))
+ANALYSIS_JOB_CHUNK_SIZE = int(os.getenv('ANALYSIS_JOB_CHUNK_SIZE', '0'))
+
+# Finished jobs are kept this long for polling, then dropped
+JOB_RETENTION_SECONDS = 3600
+
+_executor = ThreadPoolExecutor(max_workers=ANALYSIS_JOB_WORKERS, thread_name_prefix='analysis-job')
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def _job_view(job):
+    """Public (JSON-serialisable) view of a job - call with _jobs_lock held"""
+    total = job['total_rows']
+    return {
+        'job_id': job['job_id'],
+        'status': job['status'],
+        'client': job['client'],
+        'created_at': job['created_at'],
+        'finished_at': job['finished_at'],
+        'total_rows': total,
+        'processed_rows': job['processed_rows'],
+        'progress': round(100.0 * job['processed_rows'] / total, 1) if total else 100.0,
+        'chunks_total': job['chunks_total'],
+        'chunks_done': job['chunks_done'],
+        'analyzed_count': len(job['results']),
+        'failed_count': len(job['failed']),
+        'results': list(job['results']),
+        'failed': list(job['failed'])
+    }
+
+
+def _finish_chunk(job, chunk_rows):
+    """Account for a finished (or cancelled) chunk - call with _jobs_lock held"""
+    job['chunks_done'] += 1
+    job['processed_rows'] += len(chunk_rows)
+    if job['chunks_done'] >= job['chunks_total']:
+        job['status'] = 'cancelled' if job['cancel_requested'] else 'completed'
+        job['finished_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        job['finished_monotonic'] = time.monotonic()
+        print(f"🏁 Job {job['job_id']} {job['status']}: {len(job['results'])} analyzed, {len(job['failed'])} failed")
+
+
+def _cancelled_rows(chunk_rows):
+    return [{'row': row_num, 'name': '', 'error': 'Cancelled before analysis started'} for row_num in chunk_rows]
+
+
+def _run_chunk(job_id, chunk_rows):
+    """Worker: score one chunk of rows and merge its per-row outcome into the job"""
+    from sheets_api import analyze_and_write_to_sheet
+
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return
+        if job['cancel_requested']:
+            job['failed'].extend(_cancelled_rows(chunk_rows))
+            _finish_chunk(job, chunk_rows)
+            return
+        job['status'] = 'running'
+        params = job['params']
+
+    print(f"⚙️  Job {job_id}: analyzing rows {chunk_rows}")
+    try:
+        result = analyze_and_write_to_sheet(
+            chunk_rows,
+            params['client'],
+            params['job_description'],
+            params['supporting_references'],
+            params['sheet_id'],
+            params['gid'],
+            calibration_group=params['calibration']
+        )
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        result = {'error': str(e)}
+
+    with _jobs_lock:
+        if 'error' in result:
+            job['failed'].extend({'row': row_num, 'name': '', 'error': result['error']} for row_num in chunk_rows)
+        else:
+            job['results'].extend(result.get('results', []))
+            job['failed'].extend(result.get('failed', []))
+        _finish_chunk(job, chunk_rows)
+
+
+def _prune_finished_jobs():
+    now = time.monotonic()
+    with _jobs_lock:
+        expired = [
+            job_id for job_id, job in _jobs.items()
+            if job['finished_monotonic'] is not None and now - job['finished_monotonic'] > JOB_RETENTION_SECONDS
+        ]
+        for job_id in expired:
+            del _jobs[job_id]
+
+
+def submit_analysis_job(selected_rows, client, job_description, supporting_references='', sheet_id=None, gid=None, chunk_size=None):
+    """Queue an analysis job and return its initial status (including job_id) immediately"""
+    _prune_finished_jobs()
+
+    chunk_size = max(1, int(chunk_size or ANALYSIS_JOB_CHUNK_SIZE or request_batch.recommended()))
+    chunks = [selected_rows[i:i + chunk_size] for i in range(0, len(selected_rows), chunk_size)]
+    job_id = uuid.uuid4().hex
+
+    job = {
+        'job_id': job_id,
+        'status': 'queued',
+        'client': client,
+        'params': {
+            'client': client,
+            'job_description': job_description,
+            'supporting_references': supporting_references,
+            'sheet_id': sheet_id,
+            'gid': gid,
+            # Chunks of one job are calibrated onto the same anchors
+            'calibration': calibration.new_group(job_id, selected_rows[:calibration.CALIBRATION_ANCHOR_CANDIDATES]) if len(chunks) > 1 else None
+        },
+        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'finished_at': None,
+        'finished_monotonic': None,
+        'total_rows': len(selected_rows),
+        'processed_rows': 0,
+        'chunks_total': len(chunks),
+        'chunks_done': 0,
+        'results': [],
+        'failed': [],
+        'cancel_requested': False,
+        'pending': []  # [(chunk_rows, future)]
+    }
+
+    with _jobs_lock:
+        _jobs[job_id] = job
+        for chunk_rows in chunks:
+            job['pending'].append((chunk_rows, _executor.submit(_run_chunk, job_id, chunk_rows)))
+        if not chunks:
+            job['status'] = 'completed'
+            job['finished_monotonic'] = time.monotonic()
+        view = _job_view(job)
+
+    print(f"📥 Job {job_id} queued: {len(selected_rows)} rows in {len(chunks)} chunk(s) of up to {chunk_size}")
+    return view
+
+
+def get_job(job_id):
+    """Return the current status of a job, or None if unknown"""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return _job_view(job) if job else None
+
+
+def list_jobs():
+    """Return a summary of all known jobs (without per-row details)"""
+    with _jobs_lock:
+        summaries = []
+        for job in _jobs.values():
+            view = _job_view(job)
+            view.pop('results')
+            view.pop('failed')
+            summaries.append(view)
+        return summaries
+
+
+def cancel_job(job_id):
+    """
+    Cancel a job: chunks that haven't started are dropped and reported as cancelled.
+    Chunks already being analyzed finish normally (their LLM calls are already paid for).
+    Returns the job status, or None if unknown.
+    """
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        if job['finished_monotonic'] is None:
+            job['cancel_requested'] = True
+            for chunk_rows, future in job['pending']:
+                if future.cancel():
+                    job['failed'].extend(_cancelled_rows(chunk_rows))
+                    _finish_chunk(job, chunk_rows)
+            if job['status'] != 'cancelled' and job['finished_monotonic'] is None:
+                job['status'] = 'cancelling'
+        return _job_view(job)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Exact-duplicate detection for application answers.
+Duplicate form submissions and copy-pasted answers are common, so before scoring the
+answer fields of each application are normalized (Unicode, case, quotes, whitespace)
+and hashed. Applications with the same hash are scored once - only the first of them
+(the representative) is sent to the model - and the others get a copy of its scores,
+with the reason noting which row they duplicate.
+"""
+
+import copy
+import hashlib
+import os
+import re
+import unicodedata
+
+ANSWER_DEDUPE = os.getenv('ANSWER_DEDUPE', 'true').lower() in ('1', 'true', 'yes')
+
+# Everything the scoring prompt asks the model to judge (columns K-Q)
+ANSWER_FIELDS = (
+    'right_to_work', 'visa_sponsorship', 'gcse_maths', 'available_sept_2026',
+    'understanding_of_role', 'why_edf', 'what_stands_out'
+)
+
+# The free-text answers - applications with all of these blank are never grouped
+FREE_TEXT_FIELDS = ('understanding_of_role', 'why_edf', 'what_stands_out')
+
+_QUOTES = str.maketrans({'‘': "'", '’': "'", '“': '"', '”': '"', '–': '-', '—': '-'})
+
+
+def normalize_answer(text):
+    """Lower-cased NFKC text with typographic quotes/dashes and whitespace runs flattened"""
+    text = unicodedata.normalize('NFKC', str(text or '')).translate(_QUOTES).lower()
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def answer_hash(app):
+    """sha256 of the normalized answer fields, or None if the free-text answers are all blank"""
+    if not any(normalize_answer(app.get(field)) for field in FREE_TEXT_FIELDS):
+        return None
+    joined = '\x1f'.join(normalize_answer(app.get(field)) for field in ANSWER_FIELDS)
+    return hashlib.sha256(joined.encode('utf-8')).hexdigest()
+
+
+def group_duplicates(applications):
+    """
+    Split `applications` into representatives and duplicates.
+    Returns (representatives, duplicate_of) - duplicate_of maps a duplicate's row number
+    (str) to its representative's row number (str). With ANSWER_DEDUPE off, nothing is grouped.
+    """
+    if not ANSWER_DEDUPE:
+        return list(applications), {}
+    first_row_by_hash = {}
+    representatives = []
+    duplicate_of = {}
+    for app in applications:
+        key = answer_hash(app)
+        if key is not None and key in first_row_by_hash:
+            duplicate_of[str(app['row_number'])] = first_row_by_hash[key]
+            continue
+        if key is not None:
+            first_row_by_hash[key] = str(app['row_number'])
+        representatives.append(app)
+    return representatives, duplicate_of
+
+
+def expand_analysis(analysis_text, raw_scores_by_row, duplicate_of):
+    """
+    Add a score line (and raw scores) for every duplicate, copied from its representative.
+    Duplicates whose representative has no score line are left out, so they are reported
+    as failed rows like the representative. Returns (analysis_text, raw_scores_by_row).
+    """
+    if not duplicate_of:
+        return analysis_text, raw_scores_by_row
+    lines_by_row = {}
+    for line in analysis_text.split('\n') if analysis_text else []:
+        row_match = re.search(r'Row\s+(\d+)', line)
+        if row_match and 'Overall Score' in line:
+            lines_by_row.setdefault(row_match.group(1), line)
+    lines = [analysis_text] if analysis_text else []
+    for row_num, source_row in duplicate_of.items():
+        line = lines_by_row.get(source_row)
+        if line is None:
+            continue
+        line = re.sub(r'Row\s+\d+', f'Row {row_num}', line, count=1).rstrip()
+        lines.append(f"{line} (same answers as row {source_row})")
+        if source_row in raw_scores_by_row:
+            raw_scores_by_row[row_num] = copy.deepcopy(raw_scores_by_row[source_row])
+    return '\n'.join(lines), raw_scores_by_row
+
+
+def summarize(applications, duplicate_of):
+    """Dedupe block for API responses"""
+    return {
+        'unique_answer_sets': len(applications) - len(duplicate_of),
+        'reused_rows': len(duplicate_of),
+        'duplicate_of': {row: int(source) for row, source in duplicate_of.items()}
+    }
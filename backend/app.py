@@ -1,10 +1,10 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
-from openai import OpenAI
-import os
 import json
 import re
 from dotenv import load_dotenv
+from llm_gateway import chat_completion, get_stats
+from prompt_encoding import encode_records, encoding_note
 
 # Load environment variables
 load_dotenv()
@@ -12,9 +12,6 @@ load_dotenv()
 app = Flask(__name__)
 CORS(app)  # Enable CORS for React frontend
 
-# Initialize OpenAI client
-openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-
 def average_analysis_scores(analyses, user_count):
     """
     Average scores from multiple analysis runs.
@@ -137,57 +134,43 @@ def average_analysis_scores(analyses, user_count):
     
     return '\n'.join(result_lines)
 
-@app.route('/analyze', methods=['POST'])
-def analyze_csv():
+def build_csv_analysis_messages(client, job_description, supporting_references, csv_data, user_count):
+    """Chat messages for scoring all CSV candidates in one prompt against the client's criteria"""
+    # Load client criteria
+    client_criteria = None
     try:
-        data = request.json
-        
-        # Extract data from request
-        client = data.get('client')
-        job_description = data.get('jobDescription')
-        supporting_references = data.get('supportingReferences', '')
-        csv_data = data.get('csvData')
-        user_count = data.get('userCount')
-        
-        if not all([client, job_description, csv_data, user_count]):
-            return jsonify({'error': 'Missing required fields'}), 400
-        
-        # Create analysis prompt with ALL candidates
-        # Load client criteria
-        client_criteria = None
-        try:
-            with open('../ultils/clients.json', 'r') as f:
-                clients_data = json.load(f)
-                for c in clients_data['clients']:
-                    if c['name'] == client:
-                        client_criteria = c.get('Criteria', {})
-                        break
-        except Exception as e:
-            print(f"Warning: Could not load client criteria: {e}")
+        with open('../ultils/clients.json', 'r') as f:
+            clients_data = json.load(f)
+            for c in clients_data['clients']:
+                if c['name'] == client:
+                    client_criteria = c.get('Criteria', {})
+                    break
+    except Exception as e:
+        print(f"Warning: Could not load client criteria: {e}")
 
-        # Build criteria string for all questions
-        criteria_text = ""
-        if isinstance(client_criteria, dict):
-            for question_num, criteria in client_criteria.items():
-                criteria_text += f"\n{question_num}:\n{criteria}\n"
-        else:
-            criteria_text = client_criteria if client_criteria else 'No specific criteria provided'
+    # Build criteria string for all questions
+    criteria_text = ""
+    if isinstance(client_criteria, dict):
+        for question_num, criteria in client_criteria.items():
+            criteria_text += f"\n{question_num}:\n{criteria}\n"
+    else:
+        criteria_text = client_criteria if client_criteria else 'No specific criteria provided'
 
-        # Determine number of questions based on client
-        num_questions = 7 if "Graduate" in client else 3
-        max_score = 15 if num_questions == 7 else 15  # For 7-question format, only 3 questions are scored (Q4, Q6, Q7)
-        
-        # Add supporting references if provided
-        supporting_text = f"\n\nSupporting References:\n{supporting_references}" if supporting_references else ""
-        
-        prompt = f"""Analyze the following job applications for {client}:
+    # Determine number of questions based on client
+    num_questions = 7 if "Graduate" in client else 3
+    max_score = 15 if num_questions == 7 else 15  # For 7-question format, only 3 questions are scored (Q4, Q6, Q7)
+    
+    # Add supporting references if provided
+    supporting_text = f"\n\nSupporting References:\n{supporting_references}" if supporting_references else ""
+    
+    prompt = f"""Analyze the following job applications for {client}:
 
         Job Description: {job_description}{supporting_text}
 
         Number of Applications: {user_count}
 
-        ALL Applications Data:
-        {json.dumps(csv_data, indent=2)}
+        ALL Applications Data {encoding_note()}:
+        {encode_records(csv_data)}
 
         Client Scoring Criteria ({num_questions} Questions):
         {criteria_text}
@@ -221,17 +204,56 @@ def analyze_csv():
         
         Add a short summary of the analysis at the end for each user - keep within one line"""
 
+    return [
+        {"role": "system", "content": "You are an early careers recruiter. CRITICAL: Use decimal scores with EXACTLY 2 decimal places (e.g., 3.75*, 4.25*, 12.50/15). Write brief reasons that are professional but simple - natural flow, NO question number mentions (don't say Q1, Q4, Q6, etc). Every candidate analysis must be completely unique - no templates, no copy-paste phrases. Keep brief reasons SHORT - 1-2 sentences max (20-30 words)."},
+        {"role": "user", "content": prompt}
+    ]
+
+def save_candidates_file(client, job_description, user_count, csv_data, analysis):
+    """Create/refresh ultils/candidates.json with all candidates and the analysis"""
+    candidates_data = {
+        'client': client,
+        'jobDescription': job_description,
+        'totalCandidates': user_count,
+        'candidates': csv_data,
+        'analysis': analysis,
+        'timestamp': json.dumps({'timestamp': '2025-01-17T14:00:00Z'})
+    }
+    
+    # Write to ultils/candidates.json (refresh on each run)
+    candidates_file_path = '../ultils/candidates.json'
+    try:
+        with open(candidates_file_path, 'w') as f:
+            json.dump(candidates_data, f, indent=2)
+    except Exception as e:
+        print(f"Warning: Could not write candidates.json: {e}")
+
+@app.route('/analyze', methods=['POST'])
+def analyze_csv():
+    try:
+        data = request.json
+        
+        # Extract data from request
+        client = data.get('client')
+        job_description = data.get('jobDescription')
+        supporting_references = data.get('supportingReferences', '')
+        csv_data = data.get('csvData')
+        user_count = data.get('userCount')
+        
+        if not all([client, job_description, csv_data, user_count]):
+            return jsonify({'error': 'Missing required fields'}), 400
+        
+        messages = build_csv_analysis_messages(client, job_description, supporting_references, csv_data, user_count)
+
         # Call OpenAI API 3 times and average the scores for consistency
         print(f"\n🔄 Running 3 analysis passes for {user_count} candidates to ensure scoring consistency...")
         analyses = []
         for run_num in range(1, 4):
             print(f"  📊 Analysis run {run_num}/3...")
-            response = openai_client.chat.completions.create(
+            response = chat_completion(
+                purpose='consensus_scoring',
                 model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You are an early careers recruiter. CRITICAL: Use decimal scores with EXACTLY 2 decimal places (e.g., 3.75*, 4.25*, 12.50/15). Write brief reasons that are professional but simple - natural flow, NO question number mentions (don't say Q1, Q4, Q6, etc). Every candidate analysis must be completely unique - no templates, no copy-paste phrases. Keep brief reasons SHORT - 1-2 sentences max (20-30 words)."},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=messages,
                 max_tokens=4000,
                 temperature=0,
                 top_p=1
@@ -242,23 +264,7 @@ def analyze_csv():
         # Average the scores from all 3 runs, keep text from first run
         analysis = average_analysis_scores(analyses, user_count)
         
-        # Create/refresh candidates.json with all candidates
-        candidates_data = {
-            'client': client,
-            'jobDescription': job_description,
-            'totalCandidates': user_count,
-            'candidates': csv_data,
-            'analysis': analysis,
-            'timestamp': json.dumps({'timestamp': '2025-01-17T14:00:00Z'})
-        }
-        
-        # Write to ultils/candidates.json (refresh on each run)
-        candidates_file_path = '../ultils/candidates.json'
-        try:
-            with open(candidates_file_path, 'w') as f:
-                json.dump(candidates_data, f, indent=2)
-        except Exception as e:
-            print(f"Warning: Could not write candidates.json: {e}")
+        save_candidates_file(client, job_description, user_count, csv_data, analysis)
         
         return jsonify({
             'success': True,
@@ -280,8 +286,9 @@ def get_unanalyzed():
         from sheets_api import get_unanalyzed_applications
         sheet_id = request.args.get('sheetId')
         gid = request.args.get('gid')
-        print(f"Fetching unanalyzed applications from sheetId={sheet_id}, gid={gid}")
-        applications = get_unanalyzed_applications(sheet_id, gid)
+        client = request.args.get('client')
+        print(f"Fetching unanalyzed applications from sheetId={sheet_id}, gid={gid}, client={client}")
+        applications = get_unanalyzed_applications(sheet_id, gid, client)
         return jsonify({
             'success': True,
             'count': len(applications),
@@ -318,6 +325,7 @@ def analyze_sheets():
     """Analyze selected applications and write back to Google Sheets"""
     try:
         from sheets_api import analyze_and_write_to_sheet
+        from calibration import group_from_request
         
         data = request.json
         selected_rows = data.get('selectedRows', [])
@@ -326,12 +334,14 @@ def analyze_sheets():
         supporting_references = data.get('supportingReferences', '')
         sheet_id = data.get('sheetId')
         gid = data.get('gid')
+        scoring_mode = data.get('scoringMode')
         
         if not all([selected_rows, client, job_description]):
             return jsonify({'error': 'Missing required fields'}), 400
         
         print(f"Analyzing applications for sheetId={sheet_id}, gid={gid}")
-        result = analyze_and_write_to_sheet(selected_rows, client, job_description, supporting_references, sheet_id, gid)
+        # Frontend batches of one selection share a calibration group
+        result = analyze_and_write_to_sheet(selected_rows, client, job_description, supporting_references, sheet_id, gid, scoring_mode=scoring_mode, calibration_group=group_from_request(data))
         
         if 'error' in result:
             return jsonify(result), 500
@@ -344,6 +354,239 @@ def analyze_sheets():
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/sheets/analyze/stream', methods=['POST'])
+def analyze_sheets_stream():
+    """Analyze selected applications, pushing a Server-Sent Event per candidate as it is scored"""
+    from sheets_api import stream_analyze_and_write_to_sheet
+    from calibration import group_from_request
+    
+    data = request.json
+    selected_rows = data.get('selectedRows', [])
+    client = data.get('client')
+    job_description = data.get('jobDescription')
+    supporting_references = data.get('supportingReferences', '')
+    sheet_id = data.get('sheetId')
+    gid = data.get('gid')
+    scoring_mode = data.get('scoringMode')
+    calibration_group = group_from_request(data)
+    
+    if not all([selected_rows, client, job_description]):
+        return jsonify({'error': 'Missing required fields'}), 400
+    
+    def generate():
+        try:
+            for event, payload in stream_analyze_and_write_to_sheet(selected_rows, client, job_description, supporting_references, sheet_id, gid, scoring_mode=scoring_mode, calibration_group=calibration_group):
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        except Exception as e:
+            print(f"Error streaming analysis: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+    
+    print(f"Streaming analysis for sheetId={sheet_id}, gid={gid}")
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/sheets/reasoning', methods=['GET'])
+def get_row_reasoning():
+    """Detailed reasoning for an analyzed row - generated on first request, then cached"""
+    row_number = request.args.get('row', type=int)
+    if not row_number:
+        return jsonify({'error': 'row is required'}), 400
+    try:
+        from reasoning import get_detailed_reasoning
+        sheet_id = request.args.get('sheetId')
+        gid = request.args.get('gid')
+        client = request.args.get('client')
+        refresh = request.args.get('refresh', '').lower() in ('1', 'true', 'yes')
+        
+        result = get_detailed_reasoning(row_number, client, sheet_id, gid, refresh=refresh)
+        if 'error' in result:
+            return jsonify(result), 404
+        return jsonify(result), 200
+    except Exception as e:
+        print(f"Error getting reasoning for row {row_number}: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/sheets/batch-size', methods=['GET'])
+def get_batch_size():
+    """Adaptive batch sizes - how many candidates clients should send per analyze request"""
+    from batch_controller import get_recommendation
+    return jsonify({'success': True, **get_recommendation()}), 200
+
+@app.route('/sheets/jobs', methods=['POST'])
+def submit_analysis_job():
+    """Queue selected applications for background analysis and return a job id immediately"""
+    try:
+        from analysis_jobs import submit_analysis_job as submit_job
+        
+        data = request.json
+        selected_rows = data.get('selectedRows', [])
+        client = data.get('client')
+        job_description = data.get('jobDescription')
+        supporting_references = data.get('supportingReferences', '')
+        sheet_id = data.get('sheetId')
+        gid = data.get('gid')
+        chunk_size = data.get('chunkSize')
+        
+        if not all([selected_rows, client, job_description]):
+            return jsonify({'error': 'Missing required fields'}), 400
+        
+        job = submit_job(selected_rows, client, job_description, supporting_references, sheet_id, gid, chunk_size)
+        return jsonify({'success': True, 'job': job}), 202
+        
+    except Exception as e:
+        print(f"Error submitting analysis job: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/sheets/jobs', methods=['GET'])
+def list_analysis_jobs():
+    """List all known analysis jobs with their progress"""
+    from analysis_jobs import list_jobs
+    return jsonify({'success': True, 'jobs': list_jobs()}), 200
+
+@app.route('/sheets/jobs/<job_id>', methods=['GET'])
+def get_analysis_job(job_id):
+    """Get progress, per-row results and failures for an analysis job"""
+    from analysis_jobs import get_job
+    job = get_job(job_id)
+    if not job:
+        return jsonify({'error': f'Job "{job_id}" not found'}), 404
+    return jsonify({'success': True, 'job': job}), 200
+
+@app.route('/sheets/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_analysis_job(job_id):
+    """Cancel an analysis job - chunks not yet started are skipped"""
+    from analysis_jobs import cancel_job
+    job = cancel_job(job_id)
+    if not job:
+        return jsonify({'error': f'Job "{job_id}" not found'}), 404
+    return jsonify({'success': True, 'job': job}), 200
+
+@app.route('/sheets/queue', methods=['POST'])
+def enqueue_analysis():
+    """Queue selected applications on the durable task queue for queue_worker.py processes"""
+    try:
+        from task_queue import enqueue_analysis as enqueue
+        
+        data = request.json
+        selected_rows = data.get('selectedRows', [])
+        client = data.get('client')
+        job_description = data.get('jobDescription')
+        supporting_references = data.get('supportingReferences', '')
+        sheet_id = data.get('sheetId')
+        gid = data.get('gid')
+        batch_size = data.get('batchSize')
+        
+        if not all([selected_rows, client, job_description]):
+            return jsonify({'error': 'Missing required fields'}), 400
+        
+        batch = enqueue(selected_rows, client, job_description, supporting_references, sheet_id, gid, batch_size)
+        return jsonify({'success': True, **batch}), 202
+        
+    except Exception as e:
+        print(f"Error queueing analysis: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/sheets/queue/<batch_id>', methods=['GET'])
+def get_queued_analysis(batch_id):
+    """Get task counts and per-row results for a queued batch"""
+    from task_queue import batch_status
+    batch = batch_status(batch_id)
+    if not batch:
+        return jsonify({'error': f'Batch "{batch_id}" not found'}), 404
+    return jsonify({'success': True, 'batch': batch}), 200
+
+@app.route('/sheets/bulk', methods=['POST'])
+def submit_bulk_analysis():
+    """Submit selected applications for offline scoring through the OpenAI Batch API"""
+    try:
+        from bulk_scoring import submit_bulk_run
+        
+        data = request.json
+        selected_rows = data.get('selectedRows', [])
+        client = data.get('client')
+        job_description = data.get('jobDescription')
+        supporting_references = data.get('supportingReferences', '')
+        sheet_id = data.get('sheetId')
+        gid = data.get('gid')
+        chunk_size = data.get('chunkSize')
+        
+        if not all([selected_rows, client, job_description]):
+            return jsonify({'error': 'Missing required fields'}), 400
+        
+        result = submit_bulk_run(selected_rows, client, job_description, supporting_references, sheet_id, gid, chunk_size)
+        return jsonify(result), 202
+        
+    except Exception as e:
+        print(f"Error submitting bulk analysis: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/sheets/bulk/<run_id>', methods=['GET'])
+def poll_bulk_analysis(run_id):
+    """Check a bulk run - once its batch has finished, results are written to the sheet"""
+    try:
+        from bulk_scoring import poll_bulk_run
+        
+        result = poll_bulk_run(run_id)
+        if 'error' in result:
+            return jsonify(result), 404
+        return jsonify(result), 200
+        
+    except Exception as e:
+        print(f"Error polling bulk analysis: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/sheets/runs', methods=['GET'])
+def list_analysis_runs():
+    """List recent journaled analysis runs with per-state row counts"""
+    import run_journal
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify({'success': True, 'runs': run_journal.list_runs(limit)}), 200
+
+@app.route('/sheets/runs/<run_id>', methods=['GET'])
+def get_analysis_run(run_id):
+    """Get a journaled analysis run including the state of every row"""
+    import run_journal
+    run = run_journal.get_run(run_id)
+    if not run:
+        return jsonify({'error': f'Run "{run_id}" not found'}), 404
+    run['row_states'] = [
+        {'row': r['row_number'], 'state': r['state'], 'score': r['score'], 'error': r['error']}
+        for r in run_journal.get_rows(run_id)
+    ]
+    return jsonify({'success': True, 'run': run}), 200
+
+@app.route('/sheets/runs/<run_id>/resume', methods=['POST'])
+def resume_analysis_run(run_id):
+    """Finish an interrupted analysis run, re-executing only the rows that didn't complete"""
+    try:
+        from sheets_api import resume_analysis_run as resume_run
+        
+        result = resume_run(run_id)
+        if 'error' in result:
+            return jsonify(result), 404
+        return jsonify(result), 200
+        
+    except Exception as e:
+        print(f"Error resuming analysis run: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/sheets/ai-detection', methods=['POST'])
 def detect_ai_sheets():
     """Run AI detection on selected analyzed applications and write AI % to Google Sheets"""
@@ -442,6 +685,11 @@ def delete_client():
 def health():
     return jsonify({'status': 'OK'})
 
+@app.route('/llm/stats', methods=['GET'])
+def llm_stats():
+    """Get LLM gateway rate limits, queue length and per-purpose latency/token usage"""
+    return jsonify(get_stats())
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
 
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+ASGI entry point serving the same routes as app.py with async handlers.
+Run with: uvicorn asgi:app --port 5000
+
+Under Flask every in-flight analysis holds a worker for the whole LLM round-trip.
+Here the event loop keeps serving while requests wait: /analyze, the clients list,
+health and stats are native coroutines (async_io / llm_gateway.async_chat_completion),
+and the sheet pipeline routes - which are built on gspread and the threaded scoring
+code - are awaited in a thread pool of ASGI_THREADS threads, so a slow analysis only
+occupies a pool thread, never the loop.
+"""
+
+import asyncio
+import json
+import os
+import traceback
+from contextlib import asynccontextmanager
+
+import anyio.to_thread
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+import async_io
+from app import average_analysis_scores, build_csv_analysis_messages, save_candidates_file
+from llm_gateway import async_chat_completion, get_stats
+
+load_dotenv()
+
+# Threads for the routes whose work is still blocking (gspread, the scoring pipeline)
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', '40'))
+
+
+def _json(payload, status_code=200):
+    return JSONResponse(payload, status_code=status_code)
+
+
+def _server_error(context, e):
+    print(f"{context}: {str(e)}")
+    traceback.print_exc()
+    return _json({'error': str(e)}, 500)
+
+
+async def _body(request):
+    try:
+        return await request.json() or {}
+    except ValueError:
+        return {}
+
+
+def _analysis_fields(data):
+    return (
+        data.get('selectedRows', []),
+        data.get('client'),
+        data.get('jobDescription'),
+        data.get('supportingReferences', ''),
+        data.get('sheetId'),
+        data.get('gid')
+    )
+
+
+async def analyze_csv(request):
+    """The three consensus passes run concurrently instead of one after another"""
+    try:
+        data = await _body(request)
+        client = data.get('client')
+        job_description = data.get('jobDescription')
+        supporting_references = data.get('supportingReferences', '')
+        csv_data = data.get('csvData')
+        user_count = data.get('userCount')
+
+        if not all([client, job_description, csv_data, user_count]):
+            return _json({'error': 'Missing required fields'}, 400)
+
+        messages = build_csv_analysis_messages(client, job_description, supporting_references, csv_data, user_count)
+        print(f"\n🔄 Running 3 analysis passes for {user_count} candidates to ensure scoring consistency...")
+        responses = await asyncio.gather(*(
+            async_chat_completion(
+                purpose='consensus_scoring',
+                model="gpt-4o-mini",
+                messages=messages,
+                max_tokens=4000,
+                temperature=0,
+                top_p=1
+            )
+            for _ in range(3)
+        ))
+        print("  ✅ Averaging scores from 3 runs...")
+        analysis = average_analysis_scores([response.choices[0].message.content for response in responses], user_count)
+        await run_in_threadpool(save_candidates_file, client, job_description, user_count, csv_data, analysis)
+
+        return _json({
+            'success': True,
+            'analysis': analysis,
+            'userCount': user_count,
+            'client': client
+        })
+    except Exception as e:
+        return _server_error("Error in analyze_csv", e)
+
+
+async def get_unanalyzed(request):
+    try:
+        from sheets_api import get_unanalyzed_applications
+        sheet_id = request.query_params.get('sheetId')
+        gid = request.query_params.get('gid')
+        client = request.query_params.get('client')
+        print(f"Fetching unanalyzed applications from sheetId={sheet_id}, gid={gid}, client={client}")
+        applications = await run_in_threadpool(get_unanalyzed_applications, sheet_id, gid, client)
+        return _json({'success': True, 'count': len(applications), 'applications': applications})
+    except Exception as e:
+        return _server_error("Error getting unanalyzed applications", e)
+
+
+async def get_analyzed(request):
+    try:
+        from sheets_api import get_analyzed_applications
+        sheet_id = request.query_params.get('sheetId')
+        gid = request.query_params.get('gid')
+        print(f"Fetching analyzed applications from sheetId={sheet_id}, gid={gid}")
+        applications = await run_in_threadpool(get_analyzed_applications, sheet_id, gid)
+        return _json({'success': True, 'count': len(applications), 'applications': applications})
+    except Exception as e:
+        return _server_error("Error getting analyzed applications", e)
+
+
+async def analyze_sheets(request):
+    try:
+        from sheets_api import analyze_and_write_to_sheet
+        from calibration import group_from_request
+        data = await _body(request)
+        selected_rows, client, job_description, supporting_references, sheet_id, gid = _analysis_fields(data)
+        if not all([selected_rows, client, job_description]):
+            return _json({'error': 'Missing required fields'}, 400)
+
+        print(f"Analyzing applications for sheetId={sheet_id}, gid={gid}")
+        result = await run_in_threadpool(
+            analyze_and_write_to_sheet, selected_rows, client, job_description, supporting_references, sheet_id, gid,
+            scoring_mode=data.get('scoringMode'), calibration_group=group_from_request(data)
+        )
+        return _json(result, 500 if 'error' in result else 200)
+    except Exception as e:
+        return _server_error("Error analyzing applications", e)
+
+
+async def analyze_sheets_stream(request):
+    from sheets_api import stream_analyze_and_write_to_sheet
+    from calibration import group_from_request
+    data = await _body(request)
+    selected_rows, client, job_description, supporting_references, sheet_id, gid = _analysis_fields(data)
+    if not all([selected_rows, client, job_description]):
+        return _json({'error': 'Missing required fields'}, 400)
+
+    # A plain generator - Starlette pulls each event from it in the thread pool
+    def generate():
+        try:
+            for event, payload in stream_analyze_and_write_to_sheet(selected_rows, client, job_description, supporting_references, sheet_id, gid, scoring_mode=data.get('scoringMode'), calibration_group=group_from_request(data)):
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        except Exception as e:
+            print(f"Error streaming analysis: {str(e)}")
+            traceback.print_exc()
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+
+    print(f"Streaming analysis for sheetId={sheet_id}, gid={gid}")
+    return StreamingResponse(generate(), media_type='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+async def get_row_reasoning(request):
+    try:
+        row_number = int(request.query_params.get('row', ''))
+    except ValueError:
+        row_number = None
+    if not row_number:
+        return _json({'error': 'row is required'}, 400)
+    try:
+        from reasoning import get_detailed_reasoning
+        params = request.query_params
+        refresh = params.get('refresh', '').lower() in ('1', 'true', 'yes')
+        result = await run_in_threadpool(get_detailed_reasoning, row_number, params.get('client'), params.get('sheetId'), params.get('gid'), refresh=refresh)
+        return _json(result, 404 if 'error' in result else 200)
+    except Exception as e:
+        return _server_error(f"Error getting reasoning for row {row_number}", e)
+
+
+async def get_batch_size(request):
+    from batch_controller import get_recommendation
+    return _json({'success': True, **get_recommendation()})
+
+
+async def submit_analysis_job(request):
+    try:
+        from analysis_jobs import submit_analysis_job as submit_job
+        data = await _body(request)
+        selected_rows, client, job_description, supporting_references, sheet_id, gid = _analysis_fields(data)
+        if not all([selected_rows, client, job_description]):
+            return _json({'error': 'Missing required fields'}, 400)
+        job = await run_in_threadpool(submit_job, selected_rows, client, job_description, supporting_references, sheet_id, gid, data.get('chunkSize'))
+        return _json({'success': True, 'job': job}, 202)
+    except Exception as e:
+        return _server_error("Error submitting analysis job", e)
+
+
+async def list_analysis_jobs(request):
+    from analysis_jobs import list_jobs
+    return _json({'success': True, 'jobs': list_jobs()})
+
+
+async def get_analysis_job(request):
+    from analysis_jobs import get_job
+    job_id = request.path_params['job_id']
+    job = get_job(job_id)
+    if not job:
+        return _json({'error': f'Job "{job_id}" not found'}, 404)
+    return _json({'success': True, 'job': job})
+
+
+async def cancel_analysis_job(request):
+    from analysis_jobs import cancel_job
+    job_id = request.path_params['job_id']
+    job = cancel_job(job_id)
+    if not job:
+        return _json({'error': f'Job "{job_id}" not found'}, 404)
+    return _json({'success': True, 'job': job})
+
+
+async def enqueue_analysis(request):
+    try:
+        from task_queue import enqueue_analysis as enqueue
+        data = await _body(request)
+        selected_rows, client, job_description, supporting_references, sheet_id, gid = _analysis_fields(data)
+        if not all([selected_rows, client, job_description]):
+            return _json({'error': 'Missing required fields'}, 400)
+        batch = await run_in_threadpool(enqueue, selected_rows, client, job_description, supporting_references, sheet_id, gid, data.get('batchSize'))
+        return _json({'success': True, **batch}, 202)
+    except Exception as e:
+        return _server_error("Error queueing analysis", e)
+
+
+async def get_queued_analysis(request):
+    from task_queue import batch_status
+    batch_id = request.path_params['batch_id']
+    batch = await run_in_threadpool(batch_status, batch_id)
+    if not batch:
+        return _json({'error': f'Batch "{batch_id}" not found'}, 404)
+    return _json({'success': True, 'batch': batch})
+
+
+async def submit_bulk_analysis(request):
+    try:
+        from bulk_scoring import submit_bulk_run
+        data = await _body(request)
+        selected_rows, client, job_description, supporting_references, sheet_id, gid = _analysis_fields(data)
+        if not all([selected_rows, client, job_description]):
+            return _json({'error': 'Missing required fields'}, 400)
+        result = await run_in_threadpool(submit_bulk_run, selected_rows, client, job_description, supporting_references, sheet_id, gid, data.get('chunkSize'))
+        return _json(result, 202)
+    except Exception as e:
+        return _server_error("Error submitting bulk analysis", e)
+
+
+async def poll_bulk_analysis(request):
+    try:
+        from bulk_scoring import poll_bulk_run
+        result = await run_in_threadpool(poll_bulk_run, request.path_params['run_id'])
+        return _json(result, 404 if 'error' in result else 200)
+    except Exception as e:
+        return _server_error("Error polling bulk analysis", e)
+
+
+async def list_analysis_runs(request):
+    import run_journal
+    try:
+        limit = int(request.query_params.get('limit', 50))
+    except ValueError:
+        limit = 50
+    return _json({'success': True, 'runs': await run_in_threadpool(run_journal.list_runs, limit)})
+
+
+async def get_analysis_run(request):
+    import run_journal
+    run_id = request.path_params['run_id']
+
+    def load():
+        run = run_journal.get_run(run_id)
+        if run:
+            run['row_states'] = [
+                {'row': r['row_number'], 'state': r['state'], 'score': r['score'], 'error': r['error']}
+                for r in run_journal.get_rows(run_id)
+            ]
+        return run
+
+    run = await run_in_threadpool(load)
+    if not run:
+        return _json({'error': f'Run "{run_id}" not found'}, 404)
+    return _json({'success': True, 'run': run})
+
+
+async def resume_analysis_run(request):
+    try:
+        from sheets_api import resume_analysis_run as resume_run
+        result = await run_in_threadpool(resume_run, request.path_params['run_id'])
+        return _json(result, 404 if 'error' in result else 200)
+    except Exception as e:
+        return _server_error("Error resuming analysis run", e)
+
+
+async def detect_ai_sheets(request):
+    try:
+        from sheets_api import detect_ai_and_write_to_sheet
+        data = await _body(request)
+        selected_rows = data.get('selectedRows', [])
+        sheet_id = data.get('sheetId')
+        gid = data.get('gid')
+        if not selected_rows:
+            return _json({'error': 'No rows selected'}, 400)
+
+        print(f"Running AI detection for sheetId={sheet_id}, gid={gid}, rows={selected_rows}")
+        result = await run_in_threadpool(detect_ai_and_write_to_sheet, selected_rows, sheet_id, gid)
+        return _json(result, 500 if 'error' in result else 200)
+    except Exception as e:
+        return _server_error("Error running AI detection", e)
+
+
+async def get_clients(request):
+    try:
+        clients = await async_io.load_clients(request.query_params.get('sheetId'))
+        return _json({'success': True, 'clients': clients})
+    except Exception as e:
+        return _server_error("Error getting clients", e)
+
+
+async def add_client(request):
+    try:
+        from sheets_api import add_client_to_sheet
+        data = await _body(request)
+        client_name = data.get('clientName')
+        if not client_name:
+            return _json({'error': 'Client name is required'}, 400)
+        result = await run_in_threadpool(add_client_to_sheet, client_name, data.get('criteria', {}), data.get('sheetId'))
+        return _json(result, 500 if 'error' in result else 200)
+    except Exception as e:
+        return _server_error("Error adding client", e)
+
+
+async def delete_client(request):
+    try:
+        from sheets_api import delete_client_from_sheet
+        data = await _body(request)
+        client_name = data.get('clientName')
+        if not client_name:
+            return _json({'error': 'Client name is required'}, 400)
+        result = await run_in_threadpool(delete_client_from_sheet, client_name, data.get('sheetId'))
+        return _json(result, 500 if 'error' in result else 200)
+    except Exception as e:
+        return _server_error("Error deleting client", e)
+
+
+async def health(request):
+    return _json({'status': 'OK'})
+
+
+async def llm_stats(request):
+    return _json(get_stats())
+
+
+@asynccontextmanager
+async def lifespan(app):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = ASGI_THREADS
+    yield
+    await async_io.close_clients()
+
+
+routes = [
+    Route('/analyze', analyze_csv, methods=['POST']),
+    Route('/sheets/unanalyzed', get_unanalyzed, methods=['GET']),
+    Route('/sheets/analyzed', get_analyzed, methods=['GET']),
+    Route('/sheets/analyze', analyze_sheets, methods=['POST']),
+    Route('/sheets/analyze/stream', analyze_sheets_stream, methods=['POST']),
+    Route('/sheets/reasoning', get_row_reasoning, methods=['GET']),
+    Route('/sheets/batch-size', get_batch_size, methods=['GET']),
+    Route('/sheets/jobs', submit_analysis_job, methods=['POST']),
+    Route('/sheets/jobs', list_analysis_jobs, methods=['GET']),
+    Route('/sheets/jobs/{job_id}', get_analysis_job, methods=['GET']),
+    Route('/sheets/jobs/{job_id}/cancel', cancel_analysis_job, methods=['POST']),
+    Route('/sheets/queue', enqueue_analysis, methods=['POST']),
+    Route('/sheets/queue/{batch_id}', get_queued_analysis, methods=['GET']),
+    Route('/sheets/bulk', submit_bulk_analysis, methods=['POST']),
+    Route('/sheets/bulk/{run_id}', poll_bulk_analysis, methods=['GET']),
+    Route('/sheets/runs', list_analysis_runs, methods=['GET']),
+    Route('/sheets/runs/{run_id}', get_analysis_run, methods=['GET']),
+    Route('/sheets/runs/{run_id}/resume', resume_analysis_run, methods=['POST']),
+    Route('/sheets/ai-detection', detect_ai_sheets, methods=['POST']),
+    Route('/clients', get_clients, methods=['GET']),
+    Route('/clients', add_client, methods=['POST']),
+    Route('/clients', delete_client, methods=['DELETE']),
+    Route('/health', health, methods=['GET']),
+    Route('/llm/stats', llm_stats, methods=['GET']),
+]
+
+app = Starlette(
+    routes=routes,
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan
+)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, port=5000)
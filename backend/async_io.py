@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Asyncio versions of the core Sheets and OpenAI operations.
+sheets_api does its I/O through gspread and the blocking OpenAI client, so concurrency
+there means threads that mostly sit waiting. The coroutines here talk to the Sheets
+REST API through a shared httpx.AsyncClient and to OpenAI through
+llm_gateway.async_chat_completion(), so one process can keep many reads, writes and
+scoring calls in flight on a single event loop. The gateway's rate limiter, circuit
+breaker and stats apply to these calls exactly as to the threaded ones.
+
+Each coroutine has a *_sync wrapper for callers that aren't running an event loop.
+"""
+
+import asyncio
+import json
+import random
+import threading
+import time
+import weakref
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+import httpx
+from google.auth.transport.requests import Request
+
+import sheets_api
+import field_budget
+from batch_controller import call_batch
+from llm_gateway import async_chat_completion, close_async_client, shared_ssl_context, LLM_MAX_CONNECTIONS, LLM_MAX_KEEPALIVE_CONNECTIONS, LLM_KEEPALIVE_EXPIRY
+
+SHEETS_API_BASE = 'https://sheets.googleapis.com/v4/spreadsheets'
+SHEETS_TIMEOUT = 60.0
+SHEETS_MAX_RETRIES = 3
+
+# Refresh the access token this long before it expires
+TOKEN_REFRESH_MARGIN = 300
+
+_credentials = None
+_credentials_lock = threading.Lock()
+
+# httpx.AsyncClient is bound to the event loop it was created on, so there is one per loop
+_http_clients = weakref.WeakKeyDictionary()
+
+
+def _fresh_token():
+    """The cached access token, or None if there isn't one that is good for a while yet"""
+    creds = _credentials
+    if creds is None or not creds.token or creds.expiry is None:
+        return None
+    # google-auth keeps expiry as a naive UTC datetime
+    remaining = (creds.expiry - datetime.now(timezone.utc).replace(tzinfo=None)).total_seconds()
+    return creds.token if remaining > TOKEN_REFRESH_MARGIN else None
+
+
+def _refresh_token():
+    """Load the service account credentials if needed and refresh the access token (blocking)"""
+    global _credentials
+    with _credentials_lock:
+        token = _fresh_token()
+        if token:
+            return token
+        if _credentials is None:
+            _credentials = sheets_api.load_credentials()
+        _credentials.refresh(Request())
+        return _credentials.token
+
+
+def warm_credentials():
+    """Load the service account and fetch an access token now rather than on the first request"""
+    return _fresh_token() or _refresh_token()
+
+
+def reset_after_fork():
+    """New lock and HTTP clients for a forked worker - the access token itself stays valid"""
+    global _credentials_lock, _http_clients
+    _credentials_lock = threading.Lock()
+    _http_clients = weakref.WeakKeyDictionary()
+
+
+def _http_client():
+    loop = asyncio.get_running_loop()
+    client = _http_clients.get(loop)
+    if client is None:
+        client = _http_clients[loop] = httpx.AsyncClient(
+            verify=shared_ssl_context(),
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+            ),
+            timeout=SHEETS_TIMEOUT
+        )
+    return client
+
+
+async def _sheets_request(method, path, **kwargs):
+    """Authenticated Sheets API request; 429 and 5xx responses are retried with backoff"""
+    for attempt in range(SHEETS_MAX_RETRIES + 1):
+        # Refreshing the token is a blocking HTTP call, so it runs off the event loop
+        token = _fresh_token() or await asyncio.to_thread(_refresh_token)
+        response = await _http_client().request(
+            method, f"{SHEETS_API_BASE}/{path}", headers={'Authorization': f'Bearer {token}'}, **kwargs
+        )
+        if response.status_code == 429 or response.status_code >= 500:
+            if attempt < SHEETS_MAX_RETRIES:
+                delay = min(30.0, 2 ** attempt) * random.uniform(0.5, 1.0)
+                print(f"  🔁 Sheets {method} {path.split('/')[0][:12]}...: HTTP {response.status_code}, retry {attempt + 1}/{SHEETS_MAX_RETRIES} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+        response.raise_for_status()
+        return response.json()
+
+
+def _a1(title, cell_range=None):
+    """A1 notation with the sheet title quoted, e.g. 'Form Responses'!V5:AE5"""
+    quoted = "'" + title.replace("'", "''") + "'"
+    return f"{quoted}!{cell_range}" if cell_range else quoted
+
+
+async def worksheet_title(sheet_id=None, gid=None):
+    """Title of the worksheet with `gid`, or of the first worksheet (same rule as sheets_api.get_worksheet)"""
+    spreadsheet_id = sheet_id or sheets_api.DEFAULT_SPREADSHEET_ID
+    metadata = await _sheets_request('GET', spreadsheet_id, params={'fields': 'sheets.properties(sheetId,title,index)'})
+    sheets = sorted((s['properties'] for s in metadata.get('sheets', [])), key=lambda p: p.get('index', 0))
+    if gid:
+        for properties in sheets:
+            if str(properties.get('sheetId')) == str(gid):
+                return properties['title']
+        print(f"Warning: Worksheet with gid={gid} not found, using first sheet")
+    return sheets[0]['title']
+
+
+async def read_values(sheet_id=None, a1_range=None):
+    """Values of one A1 range, rows padded to the same width like gspread's get_all_values()"""
+    spreadsheet_id = sheet_id or sheets_api.DEFAULT_SPREADSHEET_ID
+    data = await _sheets_request('GET', f"{spreadsheet_id}/values/{quote(a1_range, safe='')}")
+    rows = data.get('values', [])
+    width = max((len(row) for row in rows), default=0)
+    return [row + [''] * (width - len(row)) for row in rows]
+
+
+async def read_snapshot(sheet_id=None, gid=None):
+    """All values of the worksheet (header row first) - the async get_all_values()"""
+    title = await worksheet_title(sheet_id, gid)
+    return await read_values(sheet_id, _a1(title))
+
+
+async def batch_write(updates, sheet_id=None, gid=None):
+    """
+    Write several ranges of the worksheet in one request. `updates` is a list of
+    {'range': 'V5:AE5', 'values': [[...]]}, as for gspread's Worksheet.batch_update();
+    values are USER_ENTERED so formulas work. Returns the number of cells updated.
+    """
+    if not updates:
+        return 0
+    spreadsheet_id = sheet_id or sheets_api.DEFAULT_SPREADSHEET_ID
+    title = await worksheet_title(sheet_id, gid)
+    result = await _sheets_request('POST', f"{spreadsheet_id}/values:batchUpdate", json={
+        'valueInputOption': 'USER_ENTERED',
+        'data': [{'range': _a1(title, update['range']), 'values': update['values']} for update in updates]
+    })
+    return result.get('totalUpdatedCells', 0)
+
+
+async def load_clients(sheet_id=None):
+    """Every client on the Clients tab with its criteria - the async get_clients_list()"""
+    try:
+        try:
+            all_values = await read_values(sheet_id, _a1('Clients'))
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 400:
+                raise
+            print("'Clients' tab not found, falling back to JSON")
+            try:
+                with open('../ultils/clients.json', 'r') as f:
+                    return [c['name'] for c in json.load(f)['clients']]
+            except Exception:
+                return []
+        if len(all_values) < 2:
+            return []
+
+        headers = all_values[0]
+        return [
+            {'name': row[0], 'criteria': {header: row[i] for i, header in enumerate(headers[1:], start=1) if i < len(row) and row[i]}}
+            for row in all_values[1:] if row and row[0]
+        ]
+    except Exception as e:
+        print(f"Error getting clients list: {e}")
+        return []
+
+
+async def load_client_criteria(client_name, sheet_id=None):
+    """Client criteria from the Clients tab - the async get_client_criteria_from_sheet()"""
+    try:
+        try:
+            all_values = await read_values(sheet_id, _a1('Clients'))
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 400:
+                raise
+            print("Warning: 'Clients' tab not found, falling back to JSON")
+            return sheets_api.get_client_criteria_from_json(client_name)
+        if not all_values:
+            return None
+
+        headers = all_values[0]
+        for row in all_values[1:]:
+            if row[0] == client_name:
+                return {header: row[i] for i, header in enumerate(headers[1:], start=1) if i < len(row) and row[i]}
+
+        print(f"Warning: Client '{client_name}' not found in Clients tab")
+        return None
+    except Exception as e:
+        print(f"Error reading from Clients sheet: {e}")
+        return sheets_api.get_client_criteria_from_json(client_name)
+
+
+async def score_call(applications, build_messages, depth=0):
+    """
+    One scoring call, with the same recovery as sheets_api.run_scoring_pass(): a cut-off
+    completion or missing rows are re-requested in halves (concurrently) down to
+    sheets_api.MAX_BISECT_DEPTH. Returns the analysis text.
+    """
+    started = time.monotonic()
+    response = await async_chat_completion(
+        purpose='consensus_scoring',
+        model="gpt-4o-mini",
+        messages=build_messages(applications),
+        max_tokens=4000,
+        temperature=0,
+        top_p=1
+    )
+    choice = response.choices[0]
+    text = choice.message.content or ''
+    truncated = choice.finish_reason == 'length'
+    call_batch.record(len(applications), time.monotonic() - started, truncated=truncated)
+    if truncated:
+        text = text.rsplit('\n', 1)[0] if '\n' in text else ''
+
+    found_rows = sheets_api.rows_in_analysis(text)
+    missing = [app for app in applications if str(app['row_number']) not in found_rows]
+    if not missing:
+        return text
+    if len(applications) == 1 or depth >= sheets_api.MAX_BISECT_DEPTH:
+        print(f"  ⚠️  Giving up on rows {[app['row_number'] for app in missing]} after {depth} re-request level(s)")
+        return text
+
+    mid = (len(missing) + 1) // 2
+    halves = [half for half in (missing[:mid], missing[mid:]) if half]
+    results = await asyncio.gather(*(score_call(half, build_messages, depth + 1) for half in halves), return_exceptions=True)
+    texts = [text]
+    for half, result in zip(halves, results):
+        if isinstance(result, Exception):
+            print(f"  ❌ Re-request for rows {[app['row_number'] for app in half]} failed: {result}")
+        else:
+            texts.append(result)
+    return '\n'.join(texts)
+
+
+async def score_applications(applications, client, job_description, supporting_references='', client_criteria=None):
+    """
+    One scoring pass over `applications` with every call in flight at once. Calls are
+    split by the adaptive call batch size, and outliers (field_budget.is_outlier) get a
+    call of their own, as in sheets_api.run_batched_scoring_pass(). Criteria are loaded
+    from the Clients tab when not given. Returns the analysis text.
+    """
+    if client_criteria is None:
+        client_criteria = await load_client_criteria(client)
+
+    def build_messages(apps):
+        return sheets_api.build_scoring_messages(apps, client, job_description, supporting_references, client_criteria)
+
+    outliers = [app for app in applications if field_budget.is_outlier(app)] if len(applications) > 1 else []
+    rest = [app for app in applications if app not in outliers]
+    size = call_batch.recommended()
+    batches = [[app] for app in outliers] + [rest[i:i + size] for i in range(0, len(rest), size)]
+    texts = await asyncio.gather(*(score_call(batch, build_messages) for batch in batches))
+    return '\n'.join(texts)
+
+
+async def close_clients():
+    """Close the running loop's Sheets and OpenAI HTTP clients"""
+    client = _http_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+    await close_async_client()
+
+
+async def _run_and_close(coroutine):
+    try:
+        return await coroutine
+    finally:
+        await close_clients()
+
+
+def run_sync(coroutine):
+    """
+    Run a coroutine to completion from synchronous code, on a loop of its own whose
+    clients are closed afterwards. Not for use inside a running event loop.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(_run_and_close(coroutine))
+    coroutine.close()
+    raise RuntimeError('run_sync() called from a running event loop - await the coroutine instead')
+
+
+def read_snapshot_sync(sheet_id=None, gid=None):
+    return run_sync(read_snapshot(sheet_id, gid))
+
+
+def batch_write_sync(updates, sheet_id=None, gid=None):
+    return run_sync(batch_write(updates, sheet_id, gid))
+
+
+def load_clients_sync(sheet_id=None):
+    return run_sync(load_clients(sheet_id))
+
+
+def load_client_criteria_sync(client_name, sheet_id=None):
+    return run_sync(load_client_criteria(client_name, sheet_id))
+
+
+def score_applications_sync(applications, client, job_description, supporting_references='', client_criteria=None):
+    return run_sync(score_applications(applications, client, job_description, supporting_references, client_criteria))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Adaptive batch sizing (AIMD) driven by observed latency.
+Two controllers are kept per process:
+  - call_batch: candidates per LLM scoring call
+  - request_batch: candidates per analyze request (what clients should send)
+Each successful batch that finishes comfortably inside its target adds one candidate;
+a timeout, truncated output or a batch over target halves the size. The sizes settle
+just under the timeout envelope and follow OpenAI as it gets faster or slower.
+"""
+
+import os
+import threading
+
+from llm_gateway import LLM_TIMEOUT
+
+BATCH_SIZE_INITIAL = int(os.getenv('BATCH_SIZE_INITIAL', '10'))
+BATCH_SIZE_MIN = int(os.getenv('BATCH_SIZE_MIN', '2'))
+BATCH_SIZE_MAX = int(os.getenv('BATCH_SIZE_MAX', '40'))
+
+# Latency each kind of batch should stay under. A scoring call should finish well
+# inside LLM_TIMEOUT; a request (3 passes + sheet writes) inside the serverless limit.
+BATCH_CALL_TARGET_SECONDS = float(os.getenv('BATCH_CALL_TARGET_SECONDS', str(LLM_TIMEOUT * 0.4)))
+BATCH_REQUEST_TARGET_SECONDS = float(os.getenv('BATCH_REQUEST_TARGET_SECONDS', '45'))
+
+# Only grow when a batch used less than this fraction of its target
+AIMD_HEADROOM = 0.75
+AIMD_DECREASE_FACTOR = 0.5
+
+
+class AIMDController:
+    """Additive-increase / multiplicative-decrease batch size"""
+
+    def __init__(self, name, target_seconds, initial=BATCH_SIZE_INITIAL, minimum=BATCH_SIZE_MIN, maximum=BATCH_SIZE_MAX):
+        self.name = name
+        self.target_seconds = target_seconds
+        self.minimum = minimum
+        self.maximum = maximum
+        self._size = float(max(minimum, min(maximum, initial)))
+        self._lock = threading.Lock()
+        self._last_event = None
+        self._observations = 0
+
+    def recommended(self):
+        with self._lock:
+            return int(self._size)
+
+    def record(self, batch_size, seconds, timed_out=False, truncated=False):
+        """Feed back the outcome of a batch of `batch_size` candidates that took `seconds`"""
+        if batch_size <= 0:
+            return
+        with self._lock:
+            self._observations += 1
+            if timed_out or truncated or seconds > self.target_seconds:
+                # Only shrink below the size that actually failed
+                self._size = max(self.minimum, min(self._size, batch_size) * AIMD_DECREASE_FACTOR)
+                self._last_event = 'timeout' if timed_out else 'truncated' if truncated else 'slow'
+            elif batch_size >= int(self._size) and seconds < self.target_seconds * AIMD_HEADROOM:
+                # Only grow when a full-size batch had headroom - small batches say little
+                self._size = min(self.maximum, self._size + 1)
+                self._last_event = 'increase'
+            else:
+                self._last_event = 'hold'
+            if self._last_event != 'hold':
+                print(f"📐 {self.name}: {self._last_event} after {batch_size} candidates in {seconds:.1f}s -> {int(self._size)}")
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'recommended': int(self._size),
+                'target_seconds': self.target_seconds,
+                'min': self.minimum,
+                'max': self.maximum,
+                'observations': self._observations,
+                'last_event': self._last_event
+            }
+
+
+call_batch = AIMDController('candidates per call', BATCH_CALL_TARGET_SECONDS)
+request_batch = AIMDController('candidates per request', BATCH_REQUEST_TARGET_SECONDS)
+
+
+def get_recommendation():
+    """Current recommended sizes, as exposed to clients"""
+    return {
+        'candidates_per_call': call_batch.recommended(),
+        'candidates_per_request': request_batch.recommended(),
+        'call': call_batch.snapshot(),
+        'request': request_batch.snapshot()
+    }
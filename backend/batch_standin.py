@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI Files + Batches endpoints, for testing bulk scoring
+without an API key or a 24h wait. Batches complete immediately; each scoring request
+gets a deterministic, well-formed score line per candidate.
+
+    python batch_standin.py                      # listens on :5055
+    OPENAI_BATCH_BASE_URL=http://localhost:5055/v1 python app.py
+"""
+
+import json
+import os
+import re
+import time
+import uuid
+
+from flask import Flask, request, jsonify, Response
+
+from prompt_encoding import decode_records
+
+standin = Flask(__name__)
+
+_files = {}    # {file_id: {'filename', 'purpose', 'data'}}
+_batches = {}  # {batch_id: batch object}
+
+
+def _file_object(file_id):
+    entry = _files[file_id]
+    return {
+        'id': file_id,
+        'object': 'file',
+        'bytes': len(entry['data']),
+        'created_at': entry['created_at'],
+        'filename': entry['filename'],
+        'purpose': entry['purpose'],
+        'status': 'processed'
+    }
+
+
+def fake_scoring_content(messages):
+    """Score lines in the format the prompt asks for, 3.00 for every scored question"""
+    prompt = '\n'.join(str(m.get('content', '')) for m in messages)
+    format_match = re.search(r'Overall Score \*\*\[X\.XX\]/(\d+)\*\* - (.*?) - \[brief reason\]', prompt)
+    max_score = int(format_match.group(1)) if format_match else 15
+    score_format = format_match.group(2) if format_match else 'Q1: [X.XX]* Q2: [X.XX]* Q3: [X.XX]*'
+    scored = len(re.findall(r'\[X\.XX\]', score_format))
+    question_scores = re.sub(r'\[X\.XX\]', '3.00', score_format)
+    question_scores = question_scores.replace('Yes/No', 'Yes')
+    rows = [record['Row'] for record in decode_records(prompt) if 'Row' in record]
+    return '\n'.join(
+        f"Row {row} - Overall Score **{3.0 * scored:.2f}/{max_score}** - {question_scores} - Stand-in score for row {row}."
+        for row in rows
+    )
+
+
+def _run_request(line):
+    record = json.loads(line)
+    body = record['body']
+    content = fake_scoring_content(body.get('messages', []))
+    return {
+        'id': f"batch_req_{uuid.uuid4().hex}",
+        'custom_id': record['custom_id'],
+        'response': {
+            'status_code': 200,
+            'request_id': uuid.uuid4().hex,
+            'body': {
+                'id': f"chatcmpl-{uuid.uuid4().hex}",
+                'object': 'chat.completion',
+                'model': body.get('model'),
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+                'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+            }
+        },
+        'error': None
+    }
+
+
+@standin.route('/v1/files', methods=['POST'])
+def create_file():
+    upload = request.files['file']
+    file_id = f"file-{uuid.uuid4().hex}"
+    _files[file_id] = {
+        'filename': upload.filename,
+        'purpose': request.form.get('purpose', 'batch'),
+        'data': upload.read(),
+        'created_at': int(time.time())
+    }
+    return jsonify(_file_object(file_id))
+
+
+@standin.route('/v1/files/<file_id>/content', methods=['GET'])
+def file_content(file_id):
+    if file_id not in _files:
+        return jsonify({'error': {'message': 'No such file'}}), 404
+    return Response(_files[file_id]['data'], mimetype='application/jsonl')
+
+
+@standin.route('/v1/batches', methods=['POST'])
+def create_batch():
+    data = request.json
+    input_file = _files.get(data['input_file_id'])
+    if input_file is None:
+        return jsonify({'error': {'message': 'No such file'}}), 404
+
+    lines = [line for line in input_file['data'].decode('utf-8').splitlines() if line.strip()]
+    output = '\n'.join(json.dumps(_run_request(line)) for line in lines)
+    output_id = f"file-{uuid.uuid4().hex}"
+    _files[output_id] = {'filename': 'output.jsonl', 'purpose': 'batch_output', 'data': output.encode('utf-8'), 'created_at': int(time.time())}
+
+    batch_id = f"batch_{uuid.uuid4().hex}"
+    _batches[batch_id] = {
+        'id': batch_id,
+        'object': 'batch',
+        'endpoint': data.get('endpoint'),
+        'input_file_id': data['input_file_id'],
+        'completion_window': data.get('completion_window', '24h'),
+        'status': 'completed',
+        'output_file_id': output_id,
+        'error_file_id': None,
+        'created_at': int(time.time()),
+        'completed_at': int(time.time()),
+        'request_counts': {'total': len(lines), 'completed': len(lines), 'failed': 0},
+        'metadata': data.get('metadata')
+    }
+    return jsonify(_batches[batch_id])
+
+
+@standin.route('/v1/batches/<batch_id>', methods=['GET'])
+def get_batch(batch_id):
+    if batch_id not in _batches:
+        return jsonify({'error': {'message': 'No such batch'}}), 404
+    return jsonify(_batches[batch_id])
+
+
+if __name__ == '__main__':
+    port = int(os.getenv('BATCH_STANDIN_PORT', 5055))
+    standin.run(host='127.0.0.1', port=port)
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Bulk (offline) scoring through the OpenAI Batch API.
+Every scoring call of a run (each chunk of rows x 3 consensus passes) is compiled into
+one JSONL file and submitted as a batch - half the price of interactive calls and no
+interactive rate limits. When the batch completes, each output is saved to the run
+journal as a scoring pass, and the normal analyze-and-write pipeline averages the
+passes and writes the rows (it restores journaled passes instead of calling the LLM).
+
+Set OPENAI_BATCH_BASE_URL to point at batch_standin.py for local testing.
+
+    python bulk_scoring.py <run_id>    # wait for a submitted run, then write results
+"""
+
+import io
+import json
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+from openai import OpenAI
+
+import answer_dedupe
+import eligibility
+import run_journal
+
+load_dotenv()
+
+BULK_CHUNK_SIZE = int(os.getenv('BULK_CHUNK_SIZE', '10'))
+BULK_POLL_SECONDS = float(os.getenv('BULK_POLL_SECONDS', '60'))
+OPENAI_BATCH_BASE_URL = os.getenv('OPENAI_BATCH_BASE_URL')
+BULK_PASSES = 3
+
+BATCH_TERMINAL_STATES = ('completed', 'failed', 'expired', 'cancelled')
+
+_batch_client = None
+
+
+def get_batch_client():
+    """Client for the Files/Batches endpoints (the real API, or the stand-in)"""
+    global _batch_client
+    if _batch_client is None:
+        if OPENAI_BATCH_BASE_URL:
+            _batch_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY') or 'standin', base_url=OPENAI_BATCH_BASE_URL)
+        else:
+            from llm_gateway import get_client
+            _batch_client = get_client()
+    return _batch_client
+
+
+def _custom_id(pass_key, pass_num):
+    return f"{pass_key}|{pass_num}"
+
+
+def _parse_custom_id(custom_id):
+    pass_key, pass_num = custom_id.rsplit('|', 1)
+    return pass_key, int(pass_num)
+
+
+def submit_bulk_run(selected_rows, client, job_description, supporting_references='', sheet_id=None, gid=None, chunk_size=None):
+    """Compile the scoring requests for the selected rows into a batch and submit it"""
+    from sheets_api import (
+        get_spreadsheet, get_worksheet, build_application_from_row,
+        get_client_criteria_from_sheet, build_scoring_messages
+    )
+
+    chunk_size = max(1, int(chunk_size or BULK_CHUNK_SIZE))
+    spreadsheet = get_spreadsheet(sheet_id)
+    worksheet = get_worksheet(spreadsheet, gid)
+    all_values = worksheet.get_all_values()
+    client_criteria = get_client_criteria_from_sheet(client, sheet_id)
+    local_eligibility = eligibility.uses_local_eligibility(client, client_criteria)
+
+    chunks = [selected_rows[i:i + chunk_size] for i in range(0, len(selected_rows), chunk_size)]
+    lines = []
+    for chunk in chunks:
+        applications = [build_application_from_row(all_values[row_num - 1], row_num, sheet_id) for row_num in chunk]
+        if local_eligibility:
+            # Same selection analyze_applications_ai makes, so the pass keys line up
+            results, skip_ineligible = eligibility.evaluate_applications(applications, client)
+            if skip_ineligible:
+                applications = [app for app in applications if results[str(app['row_number'])]['eligible']]
+        applications, _ = answer_dedupe.group_duplicates(applications)
+        if not applications:
+            continue
+        messages = build_scoring_messages(applications, client, job_description, supporting_references, client_criteria)
+        pass_key = run_journal.pass_key_for(app['row_number'] for app in applications)
+        for pass_num in range(1, BULK_PASSES + 1):
+            lines.append(json.dumps({
+                'custom_id': _custom_id(pass_key, pass_num),
+                'method': 'POST',
+                'url': '/v1/chat/completions',
+                'body': {
+                    'model': 'gpt-4o-mini',
+                    'messages': messages,
+                    'max_tokens': 4000,
+                    'temperature': 0,
+                    'top_p': 1
+                }
+            }))
+
+    run_id = run_journal.create_run({
+        'client': client,
+        'job_description': job_description,
+        'supporting_references': supporting_references,
+        'sheet_id': sheet_id,
+        'gid': gid,
+        'mode': 'bulk',
+        # The batch holds plain consensus passes; poll_bulk_run writes them back in this mode
+        'scoring_mode': 'consensus',
+        'chunks': chunks
+    }, selected_rows)
+
+    batch_client = get_batch_client()
+    input_file = batch_client.files.create(
+        file=(f'scoring-{run_id}.jsonl', io.BytesIO('\n'.join(lines).encode('utf-8'))),
+        purpose='batch'
+    )
+    batch = batch_client.batches.create(
+        input_file_id=input_file.id,
+        endpoint='/v1/chat/completions',
+        completion_window='24h',
+        metadata={'run_id': run_id}
+    )
+    run_journal.update_run_params(run_id, {'batch_id': batch.id})
+    run_journal.set_run_status(run_id, 'bulk_submitted')
+    print(f"📦 Bulk run {run_id}: submitted batch {batch.id} with {len(lines)} requests ({len(chunks)} chunk(s) x {BULK_PASSES} passes)")
+
+    return {
+        'success': True,
+        'run_id': run_id,
+        'batch_id': batch.id,
+        'requests': len(lines),
+        'chunks': len(chunks)
+    }
+
+
+def _save_batch_outputs(run_id, batch):
+    """Store every successful batch response as a journaled scoring pass. Returns (saved, errors)."""
+    batch_client = get_batch_client()
+    saved = 0
+    errors = []
+    if batch.output_file_id:
+        for line in batch_client.files.content(batch.output_file_id).text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get('response') or {}
+            if response.get('status_code') != 200:
+                errors.append({'custom_id': record.get('custom_id'), 'error': record.get('error') or response.get('status_code')})
+                continue
+            choice = response['body']['choices'][0]
+            text = choice['message'].get('content') or ''
+            if choice.get('finish_reason') == 'length':
+                # The last line was cut mid-way, so its scores can't be trusted
+                text = text.rsplit('\n', 1)[0] if '\n' in text else ''
+            pass_key, pass_num = _parse_custom_id(record['custom_id'])
+            run_journal.save_pass_output(run_id, pass_key, pass_num, text)
+            saved += 1
+    if batch.error_file_id:
+        for line in batch_client.files.content(batch.error_file_id).text.splitlines():
+            if line.strip():
+                record = json.loads(line)
+                errors.append({'custom_id': record.get('custom_id'), 'error': record.get('error')})
+    return saved, errors
+
+
+def poll_bulk_run(run_id):
+    """
+    Check a bulk run. Once its batch has finished, ingest the outputs and write the rows
+    through analyze_and_write_to_sheet (which reuses the journaled passes). Passes the
+    batch didn't return are scored interactively for just those chunks.
+    """
+    from sheets_api import analyze_and_write_to_sheet
+
+    run = run_journal.get_run(run_id)
+    if not run or run['params'].get('mode') != 'bulk':
+        return {'error': f'Bulk run "{run_id}" not found'}
+    params = run['params']
+    if run['status'] != 'bulk_submitted':
+        return {'success': True, 'run_id': run_id, 'status': run['status'], 'rows': run['rows']}
+
+    batch = get_batch_client().batches.retrieve(params['batch_id'])
+    counts = getattr(batch, 'request_counts', None)
+    request_counts = {
+        'total': getattr(counts, 'total', None),
+        'completed': getattr(counts, 'completed', None),
+        'failed': getattr(counts, 'failed', None)
+    }
+    if batch.status not in BATCH_TERMINAL_STATES:
+        return {'success': True, 'run_id': run_id, 'status': run['status'], 'batch_status': batch.status, 'request_counts': request_counts}
+
+    run_journal.set_run_status(run_id, 'running')
+    saved, batch_errors = _save_batch_outputs(run_id, batch)
+    print(f"📦 Bulk run {run_id}: batch {batch.status}, {saved} pass output(s) saved, {len(batch_errors)} error(s)")
+
+    results = []
+    failed_rows = []
+    for chunk in params['chunks']:
+        result = analyze_and_write_to_sheet(
+            chunk,
+            params['client'],
+            params['job_description'],
+            params.get('supporting_references', ''),
+            params.get('sheet_id'),
+            params.get('gid'),
+            run_id=run_id,
+            scoring_mode=params.get('scoring_mode', 'consensus'),
+            shard_size=0  # one shard per chunk, so the pass keys match the batch requests
+        )
+        results.extend(result.get('results', []))
+        failed_rows.extend(result.get('failed', []))
+    run_journal.set_run_status(run_id, 'completed')
+
+    return {
+        'success': True,
+        'run_id': run_id,
+        'status': 'completed',
+        'batch_status': batch.status,
+        'request_counts': request_counts,
+        'batch_errors': batch_errors,
+        'analyzed_count': len(results),
+        'failed_count': len(failed_rows),
+        'results': results,
+        'failed': failed_rows
+    }
+
+
+def wait_for_bulk_run(run_id, poll_seconds=BULK_POLL_SECONDS):
+    """Poll until the run's batch has finished and its rows are written"""
+    while True:
+        result = poll_bulk_run(run_id)
+        if 'error' in result or result.get('status') != 'bulk_submitted':
+            return result
+        print(f"⏳ Bulk run {run_id}: batch {result['batch_status']} {result['request_counts']}")
+        time.sleep(poll_seconds)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python bulk_scoring.py <run_id>")
+        sys.exit(1)
+    summary = wait_for_bulk_run(sys.argv[1])
+    print(json.dumps({k: v for k, v in summary.items() if k not in ('results', 'failed')}, indent=2))
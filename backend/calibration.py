@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Cross-batch score calibration for scoring passes split over several LLM calls.
+Each call only sees its own ~10 candidates, so the same answer can score a little
+higher in one call than another. When a pass is split, the first CALIBRATION_ANCHORS
+candidates are included in every call as anchors. Their scores across calls give, per
+call and question, a scale and offset mapping that call onto the pass-wide average
+(least squares over the anchors, offset only when the anchors don't spread enough),
+which is then applied to the other candidates of the call.
+
+A selection scored over several requests, runs or shards forms a calibration group
+(see new_group()): every call of every part carries the group's anchors, and the first
+call to score them fixes the reference, which is kept in the run journal. Calls too
+small to give 2 x CALIBRATION_ANCHORS rows are not anchored at all.
+
+The raw pass output - calls separated by BATCH_MARKER lines - is what gets journaled;
+calibrate_pass() turns it into one calibrated score line per candidate and returns the
+raw overall scores alongside, so both can be written.
+"""
+
+import os
+import re
+
+CALIBRATION_ANCHORS = int(os.getenv('CALIBRATION_ANCHORS', '2'))
+# Rows offered as a group's anchors - the first CALIBRATION_ANCHORS of them that get
+# scored (eligible, distinct answers, not outliers) are used
+CALIBRATION_ANCHOR_CANDIDATES = CALIBRATION_ANCHORS + 3
+
+BATCH_MARKER = '=== call batch ==='
+
+# Per-call scale is kept within these bounds; anchors with less spread than
+# MIN_ANCHOR_SPREAD (score points) only give an offset
+MIN_SCALE = 0.5
+MAX_SCALE = 2.0
+MIN_ANCHOR_SPREAD = 0.5
+
+QUESTION_SCORE_PATTERN = re.compile(r'(Q\d+):\s*(\d+(?:\.\d+)?)\*')
+OVERALL_SCORE_PATTERN = re.compile(r'(Overall Score[*\s]+)(\d+(?:\.\d+)?)(\s*/\s*\d+)')
+
+
+def new_group(key, anchor_rows):
+    """
+    Calibration group for a selection scored in several parts. `key` names the group's
+    reference in the run journal; `anchor_rows` are the candidate anchor rows, in order.
+    """
+    return {'key': str(key), 'anchor_rows': [int(row) for row in anchor_rows]}
+
+
+def group_from_request(data):
+    """The calibration group sent with an analyze request (calibrationKey, anchorRows), or None"""
+    if not data.get('calibrationKey'):
+        return None
+    return new_group(data['calibrationKey'], (data.get('anchorRows') or [])[:CALIBRATION_ANCHOR_CANDIDATES])
+
+
+def enabled_for(applications, call_size, anchors=None):
+    """
+    True if a pass over `applications` gets anchors: calls must have room for more
+    candidates than anchors, and the pass is split into several calls - or belongs to a
+    group (`anchors`) and has candidates besides them.
+    """
+    if CALIBRATION_ANCHORS <= 0 or call_size <= 2 * CALIBRATION_ANCHORS:
+        return False
+    if anchors:
+        anchor_rows = {str(app['row_number']) for app in anchors}
+        return any(str(app['row_number']) not in anchor_rows for app in applications)
+    return len(applications) > call_size and len(applications) > CALIBRATION_ANCHORS
+
+
+def anchored_batches(applications, call_size, anchors=None):
+    """
+    Split `applications` into calls of `call_size` that all start with the same anchors -
+    the group's `anchors`, or the first CALIBRATION_ANCHORS applications
+    """
+    anchors = list(anchors) if anchors else applications[:CALIBRATION_ANCHORS]
+    anchor_rows = {str(app['row_number']) for app in anchors}
+    rest = [app for app in applications if str(app['row_number']) not in anchor_rows]
+    size = max(1, call_size - len(anchors))
+    return [anchors + rest[i:i + size] for i in range(0, len(rest), size)]
+
+
+def anchor_lines(text, anchor_rows):
+    """{row_number (str): line} of the anchors in the first call of a pass that scored the most of them"""
+    anchor_rows = {str(row) for row in anchor_rows}
+    best = {}
+    for part in text.split(BATCH_MARKER):
+        lines = {row: line for row, line in _score_lines(part).items() if row in anchor_rows}
+        if len(lines) > len(best):
+            best = lines
+    return best
+
+
+def _score_lines(text):
+    """{row_number (str): line} for the score lines of one call"""
+    lines = {}
+    for line in text.split('\n'):
+        row_match = re.search(r'Row\s+(\d+)', line)
+        if row_match and 'Overall Score' in line:
+            lines.setdefault(row_match.group(1), line)
+    return lines
+
+
+def _question_scores(line):
+    return {question: float(score) for question, score in QUESTION_SCORE_PATTERN.findall(line)}
+
+
+def _overall_score(line):
+    match = OVERALL_SCORE_PATTERN.search(line)
+    return float(match.group(2)) if match else None
+
+
+def _fit(pairs):
+    """(scale, offset) mapping a call's anchor scores onto the reference scores"""
+    if not pairs:
+        return 1.0, 0.0
+    xs = [x for x, _ in pairs]
+    ys = [y for _, y in pairs]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    spread = sum((x - mean_x) ** 2 for x in xs)
+    scale = 1.0
+    if len(pairs) >= 2 and max(xs) - min(xs) >= MIN_ANCHOR_SPREAD:
+        scale = sum((x - mean_x) * (y - mean_y) for x, y in pairs) / spread
+        scale = max(MIN_SCALE, min(MAX_SCALE, scale))
+    return scale, mean_y - scale * mean_x
+
+
+def _rewrite(line, question_scores):
+    """`line` with new question scores; the overall score moves by the same total"""
+    old_scores = _question_scores(line)
+    shift = sum(question_scores[q] - old_scores[q] for q in question_scores if q in old_scores)
+    line = QUESTION_SCORE_PATTERN.sub(lambda m: f"{m.group(1)}: {question_scores.get(m.group(1), float(m.group(2))):.2f}*", line)
+    overall = _overall_score(line)
+    if overall is not None:
+        line = OVERALL_SCORE_PATTERN.sub(lambda m: f"{m.group(1)}{overall + shift:.2f}{m.group(3)}", line, count=1)
+    return line
+
+
+def calibrate_pass(text, reference_lines=None, keep_rows=None):
+    """
+    Calibrate a split pass. Returns (text, raw_overall_by_row, summary) - text has one
+    line per candidate (anchors at their average across calls), raw_overall_by_row the
+    uncalibrated overall scores. Text without BATCH_MARKER lines is returned unchanged
+    with ({}, None).
+    With `reference_lines` ({row: line}, a group's fixed reference) the calls are mapped
+    onto those anchor scores instead, and the anchors get their reference lines.
+    With `keep_rows`, lines for other rows (anchors borrowed from elsewhere) are dropped.
+    """
+    if BATCH_MARKER not in text:
+        return text, {}, None
+    batches = [_score_lines(part) for part in text.split(BATCH_MARKER)]
+    batches = [batch for batch in batches if batch]
+
+    if reference_lines:
+        anchor_rows = list(reference_lines)
+        reference = {row: _question_scores(line) for row, line in reference_lines.items()}
+    else:
+        # Anchors are the rows scored in more than one call; their reference is the average
+        seen = {}
+        for batch in batches:
+            for row in batch:
+                seen[row] = seen.get(row, 0) + 1
+        anchor_rows = [row for row, count in seen.items() if count > 1]
+        reference = {}
+        for row in anchor_rows:
+            scores = [_question_scores(batch[row]) for batch in batches if row in batch]
+            reference[row] = {
+                q: sum(s[q] for s in scores if q in s) / sum(1 for s in scores if q in s)
+                for q in set().union(*scores)
+            }
+
+    lines = []
+    raw_overall_by_row = {}
+    shifts = []
+    written = set()
+    for batch in batches:
+        questions = set()
+        for row in batch:
+            questions.update(_question_scores(batch[row]))
+        params = {
+            q: _fit([(_question_scores(batch[row])[q], reference[row][q]) for row in anchor_rows
+                     if row in batch and q in _question_scores(batch[row]) and q in reference[row]])
+            for q in questions
+        }
+        for row, line in batch.items():
+            if row in written:
+                continue
+            written.add(row)
+            if keep_rows is not None and row not in keep_rows:
+                continue
+            if reference_lines and row in reference_lines:
+                new_line = reference_lines[row]
+                raw = _overall_score(new_line)
+            elif row in reference:
+                anchor_overalls = [_overall_score(b[row]) for b in batches if row in b and _overall_score(b[row]) is not None]
+                new_line = _rewrite(line, reference[row])
+                raw = sum(anchor_overalls) / len(anchor_overalls) if anchor_overalls else None
+            else:
+                calibrated = {}
+                for q, score in _question_scores(line).items():
+                    scale, offset = params.get(q, (1.0, 0.0))
+                    calibrated[q] = max(1.0, min(5.0, scale * score + offset))
+                new_line = _rewrite(line, calibrated)
+                raw = _overall_score(line)
+            if raw is not None:
+                raw_overall_by_row[row] = raw
+                new_overall = _overall_score(new_line)
+                if new_overall is not None:
+                    shifts.append(abs(new_overall - raw))
+            lines.append(new_line)
+
+    summary = {
+        'anchor_rows': sorted(int(row) for row in anchor_rows),
+        'calls': len(batches),
+        'mean_abs_shift': round(sum(shifts) / len(shifts), 3) if shifts else 0.0,
+        'max_abs_shift': round(max(shifts), 3) if shifts else 0.0
+    }
+    return '\n'.join(lines), raw_overall_by_row, summary
+
+
+def uncalibrated_overall(pass_texts, raw_overall_runs):
+    """
+    {row_number (str): average uncalibrated overall score} across passes. `raw_overall_runs`
+    holds calibrate_pass()'s raw scores per pass, or None for a pass that wasn't calibrated.
+    """
+    totals = {}
+    for text, raw_overall in zip(pass_texts, raw_overall_runs):
+        if raw_overall is None:
+            raw_overall = {row: _overall_score(line) for row, line in _score_lines(text).items()}
+        for row, score in raw_overall.items():
+            if score is not None:
+                totals.setdefault(row, []).append(score)
+    return {row: sum(scores) / len(scores) for row, scores in totals.items()}
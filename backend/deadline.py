@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Time budgets for requests that run under a hard execution limit (Vercel functions).
+A Deadline tells the pipeline whether there's still time to *start* another unit of
+work (an LLM pass, a row); work that doesn't fit is handed back to the client as a
+continuation token to resubmit.
+"""
+
+import base64
+import json
+import os
+import time
+
+from llm_gateway import latency_percentile
+
+# Default budget per request - keep below the platform's maxDuration to leave time
+# for the response. DEADLINE_SAFETY_SECONDS is held back from every decision.
+REQUEST_TIME_BUDGET_SECONDS = float(os.getenv('REQUEST_TIME_BUDGET_SECONDS', '55'))
+DEADLINE_SAFETY_SECONDS = float(os.getenv('DEADLINE_SAFETY_SECONDS', '5'))
+
+# Rows per scoring call when analyzing within a deadline - smaller chunks let more
+# of the budget be used before the remaining rows are handed back
+DEADLINE_CHUNK_SIZE = int(os.getenv('DEADLINE_CHUNK_SIZE', '5'))
+
+# Per-call duration guesses used until the gateway has real latencies for a purpose
+DEFAULT_CALL_SECONDS = {
+    'consensus_scoring': 30.0,
+    'ai_detection': 3.0
+}
+
+
+def estimate_call_seconds(purpose):
+    """p95 of recent latencies for this purpose, or the static default"""
+    p95 = latency_percentile(purpose, 95)
+    return p95 if p95 is not None else DEFAULT_CALL_SECONDS.get(purpose, 10.0)
+
+
+class Deadline:
+    """Wall-clock budget for one request"""
+
+    def __init__(self, budget_seconds=None):
+        # Clients may ask for a shorter budget, never a longer one than the platform allows
+        self.budget = min(float(budget_seconds or REQUEST_TIME_BUDGET_SECONDS), REQUEST_TIME_BUDGET_SECONDS)
+        self.expires_at = time.monotonic() + self.budget
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def can_start(self, estimated_seconds):
+        """True if work expected to take `estimated_seconds` should finish within budget"""
+        return self.remaining() - DEADLINE_SAFETY_SECONDS >= estimated_seconds
+
+    def can_start_calls(self, purpose, calls=1):
+        return self.can_start(estimate_call_seconds(purpose) * calls)
+
+
+def encode_continuation(payload):
+    """Opaque (URL-safe) token carrying whatever is needed to resubmit the remaining work"""
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+
+
+def decode_continuation(token):
+    """Inverse of encode_continuation - raises ValueError for a malformed token"""
+    try:
+        return json.loads(base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8'))
+    except Exception as e:
+        raise ValueError(f'Invalid continuation token: {e}')
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Local eligibility checks for the 7-question (Graduate Scheme) format.
+Q1, Q2, Q3 and Q5 are Yes/No facts already in columns K-N, so they are answered here
+instead of by the model (which used to copy them out three times per candidate).
+Each question has a rule saying which field it reads, which answer passes and whether
+failing it is a hard fail. Rules can be overridden per client in ELIGIBILITY_RULES_PATH:
+
+    {
+      "default": {"Q3": {"min_grade": 4}},
+      "EDF Trading - Graduate Scheme": {"Q3": {"hard": true}, "skip_ineligible": true}
+    }
+
+With skip_ineligible (or ELIGIBILITY_SKIP_INELIGIBLE=true) candidates who fail a hard
+rule are not sent to the model at all and get a 0 score with the failed checks as reason.
+"""
+
+import copy
+import json
+import os
+import re
+
+ELIGIBILITY_RULES_PATH = os.getenv('ELIGIBILITY_RULES_PATH', '../ultils/eligibility_rules.json')
+ELIGIBILITY_SKIP_INELIGIBLE = os.getenv('ELIGIBILITY_SKIP_INELIGIBLE', 'false').lower() in ('1', 'true', 'yes')
+
+# Question -> rule. 'pass' is the answer that passes; a blank/unreadable field never fails.
+DEFAULT_RULES = {
+    'Q1': {'field': 'right_to_work', 'label': 'Right to work in the UK', 'pass': 'Yes', 'hard': True},
+    'Q2': {'field': 'visa_sponsorship', 'label': 'Visa sponsorship required', 'pass': 'No', 'hard': True},
+    'Q3': {'field': 'gcse_maths', 'label': 'GCSE Maths grade', 'pass': 'Yes', 'hard': False, 'min_grade': 4},
+    'Q5': {'field': 'available_sept_2026', 'label': 'Available from September 2026', 'pass': 'Yes', 'hard': False},
+}
+
+# Old letter grades on the 9-1 scale (C is a standard pass, i.e. 4)
+LETTER_GRADES = {'A*': 8, 'A': 7, 'B': 6, 'C': 4, 'D': 3, 'E': 2, 'F': 1, 'G': 1, 'U': 0}
+
+
+def uses_local_eligibility(client, client_criteria):
+    """True for the 7-question format, where Q1-Q3 and Q5 are Yes/No facts"""
+    if not (isinstance(client_criteria, dict) and client_criteria):
+        return False
+    question_count = len(client_criteria)
+    return question_count == 7 or ("Graduate" in client and question_count >= 7)
+
+
+def _load_overrides():
+    try:
+        with open(ELIGIBILITY_RULES_PATH, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"Warning: Could not load eligibility rules from {ELIGIBILITY_RULES_PATH}: {e}")
+        return {}
+
+
+def rules_for_client(client):
+    """Default rules with the file's 'default' and per-client overrides applied"""
+    rules = copy.deepcopy(DEFAULT_RULES)
+    skip_ineligible = ELIGIBILITY_SKIP_INELIGIBLE
+    overrides = _load_overrides()
+    for section in (overrides.get('default', {}), overrides.get(client, {})):
+        for key, value in section.items():
+            if key == 'skip_ineligible':
+                skip_ineligible = bool(value)
+            elif key in rules and isinstance(value, dict):
+                rules[key].update(value)
+    return rules, skip_ineligible
+
+
+# Field values that mean "not answered" - never read as a grade or as a No
+NOT_ANSWERED = {'', 'N/A', 'NA', 'N.A.', 'NOT APPLICABLE', 'UNKNOWN', '-', '?'}
+
+
+def _grade_answer(value, min_grade):
+    """'Yes' if a GCSE grade (9-1, A*-U or a plain Yes/No) meets min_grade"""
+    text = value.strip().upper()
+    if text in NOT_ANSWERED:
+        return 'N/A'
+    number = re.search(r'\b([0-9])\b', text)
+    if number:
+        return 'Yes' if int(number.group(1)) >= min_grade else 'No'
+    # A letter only counts when it is the whole value ("B", "Grade A*"), not a word's initial
+    letter = re.fullmatch(r'(?:GRADE\s*)?(A\*|[A-GU])', text)
+    if letter:
+        return 'Yes' if LETTER_GRADES[letter.group(1)] >= min_grade else 'No'
+    return _yes_no_answer(value)
+
+
+# Whole answers, or the first word of one ("Yes, I have"), read as Yes/No
+YES_WORDS = {'yes', 'y', 'true'}
+NO_WORDS = {'no', 'n', 'false'}
+
+
+def _yes_no_answer(value):
+    """'Yes'/'No' only when the answer (or its first word) says so - "Not sure", "Yet to confirm" are 'N/A'"""
+    text = value.strip().lower()
+    if text.upper() in NOT_ANSWERED:
+        return 'N/A'
+    first_word = re.match(r'[a-z]*', text).group(0)
+    if first_word in YES_WORDS:
+        return 'Yes'
+    if first_word in NO_WORDS:
+        return 'No'
+    return 'N/A'
+
+
+def evaluate_application(app, rules):
+    """
+    Answer the Yes/No questions for one application.
+    Returns {'answers': {'Q1': 'Yes', ...}, 'eligible': bool, 'failed': [labels of failed hard rules]}
+    """
+    answers = {}
+    failed = []
+    for question, rule in rules.items():
+        value = str(app.get(rule.get('field', ''), '') or '')
+        if 'min_grade' in rule:
+            answer = _grade_answer(value, rule['min_grade'])
+        else:
+            answer = _yes_no_answer(value)
+        answers[question] = answer
+        if rule.get('hard') and answer != 'N/A' and answer != rule.get('pass', 'Yes'):
+            failed.append(rule.get('label', question))
+    return {'answers': answers, 'eligible': not failed, 'failed': failed}
+
+
+def evaluate_applications(applications, client):
+    """
+    Evaluate every application for `client`.
+    Returns ({row_number (str): result}, skip_ineligible) - result as in evaluate_application.
+    """
+    rules, skip_ineligible = rules_for_client(client)
+    results = {str(app['row_number']): evaluate_application(app, rules) for app in applications}
+    return results, skip_ineligible
+
+
+def merge_answers(line, answers):
+    """Put the Yes/No answers among the question scores of a score line, in question order"""
+    match = re.search(r'(Overall Score[^-\n]*-\s*)((?:Q\d+:\s*\S+\s*)*)', line)
+    if not match:
+        return line
+    parts = {q: value for q, value in re.findall(r'(Q\d+):\s*(\S+)', match.group(2))}
+    parts.update(answers)
+    ordered = ' '.join(f"{q}: {value}" for q, value in sorted(parts.items(), key=lambda item: int(item[0][1:])))
+    return f"{line[:match.start(2)]}{ordered} {line[match.end(2):]}"
+
+
+def ineligible_line(row_number, result, question_count=7, max_score=15):
+    """Score line for a candidate skipped as ineligible - unscored questions are N/A"""
+    parts = []
+    for q_num in range(1, question_count + 1):
+        question = f'Q{q_num}'
+        parts.append(f"{question}: {result['answers'][question]}" if question in result['answers'] else f"{question}: N/A*")
+    return f"Row {row_number} - Overall Score **0.00/{max_score}** - {' '.join(parts)} - Not eligible: {', '.join(result['failed'])}"
+
+
+def apply_to_analysis(analysis_text, raw_scores_by_row, results, skipped_rows, question_count=7, max_score=15):
+    """
+    Merge the local answers into every score line of an (averaged) analysis and add a
+    line for each skipped candidate. Returns (analysis_text, raw_scores_by_row).
+    """
+    lines = []
+    for line in analysis_text.split('\n') if analysis_text else []:
+        row_match = re.search(r'Row\s+(\d+)', line)
+        if row_match and 'Overall Score' in line and row_match.group(1) in results:
+            row_num = row_match.group(1)
+            line = merge_answers(line, results[row_num]['answers'])
+            for question, answer in results[row_num]['answers'].items():
+                raw_scores_by_row.setdefault(row_num, {'overall': []})[question.lower()] = [answer]
+        lines.append(line)
+    for row_num in skipped_rows:
+        lines.append(ineligible_line(row_num, results[row_num], question_count, max_score))
+        raw_scores_by_row[row_num] = {'overall': []}
+        for question, answer in results[row_num]['answers'].items():
+            raw_scores_by_row[row_num][question.lower()] = [answer]
+    return '\n'.join(lines), raw_scores_by_row
+
+
+def summarize(results, skipped_rows):
+    """Eligibility block for API responses"""
+    return {
+        'ineligible_rows': sorted(int(row) for row, result in results.items() if not result['eligible']),
+        'skipped_rows': sorted(int(row) for row in skipped_rows),
+        'failed_checks': {row: result['failed'] for row, result in results.items() if result['failed']}
+    }
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Token budgets for the free-text answers sent to the model.
+An answer over FIELD_TOKEN_CAP is trimmed locally to an extract - its opening and
+closing sentences, with a marker saying how much was left out - so one pasted essay
+can't blow up the prompt (and latency) of everyone in its batch. Candidates whose
+answers are still extreme (over OUTLIER_TOKEN_THRESHOLD in total, before trimming)
+are scored in a call of their own.
+"""
+
+import os
+import re
+
+from prompt_encoding import count_tokens
+
+FIELD_TOKEN_CAP = int(os.getenv('FIELD_TOKEN_CAP', '600'))
+OUTLIER_TOKEN_THRESHOLD = int(os.getenv('OUTLIER_TOKEN_THRESHOLD', '2500'))
+
+# Free-text answer fields of an application dict (see build_application_from_row)
+BUDGETED_FIELDS = ('understanding_of_role', 'why_edf', 'what_stands_out')
+
+# Share of the cap kept from the start of an answer; the rest comes from its end
+HEAD_SHARE = 0.7
+
+
+def _sentences(text):
+    return [s for s in re.split(r'(?<=[.!?])\s+|\n+', text.strip()) if s]
+
+
+def trim_to_budget(text, cap=FIELD_TOKEN_CAP):
+    """
+    Extract of `text` within about `cap` tokens: leading sentences, a marker, then
+    trailing sentences. Returns (text, original_tokens, kept_tokens).
+    """
+    original = count_tokens(text)
+    if original <= cap:
+        return text, original, original
+
+    sentences = _sentences(text)
+    head, head_tokens = [], 0
+    for sentence in sentences:
+        tokens = count_tokens(sentence) + 1
+        if head_tokens + tokens > cap * HEAD_SHARE:
+            break
+        head.append(sentence)
+        head_tokens += tokens
+    tail, tail_tokens = [], 0
+    for sentence in reversed(sentences[len(head):]):
+        tokens = count_tokens(sentence) + 1
+        if head_tokens + tail_tokens + tokens > cap:
+            break
+        tail.insert(0, sentence)
+        tail_tokens += tokens
+
+    if not head and not tail:
+        # One enormous sentence - fall back to cutting words
+        words = text.split()
+        keep = max(1, int(len(words) * cap / original))
+        head = [' '.join(words[:keep])]
+    kept = ' '.join(head + tail)
+    trimmed = ' '.join(head) + f" [... {original - count_tokens(kept)} tokens trimmed ...]" + (' ' + ' '.join(tail) if tail else '')
+    return trimmed, original, count_tokens(trimmed)
+
+
+def answer_tokens(app):
+    """Total tokens across the budgeted answers, untrimmed"""
+    return sum(count_tokens(app.get(field) or '') for field in BUDGETED_FIELDS)
+
+
+def is_outlier(app):
+    return answer_tokens(app) > OUTLIER_TOKEN_THRESHOLD
+
+
+def budget_application(app):
+    """
+    Copy of `app` with oversized answers trimmed.
+    Returns (app, trimmed) - trimmed is {field: [original_tokens, kept_tokens]}.
+    """
+    budgeted = dict(app)
+    trimmed = {}
+    for field in BUDGETED_FIELDS:
+        value = app.get(field) or ''
+        text, original, kept = trim_to_budget(value)
+        if original != kept:
+            budgeted[field] = text
+            trimmed[field] = [original, kept]
+    return budgeted, trimmed
+
+
+def budget_report(applications):
+    """What budgeting does to these applications, for logs and API responses"""
+    trimmed_rows = {}
+    for app in applications:
+        _, trimmed = budget_application(app)
+        if trimmed:
+            trimmed_rows[str(app['row_number'])] = trimmed
+    return {
+        'field_token_cap': FIELD_TOKEN_CAP,
+        'trimmed': trimmed_rows,
+        'isolated_rows': [app['row_number'] for app in applications if is_outlier(app)]
+    }
@@ -0,0 +1,44 @@
+"""
+Production server: gunicorn -c gunicorn.conf.py (run from backend/)
+
+The app is imported once in the master (preload_app) and shared state is warmed before
+the workers are forked - see prefork.py. SERVER_MODE=asgi serves asgi.py through
+uvicorn workers instead of app.py through threaded workers.
+"""
+
+import multiprocessing
+import os
+
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+
+bind = os.getenv('BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', str(multiprocessing.cpu_count())))
+threads = int(os.getenv('WEB_THREADS', '8'))
+# Analyses hold a request for several LLM round-trips
+timeout = int(os.getenv('WEB_TIMEOUT', '600'))
+graceful_timeout = 30
+preload_app = True
+
+# Workers share the criteria warmed before the fork; the run journal's criteria stamp
+# keeps every worker's copy current when clients are added or deleted
+os.environ.setdefault('CRITERIA_CACHE_SECONDS', '300')
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'asgi:app'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    # Blocking routes run in each worker's thread pool
+    os.environ.setdefault('ASGI_THREADS', str(threads))
+else:
+    wsgi_app = 'app:app'
+    worker_class = 'gthread'
+
+
+def when_ready(server):
+    """The app is loaded (preload) and no worker exists yet"""
+    import prefork
+    prefork.warm_shared_state()
+
+
+def post_fork(server, worker):
+    import prefork
+    prefork.reset_after_fork(server.num_workers)
@@ -0,0 +1,791 @@
+#!/usr/bin/env python3
+"""
+Shared LLM gateway - owns the single pooled OpenAI client.
+All chat completions (consensus scoring, AI detection, sheets_processor CLI)
+go through chat_completion() so requests-per-minute and tokens-per-minute
+budgets are enforced in one place and every call's latency/token usage is recorded.
+Transient errors are retried with backoff, and a circuit breaker fails fast
+while the provider is down.
+"""
+
+import asyncio
+import os
+import queue
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import httpx
+from dotenv import load_dotenv
+from openai import OpenAI, AsyncOpenAI, APIConnectionError, APIStatusError, APITimeoutError
+
+load_dotenv()
+
+# Rate limits (match these to the OpenAI account tier)
+LLM_RPM_LIMIT = int(os.getenv('LLM_RPM_LIMIT', '500'))
+LLM_TPM_LIMIT = int(os.getenv('LLM_TPM_LIMIT', '200000'))
+
+# Connection pool tuning - keep connections alive between the 3 consensus passes
+LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', '20'))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('LLM_MAX_KEEPALIVE_CONNECTIONS', '10'))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv('LLM_KEEPALIVE_EXPIRY', '60'))
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '120'))
+
+# Retry / circuit breaker settings
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '3'))
+LLM_RETRY_BASE_DELAY = float(os.getenv('LLM_RETRY_BASE_DELAY', '1.0'))
+LLM_RETRY_MAX_DELAY = float(os.getenv('LLM_RETRY_MAX_DELAY', '30'))
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv('LLM_BREAKER_FAILURE_THRESHOLD', '5'))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv('LLM_BREAKER_RESET_SECONDS', '30'))
+
+# Hedged requests (off by default): if a call hasn't answered after the given latency
+# percentile for its purpose, send a duplicate and use whichever finishes first.
+# LLM_HEDGE_MAX_RATE caps the fraction of calls that may be hedged.
+LLM_HEDGE_ENABLED = os.getenv('LLM_HEDGE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+LLM_HEDGE_PERCENTILE = float(os.getenv('LLM_HEDGE_PERCENTILE', '95'))
+LLM_HEDGE_MAX_RATE = float(os.getenv('LLM_HEDGE_MAX_RATE', '0.1'))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv('LLM_HEDGE_MIN_SAMPLES', '20'))
+LLM_HEDGE_MIN_DELAY = float(os.getenv('LLM_HEDGE_MIN_DELAY', '1.0'))
+
+# How many recent calls to keep per purpose for latency stats
+STATS_WINDOW = 500
+
+# How often an async caller waiting behind others in the limiter queue checks its turn
+ASYNC_QUEUE_POLL_SECONDS = 0.05
+
+
+class TokenBucket:
+    """Token bucket holding up to `capacity_per_minute` units, refilled continuously"""
+
+    def __init__(self, capacity_per_minute):
+        self.capacity = float(capacity_per_minute)
+        self.refill_rate = self.capacity / 60.0  # units per second
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` units are available (0 if available now)"""
+        self._refill()
+        # A single request larger than the bucket waits for a full bucket instead of forever
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_rate
+
+    def consume(self, amount):
+        """Take `amount` units (negative amounts refund). May go below zero."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class RateLimiter:
+    """
+    RPM + TPM limiter with a FIFO queue so callers are served in arrival order.
+    Only the caller at the head of the queue may consume budget; everyone else waits.
+    """
+
+    def __init__(self, rpm, tpm):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self._cond = threading.Condition()
+        self._queue = deque()
+
+    def acquire(self, estimated_tokens):
+        """Block until one request and `estimated_tokens` tokens are available. Returns seconds waited."""
+        ticket = object()
+        started = time.monotonic()
+        with self._cond:
+            self._queue.append(ticket)
+            try:
+                while True:
+                    if self._queue[0] is ticket:
+                        wait = max(self.requests.wait_time(1), self.tokens.wait_time(estimated_tokens))
+                        if wait <= 0:
+                            self.requests.consume(1)
+                            self.tokens.consume(estimated_tokens)
+                            return time.monotonic() - started
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+            finally:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+
+    async def acquire_async(self, estimated_tokens):
+        """
+        acquire() for coroutines: same FIFO queue and budgets, but waits with
+        asyncio.sleep() so the event loop keeps running. Returns seconds waited.
+        """
+        ticket = object()
+        started = time.monotonic()
+        with self._cond:
+            self._queue.append(ticket)
+        try:
+            while True:
+                with self._cond:
+                    if self._queue[0] is ticket:
+                        wait = max(self.requests.wait_time(1), self.tokens.wait_time(estimated_tokens))
+                        if wait <= 0:
+                            self.requests.consume(1)
+                            self.tokens.consume(estimated_tokens)
+                            return time.monotonic() - started
+                    else:
+                        wait = ASYNC_QUEUE_POLL_SECONDS
+                await asyncio.sleep(wait)
+        finally:
+            with self._cond:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+
+    def reconcile(self, estimated_tokens, actual_tokens):
+        """Correct the token bucket once the real usage of a call is known"""
+        with self._cond:
+            self.tokens.consume(actual_tokens - estimated_tokens)
+            self._cond.notify_all()
+
+    def queue_length(self):
+        with self._cond:
+            return len(self._queue)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the provider while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Classic closed -> open -> half-open breaker.
+    Opens after `failure_threshold` consecutive transient failures, rejects calls
+    for `reset_seconds`, then lets a single trial call through.
+    """
+
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a call may be made now"""
+        with self._lock:
+            if self.state == 'open':
+                if time.monotonic() - self.opened_at < self.reset_seconds:
+                    return False
+                self.state = 'half_open'
+                self.trial_in_flight = False
+            if self.state == 'half_open':
+                if self.trial_in_flight:
+                    return False
+                self.trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    print(f"⚠️  LLM circuit breaker OPEN after {self.failures} failures - failing fast for {self.reset_seconds:.0f}s")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            return {'state': self.state, 'consecutive_failures': self.failures}
+
+
+def is_transient_error(error):
+    """Timeouts, connection errors, 408/409/429 and 5xx responses are worth retrying"""
+    if isinstance(error, (APITimeoutError, APIConnectionError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+
+def is_timeout_error(error):
+    """Client-side timeouts plus 408/504 - a sign the request was too big for the time envelope"""
+    if isinstance(error, APITimeoutError):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code in (408, 504)
+
+
+def _retry_delay(attempt, error):
+    """Exponential backoff with jitter, honouring Retry-After when the provider sends it"""
+    response = getattr(error, 'response', None)
+    retry_after = response.headers.get('retry-after') if response is not None else None
+    if retry_after:
+        try:
+            return min(LLM_RETRY_MAX_DELAY, float(retry_after))
+        except ValueError:
+            pass
+    delay = min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * (2 ** attempt))
+    return delay * random.uniform(0.5, 1.0)
+
+
+_limiter = RateLimiter(LLM_RPM_LIMIT, LLM_TPM_LIMIT)
+_breaker = CircuitBreaker(LLM_BREAKER_FAILURE_THRESHOLD, LLM_BREAKER_RESET_SECONDS)
+_client = None
+_client_lock = threading.Lock()
+
+# Loading the CA bundle is most of the cost of creating a client, so every client shares one context
+_ssl_context = None
+
+# Async clients are bound to the event loop they were created on, so there is one per loop
+_async_clients = weakref.WeakKeyDictionary()
+
+_stats_lock = threading.Lock()
+_stats = {}  # {purpose: {'calls', 'errors', 'retries', 'prompt_tokens', 'completion_tokens', 'queue_wait', 'hedges', 'hedge_wins', 'latencies': deque}}
+
+# Hedge requests run here (the primary runs in the caller's thread); no hedge is sent
+# while every worker is busy
+_hedge_executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONNECTIONS, thread_name_prefix='llm-hedge')
+_hedges_running = 0
+_hedge_window = deque(maxlen=STATS_WINDOW)  # recent hedge-eligible calls: {'hedged': bool}
+_hedge_lock = threading.Lock()
+
+
+def shared_ssl_context():
+    """The SSL context used by all gateway (and async_io) HTTP clients, created on first use"""
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = httpx.create_ssl_context()
+    return _ssl_context
+
+
+def get_client():
+    """Return the shared OpenAI client, creating it (and its connection pool) on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                http_client = httpx.Client(
+                    verify=shared_ssl_context(),
+                    limits=httpx.Limits(
+                        max_connections=LLM_MAX_CONNECTIONS,
+                        max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+                    ),
+                    timeout=LLM_TIMEOUT
+                )
+                # Retries are handled by chat_completion() so they share the rate limiter and breaker
+                _client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'), http_client=http_client, max_retries=0)
+    return _client
+
+
+def get_async_client():
+    """Return the AsyncOpenAI client for the running event loop, creating it on first use"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        http_client = httpx.AsyncClient(
+            verify=shared_ssl_context(),
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+            ),
+            timeout=LLM_TIMEOUT
+        )
+        client = _async_clients[loop] = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'), http_client=http_client, max_retries=0)
+    return client
+
+
+async def close_async_client():
+    """Close the running loop's AsyncOpenAI client, if it has one"""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
+def reset_after_fork(budget_share=1.0):
+    """
+    Give a forked worker process its own gateway state: new locks, hedge thread pool and
+    HTTP clients (a connection pool must never be shared between processes), fresh stats
+    and circuit breaker. The RPM/TPM budgets are scaled by `budget_share` so that all
+    workers together stay within the account limits. The SSL context is kept, so clients
+    are cheap to recreate.
+    """
+    global _limiter, _breaker, _client, _client_lock, _async_clients
+    global _stats_lock, _stats, _hedge_executor, _hedges_running, _hedge_window, _hedge_lock
+    _limiter = RateLimiter(max(1, LLM_RPM_LIMIT * budget_share), max(1, LLM_TPM_LIMIT * budget_share))
+    _breaker = CircuitBreaker(LLM_BREAKER_FAILURE_THRESHOLD, LLM_BREAKER_RESET_SECONDS)
+    _client = None
+    _client_lock = threading.Lock()
+    _async_clients = weakref.WeakKeyDictionary()
+    _stats_lock = threading.Lock()
+    _stats = {}
+    _hedge_executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONNECTIONS, thread_name_prefix='llm-hedge')
+    _hedges_running = 0
+    _hedge_window = deque(maxlen=STATS_WINDOW)
+    _hedge_lock = threading.Lock()
+
+
+def estimate_tokens(messages, max_tokens=None):
+    """
+    Rough token estimate for rate limiting (~4 characters per token).
+    OpenAI counts max_tokens against the TPM budget up front, so include it.
+    """
+    prompt_chars = sum(len(str(m.get('content', ''))) for m in messages or [])
+    return prompt_chars // 4 + 4 * len(messages or []) + (max_tokens or 0)
+
+
+def _stats_entry(purpose):
+    """Stats for a purpose, created on first use - call with _stats_lock held"""
+    return _stats.setdefault(purpose, {
+        'calls': 0,
+        'errors': 0,
+        'retries': 0,
+        'prompt_tokens': 0,
+        'completion_tokens': 0,
+        'queue_wait': 0.0,
+        'hedges': 0,
+        'hedge_wins': 0,
+        'latencies': deque(maxlen=STATS_WINDOW)
+    })
+
+
+def _record_call(purpose, latency, queue_wait, prompt_tokens=0, completion_tokens=0, error=False, retry=False):
+    with _stats_lock:
+        entry = _stats_entry(purpose)
+        entry['calls'] += 1
+        entry['queue_wait'] += queue_wait
+        if retry:
+            entry['retries'] += 1
+        if error:
+            entry['errors'] += 1
+        else:
+            entry['prompt_tokens'] += prompt_tokens
+            entry['completion_tokens'] += completion_tokens
+            entry['latencies'].append(latency)
+
+
+def latency_percentile(purpose, percentile):
+    """Return the given percentile (0-100) of recent successful call latencies, or None if no data"""
+    with _stats_lock:
+        entry = _stats.get(purpose)
+        latencies = sorted(entry['latencies']) if entry else []
+    if not latencies:
+        return None
+    index = min(len(latencies) - 1, int(round(percentile / 100.0 * (len(latencies) - 1))))
+    return latencies[index]
+
+
+def get_stats():
+    """Snapshot of per-purpose call counts, token usage and latency percentiles"""
+    with _stats_lock:
+        purposes = list(_stats.keys())
+        snapshot = {}
+        for purpose in purposes:
+            entry = _stats[purpose]
+            snapshot[purpose] = {
+                'calls': entry['calls'],
+                'errors': entry['errors'],
+                'retries': entry['retries'],
+                'prompt_tokens': entry['prompt_tokens'],
+                'completion_tokens': entry['completion_tokens'],
+                'avg_queue_wait': round(entry['queue_wait'] / entry['calls'], 3) if entry['calls'] else 0.0,
+                'hedges': entry['hedges'],
+                'hedge_wins': entry['hedge_wins']
+            }
+    for purpose in purposes:
+        snapshot[purpose]['p50_latency'] = latency_percentile(purpose, 50)
+        snapshot[purpose]['p95_latency'] = latency_percentile(purpose, 95)
+    return {
+        'limits': {'rpm': _limiter.requests.capacity, 'tpm': _limiter.tokens.capacity},
+        'queued': _limiter.queue_length(),
+        'circuit_breaker': _breaker.snapshot(),
+        'hedging': {
+            'enabled': LLM_HEDGE_ENABLED,
+            'percentile': LLM_HEDGE_PERCENTILE,
+            'max_rate': LLM_HEDGE_MAX_RATE
+        },
+        'purposes': snapshot
+    }
+
+
+def chat_completion(purpose='completion', **kwargs):
+    """
+    Create a chat completion through the shared client.
+    `purpose` labels the call for stats (e.g. 'consensus_scoring', 'ai_detection').
+    All other keyword arguments are passed to chat.completions.create().
+    Transient errors are retried up to LLM_MAX_RETRIES times; raises CircuitOpenError
+    without calling the provider while the breaker is open.
+    """
+    estimated = estimate_tokens(kwargs.get('messages'), kwargs.get('max_tokens'))
+
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        if not _breaker.allow():
+            raise CircuitOpenError(f"LLM provider unavailable - circuit breaker open (purpose={purpose})")
+
+        queue_wait = _limiter.acquire(estimated)
+        started = time.monotonic()
+        try:
+            response = get_client().chat.completions.create(**kwargs)
+        except Exception as e:
+            _record_call(purpose, time.monotonic() - started, queue_wait, error=True, retry=attempt > 0)
+            _limiter.reconcile(estimated, 0)
+            if not is_transient_error(e):
+                # The provider answered (e.g. 400 bad request) - it's up, so don't trip the breaker
+                _breaker.record_success()
+                raise
+            _breaker.record_failure()
+            if attempt >= LLM_MAX_RETRIES:
+                raise
+            delay = _retry_delay(attempt, e)
+            print(f"  🔁 LLM {purpose}: transient error ({type(e).__name__}), retry {attempt + 1}/{LLM_MAX_RETRIES} in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+
+        latency = time.monotonic() - started
+        _breaker.record_success()
+
+        usage = getattr(response, 'usage', None)
+        prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+        completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+        _limiter.reconcile(estimated, (prompt_tokens + completion_tokens) if usage else estimated)
+        _record_call(purpose, latency, queue_wait, prompt_tokens, completion_tokens, retry=attempt > 0)
+
+        print(f"  ⏱️  LLM {purpose}: {latency:.2f}s (queued {queue_wait:.2f}s), {prompt_tokens} prompt + {completion_tokens} completion tokens")
+        return response
+
+
+async def async_chat_completion(purpose='completion', **kwargs):
+    """
+    Coroutine version of chat_completion(): same rate limiter, circuit breaker, retries
+    and stats, but awaits the provider through the event loop's AsyncOpenAI client
+    instead of blocking a thread.
+    """
+    estimated = estimate_tokens(kwargs.get('messages'), kwargs.get('max_tokens'))
+
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        if not _breaker.allow():
+            raise CircuitOpenError(f"LLM provider unavailable - circuit breaker open (purpose={purpose})")
+
+        queue_wait = await _limiter.acquire_async(estimated)
+        started = time.monotonic()
+        try:
+            response = await get_async_client().chat.completions.create(**kwargs)
+        except Exception as e:
+            _record_call(purpose, time.monotonic() - started, queue_wait, error=True, retry=attempt > 0)
+            _limiter.reconcile(estimated, 0)
+            if not is_transient_error(e):
+                _breaker.record_success()
+                raise
+            _breaker.record_failure()
+            if attempt >= LLM_MAX_RETRIES:
+                raise
+            delay = _retry_delay(attempt, e)
+            print(f"  🔁 LLM {purpose}: transient error ({type(e).__name__}), retry {attempt + 1}/{LLM_MAX_RETRIES} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            continue
+
+        latency = time.monotonic() - started
+        _breaker.record_success()
+
+        usage = getattr(response, 'usage', None)
+        prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+        completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+        _limiter.reconcile(estimated, (prompt_tokens + completion_tokens) if usage else estimated)
+        _record_call(purpose, latency, queue_wait, prompt_tokens, completion_tokens, retry=attempt > 0)
+
+        print(f"  ⏱️  LLM {purpose}: {latency:.2f}s (queued {queue_wait:.2f}s), {prompt_tokens} prompt + {completion_tokens} completion tokens")
+        return response
+
+
+def stream_chat_completion(purpose='completion', on_finish=None, on_open=None, on_send=None, cancel_event=None, **kwargs):
+    """
+    Streaming variant of chat_completion(): yields content deltas as they arrive.
+    Retries (and the circuit breaker) only apply to opening the stream - once text
+    has been yielded a failure is raised to the caller.
+    Token usage is taken from the final usage chunk and recorded like any other call.
+    `on_finish(finish_reason, prompt_tokens, completion_tokens)` is called once the
+    stream completes. Closing the generator early closes the HTTP stream.
+    `on_send()` is called right before each request attempt goes out (after any wait in
+    the rate limiter); `on_open(stream)` receives the provider stream once the response
+    headers are in, so another thread can close it. Once `cancel_event` is set the
+    generator ends quietly, without sending the request or recording the call.
+    """
+    estimated = estimate_tokens(kwargs.get('messages'), kwargs.get('max_tokens'))
+    kwargs['stream'] = True
+    kwargs.setdefault('stream_options', {'include_usage': True})
+
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        if not _breaker.allow():
+            raise CircuitOpenError(f"LLM provider unavailable - circuit breaker open (purpose={purpose})")
+
+        queue_wait = _limiter.acquire(estimated)
+        if cancel_event is not None and cancel_event.is_set():
+            _limiter.reconcile(estimated, 0)
+            return
+        if on_send:
+            on_send()
+        started = time.monotonic()
+        try:
+            stream = get_client().chat.completions.create(**kwargs)
+        except Exception as e:
+            _record_call(purpose, time.monotonic() - started, queue_wait, error=True, retry=attempt > 0)
+            _limiter.reconcile(estimated, 0)
+            if not is_transient_error(e):
+                _breaker.record_success()
+                raise
+            _breaker.record_failure()
+            if attempt >= LLM_MAX_RETRIES:
+                raise
+            delay = _retry_delay(attempt, e)
+            print(f"  🔁 LLM {purpose}: transient error ({type(e).__name__}), retry {attempt + 1}/{LLM_MAX_RETRIES} in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+        break
+
+    if on_open:
+        on_open(stream)
+    prompt_tokens = 0
+    completion_tokens = 0
+    finish_reason = None
+    try:
+        for chunk in stream:
+            if getattr(chunk, 'usage', None):
+                prompt_tokens = chunk.usage.prompt_tokens or 0
+                completion_tokens = chunk.usage.completion_tokens or 0
+            if chunk.choices and chunk.choices[0].finish_reason:
+                finish_reason = chunk.choices[0].finish_reason
+            if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    except GeneratorExit:
+        # Consumer stopped early (e.g. a hedge lost the race) - stop the generation
+        stream.close()
+        _limiter.reconcile(estimated, estimated)
+        raise
+    except Exception:
+        _limiter.reconcile(estimated, estimated)
+        if cancel_event is not None and cancel_event.is_set():
+            # Another thread closed the stream on purpose (e.g. the other hedge leg won)
+            return
+        _record_call(purpose, time.monotonic() - started, queue_wait, error=True, retry=attempt > 0)
+        _breaker.record_failure()
+        raise
+
+    if cancel_event is not None and cancel_event.is_set():
+        _limiter.reconcile(estimated, estimated)
+        return
+    latency = time.monotonic() - started
+    _breaker.record_success()
+    _limiter.reconcile(estimated, (prompt_tokens + completion_tokens) or estimated)
+    _record_call(purpose, latency, queue_wait, prompt_tokens, completion_tokens, retry=attempt > 0)
+    print(f"  ⏱️  LLM {purpose} (stream): {latency:.2f}s (queued {queue_wait:.2f}s), {prompt_tokens} prompt + {completion_tokens} completion tokens")
+    if on_finish:
+        on_finish(finish_reason, prompt_tokens, completion_tokens)
+
+
+def _hedge_delay(purpose):
+    """Seconds to wait before hedging a call, or None if it shouldn't be hedged"""
+    if not LLM_HEDGE_ENABLED:
+        return None
+    with _stats_lock:
+        entry = _stats.get(purpose)
+        samples = len(entry['latencies']) if entry else 0
+    if samples < LLM_HEDGE_MIN_SAMPLES:
+        return None
+    return max(LLM_HEDGE_MIN_DELAY, latency_percentile(purpose, LLM_HEDGE_PERCENTILE))
+
+
+def _take_hedge_slot(slot):
+    """
+    Mark a call's window slot as hedged if that keeps hedges under LLM_HEDGE_MAX_RATE of
+    recent calls. One hedge is always allowed, so hedging works before the window fills.
+    """
+    with _hedge_lock:
+        hedged = sum(1 for s in _hedge_window if s['hedged'])
+        if hedged + 1 > max(1.0, LLM_HEDGE_MAX_RATE * len(_hedge_window)):
+            return False
+        slot['hedged'] = True
+        return True
+
+
+def _reserve_hedge_worker():
+    """Claim a hedge thread, or False if all of them are busy (then the call isn't hedged)"""
+    global _hedges_running
+    with _hedge_lock:
+        if _hedges_running >= LLM_MAX_CONNECTIONS:
+            return False
+        _hedges_running += 1
+        return True
+
+
+def _release_hedge_worker():
+    global _hedges_running
+    with _hedge_lock:
+        _hedges_running -= 1
+
+
+class _HedgeLeg:
+    """
+    One leg of a hedged call. Runs as a stream; close() stops it from any thread by
+    closing the provider stream directly, so a leg stalled before its next chunk (or
+    before its first) gives back its thread and connection at once.
+    """
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._stream = None
+
+    def _attach(self, stream):
+        with self._lock:
+            self._stream = stream
+            cancelled = self.cancelled.is_set()
+        if cancelled:
+            stream.close()
+
+    def close(self):
+        with self._lock:
+            self.cancelled.set()
+            stream = self._stream
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+    def run(self, purpose, kwargs, on_send=None):
+        """
+        A response shaped like chat_completion()'s, or None if the leg was closed.
+        Rebuilt from the streamed deltas, so it only has the message content,
+        finish_reason and usage (no logprobs or other choice fields).
+        """
+        parts = []
+        finished = {}
+        deltas = stream_chat_completion(
+            purpose,
+            on_finish=lambda reason, prompt, completion: finished.update(reason=reason, prompt=prompt, completion=completion),
+            on_open=self._attach,
+            on_send=on_send,
+            cancel_event=self.cancelled,
+            **dict(kwargs)
+        )
+        try:
+            for delta in deltas:
+                parts.append(delta)
+        finally:
+            deltas.close()
+        if self.cancelled.is_set():
+            return None
+        return SimpleNamespace(
+            choices=[SimpleNamespace(
+                message=SimpleNamespace(content=''.join(parts)),
+                finish_reason=finished.get('reason')
+            )],
+            usage=SimpleNamespace(prompt_tokens=finished.get('prompt', 0), completion_tokens=finished.get('completion', 0))
+        )
+
+
+def hedged_chat_completion(purpose='completion', **kwargs):
+    """
+    chat_completion() with optional hedging against stalled completions.
+    When LLM_HEDGE_ENABLED and there's enough latency history, a call that hasn't
+    answered LLM_HEDGE_PERCENTILE latency after its request was sent (time queued in the
+    rate limiter doesn't count, waiting for the response headers does) gets a duplicate
+    request; the first to finish wins and closes the other's stream. Both legs run off
+    the caller's thread - the primary in a thread of its own, the hedge in
+    _hedge_executor - so a leg stuck before its headers can't hold up the answer.
+    Hedging is skipped while the rate limiter is queueing (the delay is ours, not the
+    provider's) or every hedge thread is busy, and capped at LLM_HEDGE_MAX_RATE of calls.
+    Hedged responses are rebuilt from the stream (content, finish_reason and usage
+    only), so calls asking for logprobs or several choices are never hedged.
+    """
+    delay = _hedge_delay(purpose)
+    if delay is None or kwargs.get('logprobs') or kwargs.get('n', 1) != 1:
+        return chat_completion(purpose, **kwargs)
+
+    slot = {'hedged': False}
+    with _hedge_lock:
+        _hedge_window.append(slot)
+
+    primary = _HedgeLeg()
+    hedge = _HedgeLeg()
+    outcomes = queue.Queue()
+    state_lock = threading.Lock()
+    # running: legs started and not reported yet; settled: no hedge may start any more
+    state = {'running': 1, 'settled': False}
+
+    def run_leg(leg, on_send=None):
+        try:
+            outcomes.put((leg, leg.run(purpose, kwargs, on_send=on_send), None))
+        except Exception as e:
+            outcomes.put((leg, None, e))
+
+    def run_hedge():
+        try:
+            run_leg(hedge)
+        finally:
+            _release_hedge_worker()
+
+    def maybe_hedge():
+        if state['settled'] or _limiter.queue_length() > 0 or not _reserve_hedge_worker():
+            return
+        if not _take_hedge_slot(slot):
+            _release_hedge_worker()
+            return
+        with state_lock:
+            if state['settled']:
+                _release_hedge_worker()
+                return
+            state['running'] += 1
+        print(f"  🪃 LLM {purpose}: no answer after {delay:.1f}s (p{LLM_HEDGE_PERCENTILE:.0f}), sending hedge request")
+        with _stats_lock:
+            _stats_entry(purpose)['hedges'] += 1
+        _hedge_executor.submit(run_hedge)
+
+    timer = threading.Timer(delay, maybe_hedge)
+    timer.daemon = True
+    timer_started = threading.Event()
+
+    def start_timer():
+        # The primary's request is about to go out - the delay starts now (once, not per retry)
+        if not timer_started.is_set():
+            timer_started.set()
+            timer.start()
+
+    threading.Thread(target=run_leg, args=(primary, start_timer), name='llm-hedge-primary', daemon=True).start()
+
+    error = None
+    while True:
+        leg, response, leg_error = outcomes.get()
+        with state_lock:
+            state['running'] -= 1
+            won = response is not None and not state['settled']
+            if won or state['running'] == 0:
+                state['settled'] = True
+            gave_up = not won and state['running'] == 0
+        if won:
+            timer.cancel()
+            (hedge if leg is primary else primary).close()
+            if leg is hedge:
+                with _stats_lock:
+                    _stats_entry(purpose)['hedge_wins'] += 1
+                print(f"  🪃 LLM {purpose}: hedge request won")
+            return response
+        # The primary's error is the one to report
+        if leg is primary or error is None:
+            error = leg_error or error
+        if gave_up:
+            timer.cancel()
+            raise error or RuntimeError(f"LLM {purpose}: both hedged requests were cancelled")
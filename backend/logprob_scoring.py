@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Single-call scoring from token log-probabilities.
+The scoring prompt is unchanged; the call just asks for logprobs/top_logprobs. For every
+question score (e.g. "Q2: 3.75*") the alternatives the model considered for the integer
+digit give a distribution over 1-5, from which we take:
+  - expected score = E[digit] + the written fraction (clamped to 1.00-5.00)
+  - confidence = probability of the most likely digit
+A candidate's confidence is the lowest across their questions; candidates below
+LOGPROB_CONFIDENCE_THRESHOLD get the usual extra consensus passes.
+"""
+
+import math
+import os
+import re
+from bisect import bisect_right
+
+LOGPROB_CONFIDENCE_THRESHOLD = float(os.getenv('LOGPROB_CONFIDENCE_THRESHOLD', '0.7'))
+LOGPROB_TOP_N = int(os.getenv('LOGPROB_TOP_N', '5'))
+
+QUESTION_SCORE_PATTERN = re.compile(r'(Q\d+):\s*(\d)(\.\d+)?\*')
+OVERALL_SCORE_PATTERN = re.compile(r'Overall Score \*\*\s*[\d.]+\s*/\s*(\d+)\s*\*\*')
+
+
+def digit_distribution(top_logprobs):
+    """Normalised {digit: probability} over the 1-5 digit alternatives, or None if there are none"""
+    probs = {}
+    for token, logprob in top_logprobs:
+        match = re.fullmatch(r'\s*([1-5])', token)
+        if match:
+            digit = int(match.group(1))
+            probs[digit] = probs.get(digit, 0.0) + math.exp(logprob)
+    total = sum(probs.values())
+    if not total:
+        return None
+    return {digit: p / total for digit, p in probs.items()}
+
+
+def expected_scores_from_logprobs(text, token_logprobs):
+    """
+    Rewrite each score line in `text` with expected question/overall scores.
+    `token_logprobs` is [(token, [(alternative_token, logprob), ...]), ...] for the
+    completion, in order. Returns {row_number (str): {'line', 'confidence'}}.
+    """
+    offsets = []
+    position = 0
+    for token, _ in token_logprobs:
+        offsets.append(position)
+        position += len(token)
+
+    def distribution_at(char_pos):
+        index = bisect_right(offsets, char_pos) - 1
+        if index < 0 or not re.fullmatch(r'\s*[1-5]', token_logprobs[index][0]):
+            return None  # digit shares a token with other text - no clean distribution
+        return digit_distribution(token_logprobs[index][1])
+
+    results = {}
+    line_start = 0
+    for line in text.split('\n'):
+        row_match = re.search(r'Row\s+(\d+)', line)
+        if row_match and 'Overall Score' in line:
+            confidences = []
+            expected_scores = []
+
+            def replace_question(match):
+                written = int(match.group(2))
+                fraction = float(match.group(3) or 0)
+                dist = distribution_at(line_start + match.start(2))
+                if dist is None:
+                    confidences.append(0.0)
+                    expected = written + fraction
+                else:
+                    confidences.append(max(dist.values()))
+                    expected = sum(digit * p for digit, p in dist.items()) + fraction
+                expected = max(1.0, min(5.0, expected))
+                expected_scores.append(expected)
+                return f"{match.group(1)}: {expected:.2f}*"
+
+            new_line = QUESTION_SCORE_PATTERN.sub(replace_question, line)
+            if expected_scores:
+                total = sum(expected_scores)
+                new_line = OVERALL_SCORE_PATTERN.sub(lambda m: f"Overall Score **{total:.2f}/{m.group(1)}**", new_line)
+            results[row_match.group(1)] = {
+                'line': new_line,
+                'confidence': round(min(confidences), 3) if confidences else 0.0
+            }
+        line_start += len(line) + 1
+    return results
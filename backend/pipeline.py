@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Staged pipeline with bounded queues between the stages.
+Each stage runs in its own thread (or several, for a slow stage that can work on
+shards in parallel) and hands its output for a shard to the next stage through a
+queue of at most PIPELINE_QUEUE_SIZE shards, so a fast stage blocks (backpressure)
+instead of piling up work. With sheet reads, LLM scoring and sheet
+writes as the stages, the next shard is read and the previous one written while the
+current one is scored - total time tends to the slowest stage rather than the sum.
+"""
+
+import os
+import queue
+import threading
+import time
+
+PIPELINE_SHARD_SIZE = int(os.getenv('PIPELINE_SHARD_SIZE', '10'))
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '1'))
+# Threads of the scoring stage - shards scored at the same time
+PIPELINE_SCORE_WORKERS = int(os.getenv('PIPELINE_SCORE_WORKERS', '2'))
+
+_DONE = object()
+
+
+class StageError:
+    """Stands in for the output of a shard whose stage raised - later stages skip it"""
+
+    def __init__(self, stage, error):
+        self.stage = stage
+        self.error = error
+
+
+def shards_of(items, shard_size=None):
+    shard_size = max(1, int(shard_size or PIPELINE_SHARD_SIZE))
+    return [items[i:i + shard_size] for i in range(0, len(items), shard_size)]
+
+
+def run_pipeline(inputs, stages, queue_size=None):
+    """
+    Push every input through `stages` - a list of (name, fn) or (name, fn, workers) where
+    fn takes the previous stage's output and `workers` threads (default 1) run the stage.
+    Returns (outputs, stats): outputs in input order, with a StageError for any input a
+    stage raised on; stats has wall time and busy time per stage.
+    """
+    stages = [(stage[0], stage[1], max(1, int(stage[2])) if len(stage) > 2 else 1) for stage in stages]
+    queue_size = max(1, int(queue_size or PIPELINE_QUEUE_SIZE))
+    queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+    outputs = [None] * len(inputs)
+    busy = {name: 0.0 for name, _, _ in stages}
+    # Workers of each stage still running - the last one to finish tells the next stage
+    running = [workers for _, _, workers in stages]
+    lock = threading.Lock()
+
+    def worker(stage_index):
+        name, fn, _ = stages[stage_index]
+        source = queues[stage_index]
+        target = queues[stage_index + 1] if stage_index + 1 < len(stages) else None
+        while True:
+            item = source.get()
+            if item is _DONE:
+                # Let this stage's other workers see the end too
+                source.put(_DONE)
+                with lock:
+                    running[stage_index] -= 1
+                    last = running[stage_index] == 0
+                if last and target is not None:
+                    target.put(_DONE)
+                return
+            index, value = item
+            if not isinstance(value, StageError):
+                started = time.monotonic()
+                try:
+                    value = fn(value)
+                except Exception as e:
+                    import traceback
+                    traceback.print_exc()
+                    print(f"  ❌ Pipeline stage '{name}' failed for shard {index + 1}: {e}")
+                    value = StageError(name, e)
+                with lock:
+                    busy[name] += time.monotonic() - started
+            if target is not None:
+                target.put((index, value))  # blocks while the next stage is behind
+            else:
+                outputs[index] = value
+
+    started = time.monotonic()
+    threads = [
+        threading.Thread(target=worker, args=(i,), name=f'pipeline-{name}-{n + 1}', daemon=True)
+        for i, (name, _, workers) in enumerate(stages)
+        for n in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    for item in enumerate(inputs):
+        queues[0].put(item)
+    queues[0].put(_DONE)
+    for thread in threads:
+        thread.join()
+
+    wall = time.monotonic() - started
+    return outputs, {
+        'shards': len(inputs),
+        'wall_seconds': round(wall, 2),
+        'stage_seconds': {name: round(seconds, 2) for name, seconds in busy.items()},
+        'sequential_seconds': round(sum(busy.values()), 2)
+    }
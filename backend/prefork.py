@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Shared-state setup for the pre-forking production server (see gunicorn.conf.py).
+
+warm_shared_state() runs once in the master process after the app is imported and
+before any worker is forked: it builds the SSL context the HTTP clients share, loads
+the Google service account with an access token (for gspread and for async_io), fills
+the client criteria cache and creates the SQLite stores. Workers inherit all of it,
+so adding workers or restarting them costs no warm-up. gunicorn.conf.py turns the
+criteria cache on (CRITERIA_CACHE_SECONDS) unless it is set explicitly.
+
+reset_after_fork() runs first in every worker and replaces what must not be shared
+between processes - locks, thread pools and HTTP connection pools - and gives the
+worker its share of the LLM rate limits.
+
+The on-disk stores (run journal, task queue, reasoning cache, similarity index) are
+SQLite databases opened per operation, so workers share them safely.
+"""
+
+import os
+import time
+
+# Spreadsheets whose Clients tab is preloaded besides the default one (comma-separated ids)
+PREFORK_WARM_SHEETS = [sheet_id.strip() for sheet_id in os.getenv('PREFORK_WARM_SHEETS', '').split(',') if sheet_id.strip()]
+
+
+def _warm_criteria():
+    import sheets_api
+    if sheets_api.CRITERIA_CACHE_SECONDS <= 0:
+        return 'cache disabled'
+    counts = {}
+    for sheet_id in [None] + PREFORK_WARM_SHEETS:
+        criteria_by_client = sheets_api.load_clients_criteria(sheet_id, refresh=True)
+        counts[sheet_id or sheets_api.DEFAULT_SPREADSHEET_ID] = len(criteria_by_client or {})
+    return counts
+
+
+def _warm_sqlite():
+    # A cheap read creates each database and its schema once, instead of in every worker at once
+    import reasoning
+    import run_journal
+    import similarity_index
+    import task_queue
+    run_journal.list_runs(1)
+    task_queue.batch_status('')
+    reasoning.get_cached('')
+    similarity_index.nearest_similar('', [])
+    return 4
+
+
+def warm_shared_state():
+    """Load everything the workers should inherit. Failures are logged, never fatal."""
+    import async_io
+    import llm_gateway
+    import sheets_api
+    steps = [
+        ('ssl_context', lambda: bool(llm_gateway.shared_ssl_context())),
+        ('credentials', lambda: bool(async_io.warm_credentials())),
+        ('gspread_client', sheets_api.warm_gspread_client),
+        ('criteria', _warm_criteria),
+        ('sqlite', _warm_sqlite),
+    ]
+    summary = {}
+    for name, step in steps:
+        started = time.monotonic()
+        try:
+            result = step()
+            print(f"🔥 Warmed {name} in {time.monotonic() - started:.2f}s: {result}")
+            summary[name] = result
+        except Exception as e:
+            print(f"⚠️  Could not warm {name}: {e}")
+            summary[name] = None
+    return summary
+
+
+def reset_after_fork(worker_count=1):
+    """Per-worker state for a freshly forked worker that shares the limits with `worker_count` workers"""
+    import async_io
+    import llm_gateway
+    import sheets_api
+    llm_gateway.reset_after_fork(budget_share=1.0 / max(1, worker_count))
+    async_io.reset_after_fork()
+    sheets_api.reset_after_fork()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Offline pre-ranking of candidates against a client's criteria (BM25, no LLM calls).
+Gives recruiters a rough ordering of the unanalyzed list so the most promising
+candidates can be sent for scoring first. The query is the criteria text of the
+scored questions; each candidate's document is their free-text answers.
+New answer texts are tokenized together with one regex pass; words are mapped to criteria
+terms through a vocabulary kept per criteria text and counted with one np.bincount.
+Term counts are cached per (criteria hash, answers hash), so re-ranking a sheet only
+tokenizes new or edited rows; the BM25 scoring itself is a few numpy operations.
+"""
+
+import hashlib
+import re
+import string
+
+import numpy as np
+
+import eligibility
+from answer_dedupe import normalize_answer
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Free-text answer fields of an application dict
+TEXT_FIELDS = ('understanding_of_role', 'why_edf', 'what_stands_out')
+
+# Term counts are kept for this many different criteria texts
+MAX_CACHED_CRITERIA = 8
+
+_SUFFIXES = ('ing', 'ed', 'es', 's')
+
+# A word is a run of anything but whitespace and punctuation
+_WORD = re.compile(r'[^\s' + re.escape(string.punctuation + '‘’“”–—') + r']+')
+# Joins the texts tokenized together (removed from the texts themselves)
+_DOC_BREAK = '\x00'
+
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being below between both
+but by can could did do does doing down during each few for from further had has have having he her here
+hers him his how i if in into is it its itself just me more most my no nor not now of off on once only or
+other our ours out over own same she should so some such than that the their theirs them then there these
+they this those through to too under until up very was we were what when where which while who whom why will
+with would you your yours candidate candidates question answer score scores scored demonstrates demonstrate
+shows show strong good clear clearly evidence example examples e g eg etc
+""".split())
+
+_cache = {}
+
+
+def _stem(word):
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)]
+    return word
+
+
+def query_terms(criteria_text):
+    """Distinct stemmed criteria terms, in order of first appearance"""
+    words = re.findall(r'[a-z0-9]+', normalize_answer(criteria_text))
+    return list(dict.fromkeys(_stem(w) for w in words if w not in STOPWORDS and len(w) > 2))
+
+
+def criteria_text_for(client, client_criteria):
+    """Criteria text of the questions the model scores (not the locally answered Yes/No ones)"""
+    if not isinstance(client_criteria, dict):
+        return client_criteria or ''
+    local_questions = {f"Question {q[1:]}" for q in eligibility.DEFAULT_RULES} if eligibility.uses_local_eligibility(client, client_criteria) else set()
+    return '\n'.join(criteria for question, criteria in client_criteria.items() if question not in local_questions)
+
+
+def _new_vocabulary(terms):
+    """
+    Word lookup for one criteria text. Every distinct word seen maps to a group id; a
+    group is the set of terms the word starts with. Group 0 matches no term and group 1
+    is the break between two documents.
+    """
+    return {
+        'term_ids': {term: term_id for term_id, term in enumerate(terms)},
+        'lengths': sorted({len(term) for term in terms}),
+        'words': {_DOC_BREAK: 1},
+        'groups': [(), ()],
+        'group_ids': {(): 0},
+    }
+
+
+def _word_group(vocabulary, word):
+    term_ids = vocabulary['term_ids']
+    group = tuple(term_ids[word[:length]] for length in vocabulary['lengths'] if length <= len(word) and word[:length] in term_ids)
+    group_id = vocabulary['group_ids'].get(group)
+    if group_id is None:
+        group_id = vocabulary['group_ids'][group] = len(vocabulary['groups'])
+        vocabulary['groups'].append(group)
+    return group_id
+
+
+def _term_counts(texts, vocabulary):
+    """
+    (term count row, document length) for each text. A term counts wherever a word
+    starts with it, which also matches its inflected forms. All texts are tokenized in
+    one regex pass and counted with one np.bincount.
+    """
+    words = _WORD.findall(f' {_DOC_BREAK} '.join(text.replace(_DOC_BREAK, ' ') for text in texts).lower())
+    word_groups = vocabulary['words']
+    for word in set(words).difference(word_groups):
+        word_groups[word] = _word_group(vocabulary, word)
+    group_ids = np.fromiter(map(word_groups.__getitem__, words), dtype=np.intp, count=len(words))
+
+    breaks = group_ids == 1
+    doc_ids = np.cumsum(breaks)
+    lengths = np.bincount(doc_ids[~breaks], minlength=len(texts))
+    matched = group_ids > 1
+    groups = vocabulary['groups']
+    group_counts = np.bincount(
+        doc_ids[matched] * len(groups) + group_ids[matched], minlength=len(texts) * len(groups)
+    ).reshape(len(texts), len(groups))
+
+    # Group -> term incidence, so a word matching several terms counts for each
+    group_terms = np.zeros((len(groups), len(vocabulary['term_ids'])), dtype=np.float32)
+    for group_id, group in enumerate(groups):
+        group_terms[group_id, list(group)] = 1
+    term_counts = group_counts.astype(np.float32) @ group_terms
+    return list(zip(term_counts, lengths.tolist()))
+
+
+def bm25_scores(applications, criteria_text):
+    """BM25 score of every application against `criteria_text` (numpy array, application order)"""
+    terms = query_terms(criteria_text)
+    if not terms or not applications:
+        return np.zeros(len(applications), dtype=np.float32)
+    criteria_hash = hashlib.sha256(criteria_text.encode('utf-8')).hexdigest()
+    if criteria_hash not in _cache and len(_cache) >= MAX_CACHED_CRITERIA:
+        _cache.pop(next(iter(_cache)))
+    cached = _cache.get(criteria_hash)
+    if cached is None:
+        cached = _cache[criteria_hash] = {'vocabulary': _new_vocabulary(terms), 'rows': {}}
+    row_cache = cached['rows']
+
+    row_hashes = []
+    new_texts = {}
+    for app in applications:
+        text = '\n'.join(app.get(field) or '' for field in TEXT_FIELDS)
+        row_hash = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+        if row_hash not in row_cache:
+            new_texts[row_hash] = text
+        row_hashes.append(row_hash)
+    if new_texts:
+        row_cache.update(zip(new_texts, _term_counts(list(new_texts.values()), cached['vocabulary'])))
+
+    # Dense document x term matrix of counts
+    entries = [row_cache[row_hash] for row_hash in row_hashes]
+    tf = np.stack([counts for counts, _ in entries])
+    lengths = np.array([length for _, length in entries], dtype=np.float32)
+    doc_count = len(entries)
+
+    doc_freq = (tf > 0).sum(axis=0)
+    idf = np.log(1 + (doc_count - doc_freq + 0.5) / (doc_freq + 0.5))
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(float(lengths.mean()), 1.0))
+    return ((tf * (BM25_K1 + 1)) / (tf + norm[:, None]) * idf).sum(axis=1)
+
+
+def rank_applications(applications, client, client_criteria):
+    """
+    Add 'prerank_score' (BM25, higher is better) and 'prerank' (1 = best) to each
+    application in place. The list order is left unchanged.
+    """
+    scores = bm25_scores(applications, criteria_text_for(client, client_criteria))
+    order = np.argsort(-scores, kind='stable')
+    ranks = np.empty(len(scores), dtype=np.int64)
+    ranks[order] = np.arange(1, len(scores) + 1)
+    for app, score, rank in zip(applications, scores, ranks):
+        app['prerank_score'] = round(float(score), 3)
+        app['prerank'] = int(rank)
+    return applications
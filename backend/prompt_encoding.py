@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Compact encodings for the candidate data embedded in prompts.
+json.dumps(..., indent=2) spends a large share of the input tokens on indentation and
+on repeating every key for every candidate. PROMPT_ENCODING picks the encoding:
+  - 'table'   (default) header-once table: one JSON array per line, column names first
+  - 'records' minified keyed records: one JSON object per line
+  - 'json'    the old indented JSON
+
+    python prompt_encoding.py [records.json]   # token counts for each encoding
+"""
+
+import json
+import os
+import re
+import sys
+
+PROMPT_ENCODING = os.getenv('PROMPT_ENCODING', 'table')
+
+ENCODINGS = ('table', 'records', 'json')
+
+_COMPACT = {'separators': (',', ':'), 'ensure_ascii': False}
+
+# GPT-4o pre-tokenizer split - a close lower bound on the token count when the
+# tiktoken encoding files aren't available (they are downloaded on first use)
+_PRETOKEN_PATTERN = re.compile(r"""'(?:[sdmt]|ll|ve|re)| ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+[\r\n]*|\s*[\r\n]+|\s+(?!\S)|\s+""")
+
+_tokenizer = None
+
+
+def encode_records(records, encoding=None):
+    """Render a list of flat dicts (one per candidate) as prompt text"""
+    encoding = encoding or PROMPT_ENCODING
+    if encoding == 'json':
+        return json.dumps(records, indent=2)
+    if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+        return json.dumps(records, **_COMPACT)
+    if encoding == 'records':
+        return '\n'.join(json.dumps(r, **_COMPACT) for r in records)
+    columns = list(dict.fromkeys(key for r in records for key in r))
+    lines = [json.dumps(columns, **_COMPACT)]
+    lines.extend(json.dumps([r.get(column, '') for column in columns], **_COMPACT) for r in records)
+    return '\n'.join(lines)
+
+
+def encoding_note(encoding=None):
+    """How to read the encoded data - goes in the prompt right before it"""
+    encoding = encoding or PROMPT_ENCODING
+    if encoding == 'table':
+        return "(one JSON array per line: the first line is the column names, every other line is one application)"
+    if encoding == 'records':
+        return "(one JSON object per line, one application each)"
+    return ""
+
+
+def decode_records(text):
+    """Inverse of encode_records for any encoding - returns the list of dicts found in `text`"""
+    start = text.find('[\n  {')
+    if start != -1:
+        try:
+            return json.JSONDecoder().raw_decode(text, start)[0]
+        except ValueError:
+            pass
+    records = []
+    columns = None
+    for line in text.split('\n'):
+        line = line.strip()
+        if not (line.startswith('[') or line.startswith('{')):
+            continue
+        try:
+            value = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(value, dict):
+            records.append(value)
+        elif isinstance(value, list):
+            if columns is None:
+                columns = value
+            else:
+                records.append(dict(zip(columns, value)))
+    return records
+
+
+def count_tokens(text):
+    """Token count with tiktoken when it can load o200k_base, else the pre-tokenizer estimate"""
+    global _tokenizer
+    if _tokenizer is None:
+        try:
+            import tiktoken
+            _tokenizer = tiktoken.get_encoding('o200k_base')
+        except Exception:
+            _tokenizer = False
+    if _tokenizer:
+        return len(_tokenizer.encode(text))
+    return len(_PRETOKEN_PATTERN.findall(text))
+
+
+def compare_encodings(records):
+    """{encoding: tokens} for the same records"""
+    return {encoding: count_tokens(encode_records(records, encoding)) for encoding in ENCODINGS}
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else '../ultils/candidates.json'
+    with open(path, 'r') as f:
+        data = json.load(f)
+    records = data.get('candidates', data) if isinstance(data, dict) else data
+    counts = compare_encodings(records)
+    baseline = counts['json']
+    method = 'tiktoken o200k_base' if _tokenizer else 'pre-tokenizer estimate'
+    print(f"{len(records)} record(s), {method}:")
+    for encoding, tokens in counts.items():
+        print(f"  {encoding:8} {tokens:7} tokens ({100 * (baseline - tokens) / baseline if baseline else 0:.0f}% smaller than json)")
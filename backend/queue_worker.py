@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Queue worker: leases row batches from the task queue, analyzes them and writes the
+results to the sheet. Run as many of these as the LLM rate limits allow, on one host
+or on several hosts sharing TASK_QUEUE_PATH / RUN_JOURNAL_PATH through a filesystem
+with working SQLite locks (both databases use rollback journaling, not WAL):
+
+    python queue_worker.py --worker-id host1-a
+"""
+
+import argparse
+import os
+import socket
+import threading
+import time
+import uuid
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import run_journal
+import task_queue
+from sheets_api import analyze_and_write_to_sheet, resume_analysis_run
+
+
+def _heartbeat_loop(task_id, worker_id, lease_seconds, stop_event, lost_event):
+    """Renew the lease every third of its length until stopped (or the lease is lost)"""
+    while not stop_event.wait(lease_seconds / 3):
+        try:
+            if not task_queue.heartbeat(task_id, worker_id, lease_seconds):
+                print(f"⚠️  Lost lease on task {task_id}")
+                lost_event.set()
+                return
+        except Exception as e:
+            print(f"Warning: heartbeat for task {task_id} failed: {e}")
+
+
+def process_task(task):
+    """
+    Analyze one leased batch. The task id doubles as its run journal id, so a retry
+    after a crashed attempt resumes that attempt instead of re-scoring everything.
+    """
+    payload = task['payload']
+    if run_journal.get_run(task['task_id']):
+        print(f"♻️  Task {task['task_id']} attempt {task['attempts']}: resuming journaled run")
+        return resume_analysis_run(task['task_id'])
+
+    run_id = run_journal.create_run({
+        'client': payload['client'],
+        'job_description': payload['job_description'],
+        'supporting_references': payload['supporting_references'],
+        'sheet_id': payload['sheet_id'],
+        'gid': payload['gid'],
+        'calibration': payload.get('calibration')
+    }, payload['rows'], run_id=task['task_id'])
+    return analyze_and_write_to_sheet(
+        payload['rows'],
+        payload['client'],
+        payload['job_description'],
+        payload['supporting_references'],
+        payload['sheet_id'],
+        payload['gid'],
+        run_id=run_id,
+        calibration_group=payload.get('calibration')
+    )
+
+
+def run_worker(worker_id, lease_seconds=task_queue.TASK_LEASE_SECONDS, poll_interval=5.0, once=False):
+    """Lease and process tasks until the queue is empty (with `once`) or forever"""
+    print(f"👷 Worker {worker_id} started (lease {lease_seconds}s, queue {task_queue.TASK_QUEUE_PATH})")
+    processed = 0
+    while True:
+        task = task_queue.lease(worker_id, lease_seconds)
+        if task is None:
+            if once:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        print(f"⚙️  Worker {worker_id}: task {task['task_id']} rows {task['payload']['rows']} (attempt {task['attempts']})")
+        stop_event = threading.Event()
+        lost_event = threading.Event()
+        heartbeat = threading.Thread(
+            target=_heartbeat_loop,
+            args=(task['task_id'], worker_id, lease_seconds, stop_event, lost_event),
+            daemon=True
+        )
+        heartbeat.start()
+        try:
+            result = process_task(task)
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            result = {'error': str(e)}
+        finally:
+            stop_event.set()
+            heartbeat.join()
+
+        if lost_event.is_set():
+            continue
+        if 'error' in result:
+            task_queue.fail(task['task_id'], worker_id, result['error'])
+        else:
+            task_queue.complete(task['task_id'], worker_id, {
+                'run_id': result.get('run_id'),
+                'results': result.get('results', []),
+                'failed': result.get('failed', [])
+            })
+        processed += 1
+
+    print(f"👷 Worker {worker_id} finished: {processed} task(s) processed")
+    return processed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Process queued sheet analysis tasks')
+    parser.add_argument('--worker-id', default=f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}")
+    parser.add_argument('--lease-seconds', type=int, default=task_queue.TASK_LEASE_SECONDS)
+    parser.add_argument('--poll-interval', type=float, default=5.0)
+    parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+    args = parser.parse_args()
+    run_worker(args.worker_id, args.lease_seconds, args.poll_interval, args.once)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+On-demand detailed reasoning for a scored row.
+Scoring calls only ask for a one-line brief reason; the long explanation is generated
+here when a recruiter opens a candidate, then cached (SQLite) keyed by the candidate's
+answers and written scores - re-scoring a row or editing its answers regenerates it.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+import eligibility
+from llm_gateway import chat_completion
+from prompt_encoding import encode_records
+
+# Serverless filesystems are read-only apart from /tmp
+_default_dir = '/tmp' if os.getenv('VERCEL') else os.path.dirname(os.path.abspath(__file__))
+REASONING_CACHE_PATH = os.getenv('REASONING_CACHE_PATH', os.path.join(_default_dir, 'reasoning_cache.sqlite3'))
+
+# Analysis columns start at V (index 21): overall score, Q1-QN, brief reason, date, client, job description
+ANALYSIS_START_INDEX = 21
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reasoning_cache (
+    cache_key TEXT PRIMARY KEY,
+    sheet_id TEXT,
+    row_number INTEGER NOT NULL,
+    client TEXT,
+    reasoning TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+"""
+
+_initialized = False
+
+
+@contextmanager
+def _db():
+    """Open a connection, commit on success, always close"""
+    global _initialized
+    conn = sqlite3.connect(REASONING_CACHE_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        if not _initialized:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+            _initialized = True
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def get_cached(cache_key):
+    with _db() as conn:
+        row = conn.execute('SELECT reasoning, created_at FROM reasoning_cache WHERE cache_key = ?', (cache_key,)).fetchone()
+    return dict(row) if row else None
+
+
+def save_cached(cache_key, sheet_id, row_number, client, reasoning):
+    with _db() as conn:
+        conn.execute(
+            'INSERT OR REPLACE INTO reasoning_cache (cache_key, sheet_id, row_number, client, reasoning, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+            (cache_key, sheet_id, int(row_number), client, reasoning, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        )
+
+
+def question_count_from_headers(headers):
+    """Highest Qn header in row 1 (the analysis columns), 7 if there are none"""
+    q_count = 0
+    for header in headers:
+        if header.startswith('Q') and header[1:].isdigit():
+            q_count = max(q_count, int(header[1:]))
+    return q_count or 7
+
+
+def written_analysis(row, question_count):
+    """The scores, brief reason, client and job description written to a row"""
+    def cell(index):
+        return row[index].strip() if len(row) > index else ''
+    start = ANALYSIS_START_INDEX
+    return {
+        'overall_score': cell(start),
+        'questions': {f'Q{i}': cell(start + i) for i in range(1, question_count + 1)},
+        'brief_reason': cell(start + question_count + 1),
+        'client': cell(start + question_count + 3),
+        'job_description': cell(start + question_count + 4)
+    }
+
+
+def cache_key_for(sheet_id, gid, app, analysis, client):
+    """Changes whenever the candidate's answers, written scores or the client explained for change"""
+    payload = {
+        'sheet_id': sheet_id,
+        'gid': gid,
+        'row': app['row_number'],
+        'client': client,
+        'answers': {k: v for k, v in app.items() if k not in ('row_number', 'sheet_id')},
+        'analysis': {k: v for k, v in analysis.items() if k != 'job_description'}
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def build_reasoning_messages(app, analysis, client, client_criteria):
+    """Messages asking for a detailed explanation of scores that were already given"""
+    local_questions = {f"Question {q[1:]}" for q in eligibility.DEFAULT_RULES} if eligibility.uses_local_eligibility(client, client_criteria) else set()
+    criteria_text = ""
+    if isinstance(client_criteria, dict):
+        for question_num, criteria in client_criteria.items():
+            if question_num not in local_questions:
+                criteria_text += f"\n{question_num}:\n{criteria}\n"
+    else:
+        criteria_text = 'No specific criteria provided'
+
+    scores_text = ' '.join(f"{q}: {score}" for q, score in analysis['questions'].items() if score)
+    candidate = {
+        'Name': f"{app['first_name']} {app['surname']}",
+        'University': app['university'],
+        'Course': app['course'],
+        'Understanding_of_role': app.get('understanding_of_role', ''),
+        'Why_EDF': app.get('why_edf', ''),
+        'What_stands_out': app.get('what_stands_out', '')
+    }
+
+    prompt = f"""This candidate for {client} has already been scored. Explain the scores in detail - DO NOT change them.
+
+Candidate:
+{encode_records([candidate], 'records')}
+
+Scores given: Overall {analysis['overall_score']} - {scores_text}
+Brief reason given: {analysis['brief_reason']}
+
+Client criteria for the scored questions:
+{criteria_text}
+
+For each scored question, explain why the candidate received that score:
+- Quote or point to specific parts of their answer
+- Say which criteria they met and which they missed
+- Say what would have earned a higher score
+
+Finish with 1-2 sentences on the candidate overall. Keep it under 300 words, plain text, no headings."""
+
+    return [
+        {"role": "system", "content": f"You are an early careers recruiter for {client} explaining a sifting decision to a colleague. Be specific and fair, and stick to the scores you are given."},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def get_detailed_reasoning(row_number, client=None, sheet_id=None, gid=None, refresh=False):
+    """
+    Detailed reasoning for an analyzed row, from the cache or generated now.
+    `client` defaults to the client written with the row's analysis.
+    """
+    from sheets_api import get_spreadsheet, get_worksheet, build_application_from_row, get_client_criteria_from_sheet
+
+    spreadsheet = get_spreadsheet(sheet_id)
+    worksheet = get_worksheet(spreadsheet, gid)
+    headers = worksheet.row_values(1)
+    row = worksheet.row_values(row_number)
+
+    question_count = question_count_from_headers(headers)
+    analysis = written_analysis(row, question_count)
+    if not analysis['overall_score']:
+        return {'error': f'Row {row_number} has not been analyzed yet'}
+
+    client = client or analysis['client']
+    app = build_application_from_row(row, row_number)
+    cache_key = cache_key_for(sheet_id, gid, app, analysis, client)
+
+    if not refresh:
+        cached = get_cached(cache_key)
+        if cached:
+            return {
+                'success': True,
+                'row': row_number,
+                'name': f"{app['first_name']} {app['surname']}",
+                'client': client,
+                'reasoning': cached['reasoning'],
+                'generated_at': cached['created_at'],
+                'cached': True
+            }
+
+    client_criteria = get_client_criteria_from_sheet(client, sheet_id)
+    print(f"🧠 Generating detailed reasoning for row {row_number} ({client})")
+    response = chat_completion(
+        purpose='detailed_reasoning',
+        model="gpt-4o-mini",
+        messages=build_reasoning_messages(app, analysis, client, client_criteria),
+        max_tokens=800,
+        temperature=0,
+        top_p=1
+    )
+    reasoning = response.choices[0].message.content.strip()
+    save_cached(cache_key, sheet_id, row_number, client, reasoning)
+
+    return {
+        'success': True,
+        'row': row_number,
+        'name': f"{app['first_name']} {app['surname']}",
+        'client': client,
+        'reasoning': reasoning,
+        'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'cached': False
+    }
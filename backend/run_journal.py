@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Durable run journal (SQLite) for sheet analysis runs.
+Records per-row state (queued -> scored -> written, or failed) and the raw output
+of every scoring pass, so an interrupted run can be resumed re-executing only the
+work that didn't finish. It also holds the fixed anchor scores of calibration groups
+(see calibration.py) and version stamps that tell every worker (and host) sharing
+the file when a per-process cache is out of date.
+"""
+
+import json
+import os
+import sqlite3
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+# Serverless filesystems are read-only apart from /tmp
+_default_dir = '/tmp' if os.getenv('VERCEL') else os.path.dirname(os.path.abspath(__file__))
+RUN_JOURNAL_PATH = os.getenv('RUN_JOURNAL_PATH', os.path.join(_default_dir, 'run_journal.sqlite3'))
+# Rollback journaling works on shared (network) filesystems, WAL only on one host
+RUN_JOURNAL_MODE = os.getenv('RUN_JOURNAL_MODE', 'DELETE').upper()
+
+ROW_STATES = ('queued', 'scored', 'written', 'failed')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS run_rows (
+    run_id TEXT NOT NULL,
+    row_number INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    analysis_line TEXT,
+    raw_scores TEXT,
+    score TEXT,
+    error TEXT,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (run_id, row_number)
+);
+CREATE TABLE IF NOT EXISTS run_passes (
+    run_id TEXT NOT NULL,
+    pass_key TEXT NOT NULL,
+    pass_num INTEGER NOT NULL,
+    output TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (run_id, pass_key, pass_num)
+);
+CREATE TABLE IF NOT EXISTS calibration_refs (
+    calibration_key TEXT NOT NULL,
+    pass_id TEXT NOT NULL,
+    anchor_lines TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (calibration_key, pass_id)
+);
+CREATE TABLE IF NOT EXISTS stamps (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    updated_at TEXT NOT NULL
+);
+"""
+
+
+_initialized = False
+
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+@contextmanager
+def _db():
+    """Open a connection, commit on success, always close"""
+    global _initialized
+    conn = sqlite3.connect(RUN_JOURNAL_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        if not _initialized:
+            conn.execute(f'PRAGMA journal_mode={RUN_JOURNAL_MODE}')
+            conn.executescript(_SCHEMA)
+            _initialized = True
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def pass_key_for(row_numbers):
+    """Stable key identifying the set of rows a scoring pass covered"""
+    return ','.join(str(r) for r in sorted(int(r) for r in row_numbers))
+
+
+def create_run(params, row_numbers, run_id=None):
+    """Start a new run with every row queued. Returns the run id."""
+    run_id = run_id or uuid.uuid4().hex
+    now = _now()
+    with _db() as conn:
+        conn.execute(
+            'INSERT INTO runs (run_id, status, params, created_at, updated_at) VALUES (?, ?, ?, ?, ?)',
+            (run_id, 'running', json.dumps(params), now, now)
+        )
+        conn.executemany(
+            'INSERT INTO run_rows (run_id, row_number, state, updated_at) VALUES (?, ?, ?, ?)',
+            [(run_id, int(r), 'queued', now) for r in row_numbers]
+        )
+    return run_id
+
+
+def update_run_params(run_id, updates):
+    """Merge `updates` into a run's stored params (e.g. ids of external work it is waiting on)"""
+    with _db() as conn:
+        row = conn.execute('SELECT params FROM runs WHERE run_id = ?', (run_id,)).fetchone()
+        if row is None:
+            return
+        params = json.loads(row['params'])
+        params.update(updates)
+        conn.execute('UPDATE runs SET params = ?, updated_at = ? WHERE run_id = ?', (json.dumps(params), _now(), run_id))
+
+
+def set_run_status(run_id, status):
+    with _db() as conn:
+        conn.execute('UPDATE runs SET status = ?, updated_at = ? WHERE run_id = ?', (status, _now(), run_id))
+
+
+def save_pass_output(run_id, pass_key, pass_num, output):
+    with _db() as conn:
+        conn.execute(
+            'INSERT OR REPLACE INTO run_passes (run_id, pass_key, pass_num, output, created_at) VALUES (?, ?, ?, ?, ?)',
+            (run_id, pass_key, int(pass_num), output, _now())
+        )
+
+
+def get_pass_outputs(run_id, pass_key):
+    """Return {pass_num: output} for passes already completed over exactly these rows"""
+    with _db() as conn:
+        rows = conn.execute(
+            'SELECT pass_num, output FROM run_passes WHERE run_id = ? AND pass_key = ?',
+            (run_id, pass_key)
+        ).fetchall()
+    return {row['pass_num']: row['output'] for row in rows}
+
+
+def record_scored(run_id, row_number, analysis_line, raw_scores):
+    """Row has averaged scores but isn't written to the sheet yet"""
+    with _db() as conn:
+        conn.execute(
+            'UPDATE run_rows SET state = ?, analysis_line = ?, raw_scores = ?, error = NULL, updated_at = ? WHERE run_id = ? AND row_number = ?',
+            ('scored', analysis_line, json.dumps(raw_scores), _now(), run_id, int(row_number))
+        )
+
+
+def record_written(run_id, row_number, score):
+    with _db() as conn:
+        conn.execute(
+            'UPDATE run_rows SET state = ?, score = ?, error = NULL, updated_at = ? WHERE run_id = ? AND row_number = ?',
+            ('written', str(score), _now(), run_id, int(row_number))
+        )
+
+
+def record_failed(run_id, row_number, error):
+    with _db() as conn:
+        conn.execute(
+            'UPDATE run_rows SET state = ?, error = ?, updated_at = ? WHERE run_id = ? AND row_number = ? AND state != ?',
+            ('failed', error, _now(), run_id, int(row_number), 'written')
+        )
+
+
+def get_rows(run_id, states=None):
+    """Return the run's rows (optionally only those in `states`) ordered by row number"""
+    with _db() as conn:
+        rows = conn.execute(
+            'SELECT * FROM run_rows WHERE run_id = ? ORDER BY row_number', (run_id,)
+        ).fetchall()
+    result = []
+    for row in rows:
+        if states and row['state'] not in states:
+            continue
+        result.append({
+            'row_number': row['row_number'],
+            'state': row['state'],
+            'analysis_line': row['analysis_line'],
+            'raw_scores': json.loads(row['raw_scores']) if row['raw_scores'] else None,
+            'score': row['score'],
+            'error': row['error']
+        })
+    return result
+
+
+def get_run(run_id):
+    """Return run params, status and per-state row counts, or None if unknown"""
+    with _db() as conn:
+        run = conn.execute('SELECT * FROM runs WHERE run_id = ?', (run_id,)).fetchone()
+        if run is None:
+            return None
+        counts = conn.execute(
+            'SELECT state, COUNT(*) AS n FROM run_rows WHERE run_id = ? GROUP BY state', (run_id,)
+        ).fetchall()
+    state_counts = {state: 0 for state in ROW_STATES}
+    for row in counts:
+        state_counts[row['state']] = row['n']
+    return {
+        'run_id': run['run_id'],
+        'status': run['status'],
+        'params': json.loads(run['params']),
+        'created_at': run['created_at'],
+        'updated_at': run['updated_at'],
+        'rows': state_counts
+    }
+
+
+def list_runs(limit=50):
+    with _db() as conn:
+        run_ids = [row['run_id'] for row in conn.execute(
+            'SELECT run_id FROM runs ORDER BY created_at DESC LIMIT ?', (limit,)
+        ).fetchall()]
+    return [get_run(run_id) for run_id in run_ids]
+
+
+def claim_calibration_reference(calibration_key, pass_id, anchor_lines):
+    """
+    The reference anchor lines ({row: line}) of a calibration group's pass: the first
+    `anchor_lines` offered for it are kept, and every later caller gets those back.
+    """
+    with _db() as conn:
+        conn.execute(
+            'INSERT OR IGNORE INTO calibration_refs (calibration_key, pass_id, anchor_lines, created_at) VALUES (?, ?, ?, ?)',
+            (calibration_key, pass_id, json.dumps(anchor_lines), _now())
+        )
+        row = conn.execute(
+            'SELECT anchor_lines FROM calibration_refs WHERE calibration_key = ? AND pass_id = ?',
+            (calibration_key, pass_id)
+        ).fetchone()
+    return json.loads(row['anchor_lines'])
+
+
+def get_stamp(name):
+    """Current version of stamp `name` (0 if it was never bumped)"""
+    with _db() as conn:
+        row = conn.execute('SELECT version FROM stamps WHERE name = ?', (name,)).fetchone()
+    return row['version'] if row else 0
+
+
+def bump_stamp(name):
+    """Advance stamp `name`, so caches holding an older version reload"""
+    with _db() as conn:
+        conn.execute(
+            """INSERT INTO stamps (name, version, updated_at) VALUES (?, 1, ?)
+               ON CONFLICT(name) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at""",
+            (name, _now())
+        )
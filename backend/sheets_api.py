@@ -9,14 +9,68 @@ import os
 import json
 import base64
 from dotenv import load_dotenv
-from openai import OpenAI
+from llm_gateway import chat_completion, hedged_chat_completion, stream_chat_completion, CircuitOpenError, is_timeout_error
+from batch_controller import call_batch, request_batch
+from logprob_scoring import expected_scores_from_logprobs, LOGPROB_CONFIDENCE_THRESHOLD, LOGPROB_TOP_N
+from prompt_encoding import encode_records, encoding_note
+import run_journal
+import eligibility
+import field_budget
+import answer_dedupe
+import similarity_index
+import prerank
+import calibration
+import pipeline
+from pipeline import PIPELINE_SHARD_SIZE
+from deadline import Deadline, encode_continuation, DEADLINE_CHUNK_SIZE
 from datetime import datetime
 import re
 import sys
+import threading
+import time
+import uuid
 import pandas as pd
 
 load_dotenv()
 
+# Maximum depth for bisect-and-retry of truncated scoring batches (2^4 = 16-way split)
+MAX_BISECT_DEPTH = 4
+
+# 'consensus' = 3 averaged passes; 'logprob' = one call scored from token logprobs,
+# with the extra passes only for low-confidence candidates; 'cascade' = one scores-only
+# triage pass over everyone, then the 3 passes only for candidates in the cascade band
+SCORING_MODE = os.getenv('SCORING_MODE', 'consensus')
+
+# Cascade band as a fraction of the max score - triage scores inside it get full scoring
+CASCADE_BAND_MIN = float(os.getenv('CASCADE_BAND_MIN', '0.5'))
+CASCADE_BAND_MAX = float(os.getenv('CASCADE_BAND_MAX', '1.0'))
+CASCADE_TRIAGE_REASON = 'Triage only - outside the shortlist band'
+
+# Clients tab contents are cached per spreadsheet for this long (0 = always re-read, the
+# default). A cached copy is also dropped once the spreadsheet's criteria stamp in the
+# run journal moves on, so a client added or deleted through any worker is seen by all.
+# A client missing from the cache triggers one re-read, so new clients show up at once.
+CRITERIA_CACHE_SECONDS = float(os.getenv('CRITERIA_CACHE_SECONDS', '0'))
+
+_criteria_cache = {}  # {spreadsheet_id: (loaded_at, stamp, {client_name: criteria})}
+_criteria_cache_lock = threading.Lock()
+
+def journal(fn, *args):
+    """Call a run_journal function; journal problems are logged but never break an analysis"""
+    try:
+        return fn(*args)
+    except Exception as e:
+        print(f"Warning: run journal {fn.__name__} failed: {e}")
+        return None
+
+def analysis_line_for_row(analysis, row_number):
+    """Return the score line for a row from the analysis text, or None"""
+    for line in analysis.split('\n'):
+        row_match = re.search(r'Row\s+(\d+)', line)
+        if row_match and row_match.group(1) == str(row_number) and 'Overall Score' in line:
+            return line
+    return None
+
 def average_analysis_scores_sheets(analyses):
     """
     Average scores from multiple analysis runs for sheets.
@@ -99,10 +153,13 @@ def average_analysis_scores_sheets(analyses):
     for row_num, runs in all_row_scores.items():
         if not runs:
             continue
+        
+        # A row may be missing from some runs (e.g. a failed or truncated pass) - fall back to its earliest run
+        first_run = runs[min(runs)]
             
         overall_scores = [run['overall'] for run in runs.values()]
         avg_overall = sum(overall_scores) / len(overall_scores)
-        max_score = runs[1]['max_score'] if 1 in runs else 15
+        max_score = first_run['max_score']
         
         # Store raw overall scores for debugging
         raw_scores_by_row[row_num] = {'overall': overall_scores}
@@ -124,8 +181,8 @@ def average_analysis_scores_sheets(analyses):
                 # Store raw scores for this question
                 raw_scores_by_row[row_num][q_key] = q_values
             else:
-                avg_questions[q_key] = runs[1]['questions'].get(q_key, 'N/A')
-                raw_scores_by_row[row_num][q_key] = [runs[1]['questions'].get(q_key, 'N/A')]
+                avg_questions[q_key] = first_run['questions'].get(q_key, 'N/A')
+                raw_scores_by_row[row_num][q_key] = [first_run['questions'].get(q_key, 'N/A')]
         
         averaged_scores[row_num] = {
             'overall': avg_overall,
@@ -133,43 +190,53 @@ def average_analysis_scores_sheets(analyses):
             'questions': avg_questions
         }
     
+    def build_averaged_line(row_num, line):
+        scores = averaged_scores[row_num]
+        
+        reason_match = re.search(r'-\s*([^*\n]+?)(?:\*\*)?$', line)
+        brief_reason = reason_match.group(1).strip() if reason_match else ''
+        
+        score_parts = []
+        for q_key in sorted(scores['questions'].keys(), key=lambda x: int(re.search(r'\d+', x).group())):
+            q_num = re.search(r'\d+', q_key).group()
+            val = scores['questions'][q_key]
+            if isinstance(val, (int, float)):
+                score_parts.append(f"Q{q_num}: {val:.2f}*")
+            else:
+                score_parts.append(f"Q{q_num}: {val}")
+        
+        return f"Row {row_num} - Overall Score **{scores['overall']:.2f}/{scores['max_score']}** - {' '.join(score_parts)} - {brief_reason}"
+    
     # Rebuild analysis with averaged scores
     result_lines = []
     first_analysis_lines = analyses[0].split('\n')
+    written_rows = set()
     
     for line in first_analysis_lines:
         row_match = re.search(r'Row\s+(\d+)', line)
         if row_match and 'Overall Score' in line and row_match.group(1) in averaged_scores:
             row_num = row_match.group(1)
-            scores = averaged_scores[row_num]
-            
-            reason_match = re.search(r'-\s*([^*\n]+?)(?:\*\*)?$', line)
-            brief_reason = reason_match.group(1).strip() if reason_match else ''
-            
-            score_parts = []
-            for q_key in sorted(scores['questions'].keys(), key=lambda x: int(re.search(r'\d+', x).group())):
-                q_num = re.search(r'\d+', q_key).group()
-                val = scores['questions'][q_key]
-                if isinstance(val, (int, float)):
-                    score_parts.append(f"Q{q_num}: {val:.2f}*")
-                else:
-                    score_parts.append(f"Q{q_num}: {val}")
-            
-            new_line = f"Row {row_num} - Overall Score **{scores['overall']:.2f}/{scores['max_score']}** - {' '.join(score_parts)} - {brief_reason}"
-            result_lines.append(new_line)
+            result_lines.append(build_averaged_line(row_num, line))
+            written_rows.add(row_num)
         else:
             result_lines.append(line)
     
+    # Rows the first run missed still get a line, using the reason from the first run that scored them
+    for analysis in analyses[1:]:
+        for line in analysis.split('\n'):
+            row_match = re.search(r'Row\s+(\d+)', line)
+            if row_match and 'Overall Score' in line and row_match.group(1) in averaged_scores and row_match.group(1) not in written_rows:
+                row_num = row_match.group(1)
+                result_lines.append(build_averaged_line(row_num, line))
+                written_rows.add(row_num)
+    
     return '\n'.join(result_lines), raw_scores_by_row
 
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 DEFAULT_SPREADSHEET_ID = "1jDJDQXPoZE6NTAqfTaCILv8ULXpM_vl5WeiEVSplChU"
 
-# Initialize OpenAI client
-openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-
-def get_spreadsheet(sheet_id=None):
-    """Get authenticated spreadsheet connection"""
+def load_credentials():
+    """Service account credentials from the environment (Vercel/Production) or google_credentials.json"""
     # Try to get credentials from environment (Vercel/Production)
     creds_json = os.getenv('GOOGLE_APPLICATION_CREDENTIALS_JSON')
     
@@ -193,35 +260,56 @@ def get_spreadsheet(sheet_id=None):
         # Use local file (development)
         creds = Credentials.from_service_account_file('google_credentials.json', scopes=SCOPES)
         print("Using Google credentials from local file")
-    
-    client = gspread.authorize(creds)
+    return creds
+
+# One authorized gspread client per process - its credentials refresh their own token
+_gspread_client = None
+_gspread_client_lock = threading.Lock()
+
+def get_gspread_client():
+    """The process's authorized gspread client, created on first use"""
+    global _gspread_client
+    with _gspread_client_lock:
+        if _gspread_client is None:
+            _gspread_client = gspread.authorize(load_credentials())
+        return _gspread_client
+
+def warm_gspread_client():
+    """Create the gspread client and fetch its access token now rather than on the first request"""
+    from google.auth.transport.requests import Request
+    credentials = get_gspread_client().http_client.auth
+    if not credentials.valid:
+        credentials.refresh(Request())
+    return credentials.valid
+
+def get_spreadsheet(sheet_id=None):
+    """Get authenticated spreadsheet connection"""
+    client = get_gspread_client()
     spreadsheet_id = sheet_id or DEFAULT_SPREADSHEET_ID
     return client.open_by_key(spreadsheet_id)
 
-def get_unanalyzed_applications(sheet_id=None, gid=None):
-    """
-    Get all applications that don't have analysis yet (column V is empty)
-    Returns list of applications with row numbers
-    """
-    spreadsheet = get_spreadsheet(sheet_id)
-    
-    # Get worksheet by gid if provided, otherwise use first sheet
+def get_worksheet(spreadsheet, gid=None):
+    """Get worksheet by gid if provided, otherwise use first sheet"""
     if gid:
         try:
-            # Find worksheet by gid
-            worksheet = None
             for sheet in spreadsheet.worksheets():
                 if str(sheet.id) == str(gid):
-                    worksheet = sheet
-                    break
-            if not worksheet:
-                print(f"Warning: Worksheet with gid={gid} not found, using first sheet")
-                worksheet = spreadsheet.get_worksheet(0)
+                    return sheet
+            print(f"Warning: Worksheet with gid={gid} not found, using first sheet")
         except Exception as e:
             print(f"Error finding worksheet by gid: {e}, using first sheet")
-            worksheet = spreadsheet.get_worksheet(0)
-    else:
-        worksheet = spreadsheet.get_worksheet(0)
+    return spreadsheet.get_worksheet(0)
+
+def get_unanalyzed_applications(sheet_id=None, gid=None, client=None):
+    """
+    Get all applications that don't have analysis yet (column V is empty)
+    Returns list of applications with row numbers
+    With a `client`, each application also gets an offline pre-rank against the client's
+    criteria ('prerank' - 1 is the best match - and 'prerank_score'), see prerank.py.
+    """
+    spreadsheet = get_spreadsheet(sheet_id)
+    
+    worksheet = get_worksheet(spreadsheet, gid)
     
     print(f"Using worksheet: {worksheet.title} (id: {worksheet.id})")
     
@@ -256,6 +344,26 @@ def get_unanalyzed_applications(sheet_id=None, gid=None):
             }
             unanalyzed.append(application)
     
+    # Keep the near-duplicate index up to date with every row read (only changed rows are re-indexed)
+    sheet_key = similarity_index.sheet_key_for(sheet_id, gid)
+    try:
+        similarity_index.index_rows(sheet_key, {row_idx: row for row_idx, row in enumerate(all_values[1:], start=2) if row}, full_sheet=True)
+        nearest = similarity_index.nearest_similar(sheet_key, [app['row_number'] for app in unanalyzed])
+        for app in unanalyzed:
+            match = nearest.get(app['row_number'])
+            app['similar_to_row'] = match['row'] if match else None
+            app['similarity'] = match['similarity'] if match else None
+    except Exception as e:
+        print(f"Warning: Could not update similarity index: {e}")
+    
+    if client and unanalyzed:
+        try:
+            started = time.monotonic()
+            prerank.rank_applications(unanalyzed, client, get_client_criteria_from_sheet(client, sheet_id))
+            print(f"📈 Pre-ranked {len(unanalyzed)} application(s) against {client} criteria in {time.monotonic() - started:.2f}s")
+        except Exception as e:
+            print(f"Warning: Could not pre-rank applications: {e}")
+    
     return unanalyzed
 
 def get_analyzed_applications(sheet_id=None, gid=None):
@@ -266,23 +374,7 @@ def get_analyzed_applications(sheet_id=None, gid=None):
     """
     spreadsheet = get_spreadsheet(sheet_id)
     
-    # Get worksheet by gid if provided, otherwise use first sheet
-    if gid:
-        try:
-            # Find worksheet by gid
-            worksheet = None
-            for sheet in spreadsheet.worksheets():
-                if str(sheet.id) == str(gid):
-                    worksheet = sheet
-                    break
-            if not worksheet:
-                print(f"Warning: Worksheet with gid={gid} not found, using first sheet")
-                worksheet = spreadsheet.get_worksheet(0)
-        except Exception as e:
-            print(f"Error finding worksheet by gid: {e}, using first sheet")
-            worksheet = spreadsheet.get_worksheet(0)
-    else:
-        worksheet = spreadsheet.get_worksheet(0)
+    worksheet = get_worksheet(spreadsheet, gid)
     
     print(f"Using worksheet: {worksheet.title} (id: {worksheet.id})")
     
@@ -392,197 +484,830 @@ def ensure_headers_exist(worksheet, question_count, start_col=22):
     except Exception as e:
         print(f"Warning: Could not ensure headers exist: {e}")
 
-def analyze_and_write_to_sheet(selected_rows, client, job_description, supporting_references='', sheet_id=None, gid=None):
-    """
-    Analyze selected applications and write results back to the spreadsheet
-    """
-    spreadsheet = get_spreadsheet(sheet_id)
-    
-    # Get worksheet by gid if provided, otherwise use first sheet
-    if gid:
-        try:
-            worksheet = None
-            for sheet in spreadsheet.worksheets():
-                if str(sheet.id) == str(gid):
-                    worksheet = sheet
-                    break
-            if not worksheet:
-                print(f"Warning: Worksheet with gid={gid} not found, using first sheet")
-                worksheet = spreadsheet.get_worksheet(0)
-        except Exception as e:
-            print(f"Error finding worksheet by gid: {e}, using first sheet")
-            worksheet = spreadsheet.get_worksheet(0)
-    else:
-        worksheet = spreadsheet.get_worksheet(0)
-    
-    print(f"Writing to worksheet: {worksheet.title} (id: {worksheet.id})")
+def build_application_from_row(row, row_num, sheet_id=None):
+    """Build the application dict used for scoring from a raw sheet row"""
+    return {
+        'row_number': row_num,
+        'sheet_id': sheet_id,
+        'first_name': row[2] if len(row) > 2 else '',
+        'surname': row[3] if len(row) > 3 else '',
+        'university': row[7] if len(row) > 7 else '',
+        'course': row[8] if len(row) > 8 else '',
+        'right_to_work': row[10] if len(row) > 10 else '',
+        'visa_sponsorship': row[11] if len(row) > 11 else '',
+        'gcse_maths': row[12] if len(row) > 12 else '',
+        'available_sept_2026': row[13] if len(row) > 13 else '',
+        'understanding_of_role': row[14] if len(row) > 14 else '',
+        'why_edf': row[15] if len(row) > 15 else '',
+        'what_stands_out': row[16] if len(row) > 16 else '',
+    }
+
+def write_scores_to_row(worksheet, row_num, scores, raw_scores_by_row, client, job_description, question_count):
+    """Write one row's scores (Overall Score, Q1-QN, metadata, per-pass overall scores) starting at column V"""
+    # Start at column V (column 22, index 21)
+    start_col = 22
     
-    all_values = worksheet.get_all_values()
+    # Build values array: Overall Score, then all Q1-QN scores, then metadata
+    # Ensure overall_score doesn't contain "/max_score" - strip it if present
+    overall_score_value = scores.get('overall_score', '')
+    if isinstance(overall_score_value, str) and '/' in overall_score_value:
+        overall_score_value = overall_score_value.split('/')[0].strip()
     
-    # Build applications data for selected rows
-    applications = []
-    for row_num in selected_rows:
-        row = all_values[row_num - 1]  # Convert to 0-indexed
-        app = {
-            'row_number': row_num,
-            'sheet_id': sheet_id,
-            'first_name': row[2] if len(row) > 2 else '',
-            'surname': row[3] if len(row) > 3 else '',
-            'university': row[7] if len(row) > 7 else '',
-            'course': row[8] if len(row) > 8 else '',
-            'right_to_work': row[10] if len(row) > 10 else '',
-            'visa_sponsorship': row[11] if len(row) > 11 else '',
-            'gcse_maths': row[12] if len(row) > 12 else '',
-            'available_sept_2026': row[13] if len(row) > 13 else '',
-            'understanding_of_role': row[14] if len(row) > 14 else '',
-            'why_edf': row[15] if len(row) > 15 else '',
-            'what_stands_out': row[16] if len(row) > 16 else '',
-        }
-        applications.append(app)
+    values_row = [overall_score_value]
     
-    # Get client criteria for dynamic scoring
-    client_criteria = get_client_criteria_from_sheet(client, sheet_id)
-    
-    # Determine number of questions from client criteria
-    question_count = 3  # default
-    if isinstance(client_criteria, dict) and client_criteria:
-        question_count = len(client_criteria)
+    # Add all question scores dynamically (Q1, Q2, Q3, Q4, Q5, Q6, Q7, etc.)
+    for q_num in range(1, question_count + 1):
+        q_key = f'q{q_num}_score'
+        q_score = scores.get(q_key, 'N/A')
+        
+        # Check if it's a Yes/No answer (don't convert to star formula)
+        if q_score and q_score.upper() in ['YES', 'NO']:
+            values_row.append(q_score)
+        else:
+            # Extract numeric value for star formula (handles decimals)
+            q_num_val = q_score.replace('*', '') if q_score and q_score != 'N/A' else ''
+            
+            # Create formula for star rendering if it's a valid number (integer or decimal)
+            try:
+                # Try to convert to float to validate it's a number
+                float_val = float(q_num_val)
+                # For display, we'll show the decimal score as text since REPT only works with integers
+                # We can't use REPT with decimals, so just display the score with a star
+                q_formula = f'{q_num_val}*'
+            except (ValueError, TypeError):
+                q_formula = q_score
+            
+            values_row.append(q_formula)
     
-    # Ensure headers exist in the spreadsheet
-    ensure_headers_exist(worksheet, question_count, start_col=22)
+    # Get the 3 individual overall scores for debugging
+    # IMPORTANT: Only write numeric scores, never the old format
+    row_num_str = str(row_num)
+    overall_score_1 = ""
+    overall_score_2 = ""
+    overall_score_3 = ""
     
-    # Analyze with AI
-    analysis_result = analyze_applications_ai(applications, client, job_description, supporting_references)
+    if row_num_str in raw_scores_by_row:
+        raw = raw_scores_by_row[row_num_str]
+        if 'overall' in raw and isinstance(raw['overall'], list):
+            overall_list = raw['overall']
+            
+            # Filter out any non-numeric values
+            numeric_scores = [s for s in overall_list if isinstance(s, (int, float))]
+            
+            # Only write the first 3 numeric scores
+            if len(numeric_scores) >= 1:
+                overall_score_1 = f"{float(numeric_scores[0]):.2f}"
+            if len(numeric_scores) >= 2:
+                overall_score_2 = f"{float(numeric_scores[1]):.2f}"
+            if len(numeric_scores) >= 3:
+                overall_score_3 = f"{float(numeric_scores[2]):.2f}"
+        else:
+            print(f"Warning: Row {row_num} - 'overall' not found in raw_scores_by_row or is not a list")
+            print(f"  Available keys: {list(raw.keys()) if row_num_str in raw_scores_by_row else 'Row not found'}")
+    else:
+        print(f"Warning: Row {row_num} not found in raw_scores_by_row")
+        print(f"  Available row numbers: {list(raw_scores_by_row.keys())}")
     
-    if not analysis_result:
-        return {'error': 'Analysis failed'}
+    # Add metadata columns
+    values_row.extend([
+        scores.get('brief_reason', ''),
+        datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        client,
+        job_description,
+        overall_score_1,  # Only numeric score, e.g., "10.00"
+        overall_score_2,  # Only numeric score, e.g., "10.50"
+        overall_score_3   # Only numeric score, e.g., "11.00"
+    ])
     
-    # Unpack analysis and raw scores
-    analysis, raw_scores_by_row = analysis_result
+    # Calculate end column (start_col + overall_score + question_count + metadata)
+    # metadata: brief_reason, analyzed_date, client, job_description, overall_score_1, overall_score_2, overall_score_3 = 7 columns
+    end_col = start_col + 1 + question_count + 7 - 1  # -1 because start_col is 1-based
     
-    # Parse analysis and write to each row
-    results = []
-    failed_rows = []
+    start_col_letter = column_index_to_letter(start_col)
+    end_col_letter = column_index_to_letter(end_col)
+    cell_range = f'{start_col_letter}{row_num}:{end_col_letter}{row_num}'
     
+    # Calibrated runs also keep the uncalibrated overall score, after the AI % and Similar To columns.
+    # It goes in the same request - the AI % and Similar To cells in between are left alone
+    raw_overall = raw_scores_by_row.get(row_num_str, {}).get('uncalibrated_overall')
+    if raw_overall is not None:
+        raw_col_letter = column_index_to_letter(start_col + 8 + question_count + 2)
+        worksheet.batch_update([
+            {'range': cell_range, 'values': [values_row]},
+            {'range': f'{raw_col_letter}{row_num}', 'values': [[f"{float(raw_overall):.2f}"]]}
+        ], value_input_option='USER_ENTERED')
+    else:
+        # Use value_input_option='USER_ENTERED' to interpret formulas instead of text
+        worksheet.update(values=[values_row], range_name=cell_range, value_input_option='USER_ENTERED')
+
+def ensure_raw_score_header(worksheet, question_count, start_col=22):
+    """Ensure the 'Raw Overall Score' header (uncalibrated scores) exists after the AI % and Similar To columns"""
+    try:
+        col_index_1based = start_col + 8 + question_count + 2
+        headers_row = worksheet.row_values(1)
+        if col_index_1based - 1 >= len(headers_row) or headers_row[col_index_1based - 1] != 'Raw Overall Score':
+            col_letter = column_index_to_letter(col_index_1based)
+            worksheet.update(values=[['Raw Overall Score']], range_name=f'{col_letter}1', value_input_option='USER_ENTERED')
+            print(f"Added 'Raw Overall Score' header at column {col_letter} (index {col_index_1based})")
+    except Exception as e:
+        print(f"Warning: Could not ensure Raw Overall Score header exists: {e}")
+
+def write_analysis_to_rows(worksheet, applications, analysis, raw_scores_by_row, all_values, client_criteria, client, job_description, question_count):
+    """
+    Parse each application's scores out of the analysis text and write them to its row.
+    Yields ('row', result) or ('row_failed', failure) per application.
+    """
+    if any('uncalibrated_overall' in raw for raw in raw_scores_by_row.values()):
+        ensure_raw_score_header(worksheet, question_count)
     for app in applications:
         row_num = app['row_number']
         scores = extract_scores_for_row(analysis, row_num, all_values, client_criteria)
         
         if scores:
             try:
-                # Start at column V (column 22, index 21)
-                start_col = 22
-                
-                # Build values array: Overall Score, then all Q1-QN scores, then metadata
-                # Ensure overall_score doesn't contain "/max_score" - strip it if present
-                overall_score_value = scores.get('overall_score', '')
-                if isinstance(overall_score_value, str) and '/' in overall_score_value:
-                    overall_score_value = overall_score_value.split('/')[0].strip()
-                
-                values_row = [overall_score_value]
-                
-                # Add all question scores dynamically (Q1, Q2, Q3, Q4, Q5, Q6, Q7, etc.)
-                for q_num in range(1, question_count + 1):
-                    q_key = f'q{q_num}_score'
-                    q_score = scores.get(q_key, 'N/A')
-                    
-                    # Check if it's a Yes/No answer (don't convert to star formula)
-                    if q_score and q_score.upper() in ['YES', 'NO']:
-                        values_row.append(q_score)
-                    else:
-                        # Extract numeric value for star formula (handles decimals)
-                        q_num_val = q_score.replace('*', '') if q_score and q_score != 'N/A' else ''
-                        
-                        # Create formula for star rendering if it's a valid number (integer or decimal)
-                        try:
-                            # Try to convert to float to validate it's a number
-                            float_val = float(q_num_val)
-                            # For display, we'll show the decimal score as text since REPT only works with integers
-                            # We can't use REPT with decimals, so just display the score with a star
-                            q_formula = f'{q_num_val}*'
-                        except (ValueError, TypeError):
-                            q_formula = q_score
-                        
-                        values_row.append(q_formula)
-                
-                # Get the 3 individual overall scores for debugging
-                # IMPORTANT: Only write numeric scores, never the old format
+                write_scores_to_row(worksheet, row_num, scores, raw_scores_by_row, client, job_description, question_count)
                 row_num_str = str(row_num)
-                overall_score_1 = ""
-                overall_score_2 = ""
-                overall_score_3 = ""
-                
-                if row_num_str in raw_scores_by_row:
-                    raw = raw_scores_by_row[row_num_str]
-                    if 'overall' in raw and isinstance(raw['overall'], list):
-                        overall_list = raw['overall']
-                        
-                        # Filter out any non-numeric values
-                        numeric_scores = [s for s in overall_list if isinstance(s, (int, float))]
-                        
-                        # Only write the first 3 numeric scores
-                        if len(numeric_scores) >= 1:
-                            overall_score_1 = f"{float(numeric_scores[0]):.2f}"
-                        if len(numeric_scores) >= 2:
-                            overall_score_2 = f"{float(numeric_scores[1]):.2f}"
-                        if len(numeric_scores) >= 3:
-                            overall_score_3 = f"{float(numeric_scores[2]):.2f}"
-                    else:
-                        print(f"Warning: Row {row_num} - 'overall' not found in raw_scores_by_row or is not a list")
-                        print(f"  Available keys: {list(raw.keys()) if row_num_str in raw_scores_by_row else 'Row not found'}")
-                else:
-                    print(f"Warning: Row {row_num} not found in raw_scores_by_row")
-                    print(f"  Available row numbers: {list(raw_scores_by_row.keys())}")
-                
-                # Add metadata columns
-                values_row.extend([
-                    scores.get('brief_reason', ''),
-                    datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    client,
-                    job_description,
-                    overall_score_1,  # Only numeric score, e.g., "10.00"
-                    overall_score_2,  # Only numeric score, e.g., "10.50"
-                    overall_score_3   # Only numeric score, e.g., "11.00"
-                ])
-                
-                # Calculate end column (start_col + overall_score + question_count + metadata)
-                # metadata: brief_reason, analyzed_date, client, job_description, overall_score_1, overall_score_2, overall_score_3 = 7 columns
-                end_col = start_col + 1 + question_count + 7 - 1  # -1 because start_col is 1-based
-                
-                start_col_letter = column_index_to_letter(start_col)
-                end_col_letter = column_index_to_letter(end_col)
-                cell_range = f'{start_col_letter}{row_num}:{end_col_letter}{row_num}'
-                
-                # Use value_input_option='USER_ENTERED' to interpret formulas instead of text
-                worksheet.update(values=[values_row], range_name=cell_range, value_input_option='USER_ENTERED')
-                results.append({
+                yield 'row', {
                     'row': row_num,
                     'name': f"{app['first_name']} {app['surname']}",
-                    'score': scores.get('overall_score', 'N/A')
-                })
+                    'score': scores.get('overall_score', 'N/A'),
+                    'passes': len(raw_scores_by_row.get(row_num_str, {}).get('overall', []))
+                }
             except Exception as e:
                 print(f"Error writing row {row_num}: {e}")
                 import traceback
                 traceback.print_exc()
-                failed_rows.append({
+                yield 'row_failed', {
                     'row': row_num,
                     'name': f"{app['first_name']} {app['surname']}",
                     'error': str(e)
-                })
+                }
         else:
             # AI didn't generate a score for this row
-            failed_rows.append({
+            yield 'row_failed', {
                 'row': row_num,
                 'name': f"{app['first_name']} {app['surname']}",
                 'error': 'No scores found in AI analysis'
+            }
+
+def score_shard(applications, client, job_description, supporting_references='', run_id=None, deadline=None, scoring_mode=None, calibration_group=None):
+    """
+    Score one shard of applications (all passes) and checkpoint the scores in the run journal.
+    Returns (analysis, raw_scores_by_row, analysis_stats) - analysis is None if every pass failed.
+    """
+    started = time.monotonic()
+    analysis_stats = {}
+    analysis, raw_scores_by_row = analyze_applications_ai(applications, client, job_description, supporting_references, stats=analysis_stats, run_id=run_id, deadline=deadline, scoring_mode=scoring_mode, calibration_group=calibration_group)
+    
+    if analysis and run_id:
+        for row_num_str, raw in raw_scores_by_row.items():
+            journal(run_journal.record_scored, run_id, int(row_num_str), analysis_line_for_row(analysis, row_num_str), raw)
+    
+    # Feed the request-size controller: running out of time counts like a timeout
+    request_batch.record(
+        len(applications),
+        time.monotonic() - started,
+        timed_out=bool(analysis_stats.get('pass_timeouts') or analysis_stats.get('passes_skipped_for_deadline'))
+    )
+    return analysis, raw_scores_by_row, analysis_stats
+
+def write_shard(worksheet, applications, analysis, raw_scores_by_row, analysis_stats, client_criteria, client, job_description, question_count, run_id=None):
+    """
+    Write a scored shard to its rows, or mark every row failed if no pass succeeded.
+    Returns (results, failed_rows).
+    """
+    results = []
+    failed_rows = []
+    
+    if not analysis:
+        # Every pass failed - mark each row individually so the caller can retry just these
+        pass_errors = analysis_stats.get('pass_errors', [])
+        reason = pass_errors[-1]['error'] if pass_errors else 'unknown error'
+        for app in applications:
+            failed_rows.append({
+                'row': app['row_number'],
+                'name': f"{app['first_name']} {app['surname']}",
+                'error': f'Analysis failed - no scoring pass succeeded ({reason})'
             })
+            if run_id:
+                journal(run_journal.record_failed, run_id, app['row_number'], failed_rows[-1]['error'])
+        return results, failed_rows
+    
+    for event, data in write_analysis_to_rows(worksheet, applications, analysis, raw_scores_by_row, [], client_criteria, client, job_description, question_count):
+        if event == 'row':
+            results.append(data)
+            if run_id:
+                journal(run_journal.record_written, run_id, data['row'], data['score'])
+        else:
+            failed_rows.append(data)
+            if run_id:
+                journal(run_journal.record_failed, run_id, data['row'], data['error'])
+    return results, failed_rows
+
+def read_sheet_rows(worksheet, row_numbers):
+    """{row_number: values} for just these rows (columns A-U), in one request"""
+    value_ranges = worksheet.batch_get([f'A{row_num}:U{row_num}' for row_num in row_numbers])
+    return {row_num: (list(value_range[0]) if value_range else []) for row_num, value_range in zip(row_numbers, value_ranges)}
+
+def analyze_and_write_to_sheet(selected_rows, client, job_description, supporting_references='', sheet_id=None, gid=None, run_id=None, deadline=None, scoring_mode=None, shard_size=None, calibration_group=None):
+    """
+    Analyze selected applications and write results back to the spreadsheet.
+    Progress is checkpointed in the run journal (a new run unless `run_id` is given),
+    so an interrupted run can be finished with resume_analysis_run().
+    Without a deadline, selections larger than one shard (`shard_size`, default
+    PIPELINE_SHARD_SIZE; 0 never shards) go through analyze_and_write_pipelined().
+    `calibration_group` (see calibration.new_group()) is given when these rows are one
+    part of a larger selection, so every part is calibrated onto the same anchors.
+    """
+    if run_id is None:
+        run_id = journal(run_journal.create_run, {
+            'client': client,
+            'job_description': job_description,
+            'supporting_references': supporting_references,
+            'sheet_id': sheet_id,
+            'gid': gid,
+            'scoring_mode': scoring_mode or SCORING_MODE,
+            'calibration': calibration_group
+        }, selected_rows)
+    
+    shard_size = PIPELINE_SHARD_SIZE if shard_size is None else shard_size
+    if deadline is None and shard_size and len(selected_rows) > shard_size:
+        return analyze_and_write_pipelined(selected_rows, client, job_description, supporting_references, sheet_id, gid, run_id=run_id, shard_size=shard_size, scoring_mode=scoring_mode, calibration_group=calibration_group)
+    
+    spreadsheet = get_spreadsheet(sheet_id)
+    
+    worksheet = get_worksheet(spreadsheet, gid)
+    
+    print(f"Writing to worksheet: {worksheet.title} (id: {worksheet.id})")
+    
+    # Only the selected rows, not the whole sheet - queue tasks and frontend batches are small
+    rows = read_sheet_rows(worksheet, selected_rows)
+    
+    # Build applications data for selected rows
+    applications = [build_application_from_row(rows[row_num], row_num, sheet_id) for row_num in selected_rows]
+    calibration_group = with_anchor_candidates(calibration_group, worksheet, rows, sheet_id)
+    
+    # Get client criteria for dynamic scoring
+    client_criteria = get_client_criteria_from_sheet(client, sheet_id)
+    
+    # Determine number of questions from client criteria
+    question_count = 3  # default
+    if isinstance(client_criteria, dict) and client_criteria:
+        question_count = len(client_criteria)
+    
+    # Ensure headers exist in the spreadsheet
+    ensure_headers_exist(worksheet, question_count, start_col=22)
+    
+    # Analyze with AI, then parse the analysis and write to each row
+    analysis, raw_scores_by_row, analysis_stats = score_shard(applications, client, job_description, supporting_references, run_id=run_id, deadline=deadline, scoring_mode=scoring_mode, calibration_group=calibration_group)
+    results, failed_rows = write_shard(worksheet, applications, analysis, raw_scores_by_row, analysis_stats, client_criteria, client, job_description, question_count, run_id)
+    
+    if not analysis:
+        if run_id:
+            journal(run_journal.set_run_status, run_id, 'failed')
+        return {
+            'success': True,
+            'run_id': run_id,
+            'analyzed_count': 0,
+            'failed_count': len(failed_rows),
+            'results': results,
+            'failed': failed_rows,
+            'passes_succeeded': 0,
+            'pass_errors': analysis_stats.get('pass_errors', []),
+            'recommended_batch_size': request_batch.recommended()
+        }
+    
+    if run_id:
+        journal(run_journal.set_run_status, run_id, 'completed')
+    
+    return {
+        'success': True,
+        'run_id': run_id,
+        'analyzed_count': len(results),
+        'failed_count': len(failed_rows),
+        'results': results,
+        'failed': failed_rows,
+        'passes_succeeded': analysis_stats.get('passes_succeeded', 0),
+        'passes_skipped_for_deadline': analysis_stats.get('passes_skipped_for_deadline', 0),
+        'pass_errors': analysis_stats.get('pass_errors', []),
+        'rerequests': analysis_stats.get('rerequests', {}),
+        'scoring_mode': analysis_stats.get('scoring_mode'),
+        'logprob': analysis_stats.get('logprob'),
+        'eligibility': analysis_stats.get('eligibility'),
+        'cascade': analysis_stats.get('cascade'),
+        'field_budget': analysis_stats.get('field_budget'),
+        'dedupe': analysis_stats.get('dedupe'),
+        'calibration': analysis_stats.get('calibration'),
+        'recommended_batch_size': request_batch.recommended()
+    }
+
+def plan_shards(applications, client, is_7_question_format, shard_size=None):
+    """
+    Split a selection into pipeline shards of up to `shard_size` candidates to score.
+    Eligibility and duplicate answers are worked out over the whole selection: rows
+    with the same answers go in their representative's shard, so they are still scored
+    once, and rows failing hard eligibility (no model call) go in the first shard.
+    """
+    shard_size = max(1, int(shard_size or PIPELINE_SHARD_SIZE))
+    eligibility_results, skip_ineligible = eligibility.evaluate_applications(applications, client) if is_7_question_format else ({}, False)
+    skipped = [app for app in applications if skip_ineligible and not eligibility_results[str(app['row_number'])]['eligible']]
+    skipped_rows = {app['row_number'] for app in skipped}
+    representatives, duplicate_of = answer_dedupe.group_duplicates([app for app in applications if app['row_number'] not in skipped_rows])
+    apps_by_row = {str(app['row_number']): app for app in applications}
+    duplicates = {}
+    for duplicate_row, representative_row in duplicate_of.items():
+        duplicates.setdefault(representative_row, []).append(apps_by_row[duplicate_row])
+    shards = [
+        [app for representative in shard for app in [representative] + duplicates.get(str(representative['row_number']), [])]
+        for shard in pipeline.shards_of(representatives, shard_size)
+    ]
+    if skipped:
+        shards = [skipped + shards[0]] + shards[1:] if shards else [skipped]
+    return shards
+
+def analyze_and_write_pipelined(selected_rows, client, job_description, supporting_references='', sheet_id=None, gid=None, run_id=None, shard_size=None, scoring_mode=None, calibration_group=None):
+    """
+    analyze_and_write_to_sheet for large selections. The selected rows are read at once
+    and split into shards (see plan_shards()) that flow through two overlapping stages
+    (see pipeline.py) - scoring, PIPELINE_SCORE_WORKERS shards at a time, and writing
+    them back - so earlier shards are written while later ones are being scored.
+    The whole job is one calibration group (`calibration_group`, or the run's own): every
+    shard's calls carry the same anchors and are mapped onto the same reference.
+    """
+    spreadsheet = get_spreadsheet(sheet_id)
+    worksheet = get_worksheet(spreadsheet, gid)
+    client_criteria = get_client_criteria_from_sheet(client, sheet_id)
+    question_count = 3  # default
+    is_7_question_format = False
+    if isinstance(client_criteria, dict) and client_criteria:
+        question_count = len(client_criteria)
+        is_7_question_format = (question_count == 7) or ("Graduate" in client and question_count >= 7)
+    ensure_headers_exist(worksheet, question_count, start_col=22)
+    
+    rows = read_sheet_rows(worksheet, selected_rows)
+    applications = [build_application_from_row(rows[row_num], row_num, sheet_id) for row_num in selected_rows]
+    
+    if calibration_group is None:
+        calibration_group = calibration.new_group(run_id or uuid.uuid4().hex, selected_rows[:calibration.CALIBRATION_ANCHOR_CANDIDATES])
+        if run_id:
+            journal(run_journal.update_run_params, run_id, {'calibration': calibration_group})
+    calibration_group = with_anchor_candidates(calibration_group, worksheet, rows, sheet_id)
+    # Anchors are picked once for the job rather than by every shard
+    calibration_group['anchors'] = calibration_anchors(calibration_group, applications, client, is_7_question_format)
+    
+    shards = plan_shards(applications, client, is_7_question_format, shard_size)
+    print(f"🚰 Pipelining {len(selected_rows)} rows in {len(shards)} shard(s) to worksheet: {worksheet.title} (id: {worksheet.id})")
+    
+    def score_stage(applications):
+        analysis, raw_scores_by_row, analysis_stats = score_shard(applications, client, job_description, supporting_references, run_id=run_id, scoring_mode=scoring_mode, calibration_group=calibration_group)
+        return applications, analysis, raw_scores_by_row, analysis_stats
+    
+    def write_stage(scored):
+        applications, analysis, raw_scores_by_row, analysis_stats = scored
+        results, failed_rows = write_shard(worksheet, applications, analysis, raw_scores_by_row, analysis_stats, client_criteria, client, job_description, question_count, run_id)
+        return results, failed_rows, analysis_stats
+    
+    outputs, pipeline_stats = pipeline.run_pipeline(shards, [('score', score_stage, pipeline.PIPELINE_SCORE_WORKERS), ('write', write_stage)])
+    print(f"🚰 Pipeline done in {pipeline_stats['wall_seconds']}s (stages: {pipeline_stats['stage_seconds']}, {pipeline_stats['sequential_seconds']}s if run one after another)")
+    
+    results = []
+    failed_rows = []
+    pass_errors = []
+    shard_stats = []
+    for shard, output in zip(shards, outputs):
+        shard_rows = [app['row_number'] for app in shard]
+        if isinstance(output, pipeline.StageError):
+            failed_rows.extend({'row': row_num, 'name': '', 'error': f"{output.stage} failed: {output.error}"} for row_num in shard_rows)
+            if run_id:
+                for failure in failed_rows[-len(shard_rows):]:
+                    journal(run_journal.record_failed, run_id, failure['row'], failure['error'])
+            continue
+        shard_results, shard_failed, analysis_stats = output
+        results.extend(shard_results)
+        failed_rows.extend(shard_failed)
+        pass_errors.extend(dict(error, rows=shard_rows) for error in analysis_stats.get('pass_errors', []))
+        shard_stats.append({
+            'rows': shard_rows,
+            'passes_succeeded': analysis_stats.get('passes_succeeded', 0),
+            'rerequests': analysis_stats.get('rerequests', {}),
+            'logprob': analysis_stats.get('logprob'),
+            'eligibility': analysis_stats.get('eligibility'),
+            'cascade': analysis_stats.get('cascade'),
+            'field_budget': analysis_stats.get('field_budget'),
+            'dedupe': analysis_stats.get('dedupe'),
+            'calibration': analysis_stats.get('calibration')
+        })
+    
+    if run_id:
+        journal(run_journal.set_run_status, run_id, 'completed' if results else 'failed')
     
     return {
         'success': True,
+        'run_id': run_id,
         'analyzed_count': len(results),
         'failed_count': len(failed_rows),
         'results': results,
-        'failed': failed_rows
+        'failed': failed_rows,
+        'passes_succeeded': min((shard['passes_succeeded'] for shard in shard_stats), default=0),
+        'passes_skipped_for_deadline': 0,
+        'pass_errors': pass_errors,
+        'scoring_mode': scoring_mode or SCORING_MODE,
+        'shards': shard_stats,
+        'pipeline': pipeline_stats,
+        'recommended_batch_size': request_batch.recommended()
+    }
+
+def analyze_within_deadline(selected_rows, client, job_description, supporting_references='', sheet_id=None, gid=None, time_budget=None, chunk_size=None, scoring_mode=None, calibration_group=None):
+    """
+    Analyze selected rows in chunks within a time budget (for serverless handlers).
+    A chunk is only started if all 3 scoring passes are expected to fit; rows that don't
+    get started are returned with a continuation token the client resubmits.
+    Chunks - including those of continued requests - share one calibration group.
+    """
+    deadline = Deadline(time_budget)
+    chunk_size = max(1, int(chunk_size or DEADLINE_CHUNK_SIZE))
+    chunks = [selected_rows[i:i + chunk_size] for i in range(0, len(selected_rows), chunk_size)]
+    if calibration_group is None and len(chunks) > 1:
+        calibration_group = calibration.new_group(uuid.uuid4().hex, selected_rows[:calibration.CALIBRATION_ANCHOR_CANDIDATES])
+    
+    results = []
+    failed_rows = []
+    run_ids = []
+    passes_skipped = 0
+    remaining_rows = []
+    for index, chunk in enumerate(chunks):
+        # The first chunk always runs so every request makes progress
+        if index > 0 and not deadline.can_start_calls('consensus_scoring', 3):
+            remaining_rows = [row for later in chunks[index:] for row in later]
+            print(f"⏳ Time budget nearly spent ({deadline.remaining():.1f}s left) - deferring {len(remaining_rows)} row(s)")
+            break
+        result = analyze_and_write_to_sheet(chunk, client, job_description, supporting_references, sheet_id, gid, deadline=deadline, scoring_mode=scoring_mode, calibration_group=calibration_group)
+        results.extend(result.get('results', []))
+        failed_rows.extend(result.get('failed', []))
+        run_ids.append(result.get('run_id'))
+        passes_skipped += result.get('passes_skipped_for_deadline', 0)
+    
+    continuation_token = None
+    if remaining_rows:
+        continuation_token = encode_continuation({
+            'kind': 'analyze',
+            'selectedRows': remaining_rows,
+            'client': client,
+            'jobDescription': job_description,
+            'supportingReferences': supporting_references,
+            'sheetId': sheet_id,
+            'gid': gid,
+            'scoringMode': scoring_mode,
+            'calibrationKey': calibration_group['key'],
+            'anchorRows': calibration_group['anchor_rows']
+        })
+    
+    return {
+        'success': True,
+        'run_ids': run_ids,
+        'analyzed_count': len(results),
+        'failed_count': len(failed_rows),
+        'results': results,
+        'failed': failed_rows,
+        'passes_skipped_for_deadline': passes_skipped,
+        'remaining_rows': remaining_rows,
+        'continuation_token': continuation_token,
+        'recommended_batch_size': request_batch.recommended(),
+        'time_budget': deadline.budget,
+        'time_remaining': round(deadline.remaining(), 2)
+    }
+
+def resume_analysis_run(run_id):
+    """
+    Finish an interrupted analysis run from the run journal.
+    Rows already scored are written straight from the journal (no LLM calls); rows that
+    never got scores are re-analyzed, reusing any scoring passes journaled for them.
+    """
+    run = journal(run_journal.get_run, run_id)
+    if not run:
+        return {'error': f'Run "{run_id}" not found'}
+    
+    params = run['params']
+    sheet_id = params.get('sheet_id')
+    rows = run_journal.get_rows(run_id, ('queued', 'scored', 'failed'))
+    rewrite_rows = [r for r in rows if r['analysis_line'] and r['raw_scores']]
+    rerun_rows = [r['row_number'] for r in rows if not (r['analysis_line'] and r['raw_scores'])]
+    print(f"♻️  Resuming run {run_id}: {len(rewrite_rows)} row(s) to write from journal, {len(rerun_rows)} row(s) to re-analyze")
+    
+    results = []
+    failed_rows = []
+    journal(run_journal.set_run_status, run_id, 'running')
+    
+    if rewrite_rows:
+        spreadsheet = get_spreadsheet(sheet_id)
+        worksheet = get_worksheet(spreadsheet, params.get('gid'))
+        all_values = worksheet.get_all_values()
+        client_criteria = get_client_criteria_from_sheet(params['client'], sheet_id)
+        question_count = 3  # default
+        if isinstance(client_criteria, dict) and client_criteria:
+            question_count = len(client_criteria)
+        ensure_headers_exist(worksheet, question_count, start_col=22)
+        
+        applications = [build_application_from_row(all_values[r['row_number'] - 1], r['row_number'], sheet_id) for r in rewrite_rows]
+        analysis = '\n'.join(r['analysis_line'] for r in rewrite_rows)
+        raw_scores_by_row = {str(r['row_number']): r['raw_scores'] for r in rewrite_rows}
+        for event, data in write_analysis_to_rows(worksheet, applications, analysis, raw_scores_by_row, all_values, client_criteria, params['client'], params['job_description'], question_count):
+            if event == 'row':
+                results.append(data)
+                journal(run_journal.record_written, run_id, data['row'], data['score'])
+            else:
+                failed_rows.append(data)
+                journal(run_journal.record_failed, run_id, data['row'], data['error'])
+    
+    rerun_result = {}
+    if rerun_rows:
+        rerun_result = analyze_and_write_to_sheet(
+            rerun_rows,
+            params['client'],
+            params['job_description'],
+            params.get('supporting_references', ''),
+            sheet_id,
+            params.get('gid'),
+            run_id=run_id,
+            # Same mode as the interrupted run, so its journaled pass keys match
+            scoring_mode=params.get('scoring_mode'),
+            calibration_group=params.get('calibration')
+        )
+        results.extend(rerun_result.get('results', []))
+        failed_rows.extend(rerun_result.get('failed', []))
+    
+    journal(run_journal.set_run_status, run_id, 'completed')
+    return {
+        'success': True,
+        'run_id': run_id,
+        'analyzed_count': len(results),
+        'failed_count': len(failed_rows),
+        'results': results,
+        'failed': failed_rows,
+        'written_from_journal': len(rewrite_rows),
+        'reanalyzed_rows': len(rerun_rows),
+        'passes_succeeded': rerun_result.get('passes_succeeded'),
+        'rerequests': rerun_result.get('rerequests', {})
+    }
+
+def stream_analyze_and_write_to_sheet(selected_rows, client, job_description, supporting_references='', sheet_id=None, gid=None, scoring_mode=None, calibration_group=None):
+    """
+    Streaming variant of analyze_and_write_to_sheet - a generator of (event, data) tuples.
+    The first scoring pass is streamed: it is split into calls like any other pass (call
+    batch size, outliers alone, anchors) and the calls are streamed one after another, each
+    candidate's score line parsed as soon as it arrives, written to the sheet and emitted as
+    a 'row' event (final=False, uncalibrated). The remaining consensus passes then run as
+    usual, every pass is calibrated (onto `calibration_group`'s reference if given) and
+    every row is rewritten with the averaged scores ('row' events with final=True).
+    Ends with a 'done' event carrying the same summary as analyze_and_write_to_sheet.
+    Passes and rows are journaled like analyze_and_write_to_sheet's. Only 'consensus'
+    scoring streams - other modes run analyze_and_write_to_sheet and report every row at the end.
+    """
+    scoring_mode = scoring_mode or SCORING_MODE
+    if scoring_mode != 'consensus':
+        # Triage and logprob passes aren't streamed - score as usual, rows come with 'done'
+        yield 'start', {'total': len(selected_rows)}
+        result = analyze_and_write_to_sheet(selected_rows, client, job_description, supporting_references, sheet_id, gid, scoring_mode=scoring_mode, calibration_group=calibration_group)
+        for data in result.get('results', []):
+            yield 'row', dict(data, final=True)
+        for data in result.get('failed', []):
+            yield 'row_failed', data
+        yield 'done', result
+        return
+    
+    run_id = journal(run_journal.create_run, {
+        'client': client,
+        'job_description': job_description,
+        'supporting_references': supporting_references,
+        'sheet_id': sheet_id,
+        'gid': gid,
+        'scoring_mode': scoring_mode,
+        'calibration': calibration_group
+    }, selected_rows)
+    
+    spreadsheet = get_spreadsheet(sheet_id)
+    worksheet = get_worksheet(spreadsheet, gid)
+    print(f"Streaming analysis to worksheet: {worksheet.title} (id: {worksheet.id})")
+    
+    all_values = worksheet.get_all_values()
+    applications = [build_application_from_row(all_values[row_num - 1], row_num, sheet_id) for row_num in selected_rows]
+    apps_by_row = {str(app['row_number']): app for app in applications}
+    
+    client_criteria = get_client_criteria_from_sheet(client, sheet_id)
+    question_count = 3  # default
+    if isinstance(client_criteria, dict) and client_criteria:
+        question_count = len(client_criteria)
+    ensure_headers_exist(worksheet, question_count, start_col=22)
+    
+    eligibility_results, skip_ineligible = eligibility.evaluate_applications(applications, client) if eligibility.uses_local_eligibility(client, client_criteria) else ({}, False)
+    skipped_rows = [row for row, result in eligibility_results.items() if not result['eligible']] if skip_ineligible else []
+    scored_applications = [app for app in applications if str(app['row_number']) not in skipped_rows]
+    scored_applications, duplicate_of = answer_dedupe.group_duplicates(scored_applications)
+    pass_key = run_journal.pass_key_for(app['row_number'] for app in scored_applications)
+    keep_rows = {str(app['row_number']) for app in scored_applications}
+    if calibration_group:
+        calibration_group = with_anchor_candidates(calibration_group, worksheet, {row_num: all_values[row_num - 1] for row_num in calibration_group['anchor_rows'] if row_num <= len(all_values)}, sheet_id)
+        calibration_group['anchors'] = calibration_anchors(calibration_group, applications, client, eligibility.uses_local_eligibility(client, client_criteria))
+        if not calibration_group['anchors']:
+            calibration_group = None
+    anchors = calibration_group['anchors'] if calibration_group else None
+    
+    yield 'start', {'total': len(applications)}
+    
+    def build_messages(apps):
+        return build_scoring_messages(apps, client, job_description, supporting_references, client_criteria)
+    
+    streamed_rows = set()
+    
+    def write_provisional_line(line):
+        """Write a single streamed score line straight to its row; returns a 'row' event or None"""
+        row_match = re.search(r'Row\s+(\d+)', line)
+        if not (row_match and 'Overall Score' in line):
+            return None
+        row_key = row_match.group(1)
+        if row_key not in apps_by_row or row_key in streamed_rows:
+            return None
+        if row_key in eligibility_results:
+            line = eligibility.merge_answers(line, eligibility_results[row_key]['answers'])
+        line_text, line_raw_scores = average_analysis_scores_sheets([line])
+        scores = extract_scores_for_row(line_text, int(row_key), all_values, client_criteria)
+        if not scores:
+            return None
+        app = apps_by_row[row_key]
+        try:
+            write_scores_to_row(worksheet, app['row_number'], scores, line_raw_scores, client, job_description, question_count)
+        except Exception as e:
+            print(f"Error writing streamed row {row_key}: {e}")
+            return None
+        streamed_rows.add(row_key)
+        return 'row', {
+            'row': app['row_number'],
+            'name': f"{app['first_name']} {app['surname']}",
+            'score': scores.get('overall_score', 'N/A'),
+            'final': False
+        }
+    
+    # Pass 1 - streamed, rows are written as soon as their line is complete
+    analyses = []
+    pass_numbers = []
+    pass_errors = []
+    rerequest_stats = {}
+    first_pass_lines = []
+    provider_down = False
+    print(f"\n🔄 Streaming analysis pass 1/3 for {len(scored_applications)} candidates...")
+    # As in run_batched_scoring_pass, extremely long answers get calls of their own
+    outliers = [app for app in scored_applications if field_budget.is_outlier(app)] if len(scored_applications) > 1 else []
+    streamed_applications = [app for app in scored_applications if app not in outliers]
+    if outliers:
+        print(f"  🐘 Scoring rows {[app['row_number'] for app in outliers]} in their own call(s) - answers over {field_budget.OUTLIER_TOKEN_THRESHOLD} tokens")
+    size = call_batch.recommended()
+    anchored = calibration.enabled_for(streamed_applications, size, anchors)
+    if anchored:
+        calls = calibration.anchored_batches(streamed_applications, size, anchors)
+    else:
+        calls = [streamed_applications[i:i + size] for i in range(0, len(streamed_applications), size)]
+    if len(calls) > 1 or anchored:
+        print(f"  📦 Streaming {len(streamed_applications)} candidates in {len(calls)} call(s) of {size}{', each with calibration anchors' if anchored else ''}")
+    
+    def take_lines(text):
+        """Add one call's output to the pass (separated by BATCH_MARKER when anchored); yields provisional 'row' events"""
+        if anchored:
+            first_pass_lines.append(calibration.BATCH_MARKER)
+        for line in text.split('\n'):
+            first_pass_lines.append(line)
+            event = write_provisional_line(line)
+            if event:
+                yield event
+    
+    if scored_applications:
+        try:
+            for call_applications in calls:
+                if anchored:
+                    first_pass_lines.append(calibration.BATCH_MARKER)
+                buffer = ''
+                for delta in stream_chat_completion(
+                    purpose='consensus_scoring',
+                    model="gpt-4o-mini",
+                    messages=build_messages(call_applications),
+                    max_tokens=4000,
+                    temperature=0,
+                    top_p=1
+                ):
+                    buffer += delta
+                    while '\n' in buffer:
+                        line, buffer = buffer.split('\n', 1)
+                        first_pass_lines.append(line)
+                        event = write_provisional_line(line)
+                        if event:
+                            yield event
+                if buffer:
+                    first_pass_lines.append(buffer)
+                    event = write_provisional_line(buffer)
+                    if event:
+                        yield event
+            
+            for app in outliers:
+                yield from take_lines(run_scoring_pass([app], build_messages, rerequest_stats))
+        
+            # Candidates the streamed calls missed (e.g. truncated output) are re-requested in halves
+            missing = [app for app in scored_applications if str(app['row_number']) not in streamed_rows]
+            if missing:
+                yield from take_lines(run_scoring_pass(missing, build_messages, rerequest_stats, depth=1))
+            analyses.append('\n'.join(first_pass_lines))
+            pass_numbers.append(1)
+            if run_id:
+                journal(run_journal.save_pass_output, run_id, pass_key, 1, analyses[-1])
+        except CircuitOpenError as e:
+            print(f"  ❌ Streamed analysis pass 1/3 skipped: {e}")
+            pass_errors.append({'pass': 1, 'error': str(e)})
+            provider_down = True
+        except Exception as e:
+            print(f"  ❌ Streamed analysis pass 1/3 failed: {e}")
+            pass_errors.append({'pass': 1, 'error': str(e)})
+    
+    # Passes 2 and 3 - regular consensus passes
+    for run_num in range(2, 4):
+        if provider_down or not scored_applications:
+            break
+        print(f"  📊 Analysis run {run_num}/3...")
+        try:
+            analyses.append(run_batched_scoring_pass(scored_applications, build_messages, rerequest_stats, anchors))
+            pass_numbers.append(run_num)
+            if run_id:
+                journal(run_journal.save_pass_output, run_id, pass_key, run_num, analyses[-1])
+        except CircuitOpenError as e:
+            print(f"  ❌ Analysis run {run_num}/3 skipped: {e}")
+            pass_errors.append({'pass': run_num, 'error': str(e)})
+            break
+        except Exception as e:
+            print(f"  ❌ Analysis run {run_num}/3 failed: {e}")
+            pass_errors.append({'pass': run_num, 'error': str(e)})
+    
+    analyses, uncalibrated_overall_by_row, calibration_summaries = calibrate_passes(analyses, pass_numbers, calibration_group, keep_rows)
+    
+    results = []
+    failed_rows = []
+    if analyses or not scored_applications:
+        if analyses:
+            print(f"  ✅ Averaging scores from {len(analyses)} successful run(s)...")
+            analysis, raw_scores_by_row = average_analysis_scores_sheets(analyses)
+            for row_num, raw_overall in uncalibrated_overall_by_row.items():
+                if row_num in raw_scores_by_row:
+                    raw_scores_by_row[row_num]['uncalibrated_overall'] = round(raw_overall, 2)
+        else:
+            analysis, raw_scores_by_row = '', {}
+        analysis, raw_scores_by_row = answer_dedupe.expand_analysis(analysis, raw_scores_by_row, duplicate_of)
+        if eligibility_results:
+            analysis, raw_scores_by_row = eligibility.apply_to_analysis(analysis, raw_scores_by_row, eligibility_results, skipped_rows)
+        if run_id:
+            for row_num_str, raw in raw_scores_by_row.items():
+                journal(run_journal.record_scored, run_id, int(row_num_str), analysis_line_for_row(analysis, row_num_str), raw)
+        for event, data in write_analysis_to_rows(worksheet, applications, analysis, raw_scores_by_row, all_values, client_criteria, client, job_description, question_count):
+            if event == 'row':
+                results.append(data)
+                if run_id:
+                    journal(run_journal.record_written, run_id, data['row'], data['score'])
+                yield 'row', dict(data, final=True)
+            else:
+                failed_rows.append(data)
+                if run_id:
+                    journal(run_journal.record_failed, run_id, data['row'], data['error'])
+                yield 'row_failed', data
+    else:
+        reason = pass_errors[-1]['error'] if pass_errors else 'unknown error'
+        for app in applications:
+            failure = {
+                'row': app['row_number'],
+                'name': f"{app['first_name']} {app['surname']}",
+                'error': f'Analysis failed - no scoring pass succeeded ({reason})'
+            }
+            failed_rows.append(failure)
+            if run_id:
+                journal(run_journal.record_failed, run_id, failure['row'], failure['error'])
+            yield 'row_failed', failure
+    
+    if run_id:
+        journal(run_journal.set_run_status, run_id, 'completed' if results else 'failed')
+    yield 'done', {
+        'success': True,
+        'run_id': run_id,
+        'analyzed_count': len(results),
+        'failed_count': len(failed_rows),
+        'results': results,
+        'failed': failed_rows,
+        'passes_succeeded': len(analyses),
+        'pass_errors': pass_errors,
+        'rerequests': {
+            'extra_calls': rerequest_stats.get('extra_calls', 0),
+            'extra_seconds': round(rerequest_stats.get('extra_seconds', 0.0), 2),
+            'rerequested_rows': rerequest_stats.get('rerequested_rows', 0),
+            'truncated_calls': rerequest_stats.get('truncated_calls', 0),
+            'errors': rerequest_stats.get('rerequest_errors', [])
+        },
+        'scoring_mode': scoring_mode,
+        'eligibility': eligibility.summarize(eligibility_results, skipped_rows) if eligibility_results else None,
+        'dedupe': answer_dedupe.summarize(applications, duplicate_of) if duplicate_of else None,
+        'calibration': calibration_summaries or None
     }
 
 def get_clients_list(sheet_id=None):
@@ -671,6 +1396,7 @@ def add_client_to_sheet(client_name, criteria_dict, sheet_id=None):
             value_input_option='USER_ENTERED'
         )
         
+        invalidate_criteria_cache(sheet_id)
         return {'success': True, 'message': f'Client "{client_name}" added successfully'}
     except Exception as e:
         print(f"Error adding client to sheet: {e}")
@@ -702,6 +1428,7 @@ def delete_client_from_sheet(client_name, sheet_id=None):
         # Delete the row
         clients_worksheet.delete_rows(row_to_delete)
         print(f"Deleted client '{client_name}' from row {row_to_delete}")
+        invalidate_criteria_cache(sheet_id)
         
         return {'success': True, 'message': f'Client "{client_name}" deleted successfully'}
     except Exception as e:
@@ -710,31 +1437,71 @@ def delete_client_from_sheet(client_name, sheet_id=None):
         traceback.print_exc()
         return {'error': str(e)}
 
+def load_clients_criteria(sheet_id=None, refresh=False):
+    """
+    {client_name: criteria} for every client on the Clients tab, or None if there is no
+    Clients tab. Served from the criteria cache while it is fresh (younger than
+    CRITERIA_CACHE_SECONDS and loaded at the current criteria stamp) unless `refresh`.
+    """
+    spreadsheet_id = sheet_id or DEFAULT_SPREADSHEET_ID
+    stamp = None
+    if CRITERIA_CACHE_SECONDS > 0:
+        stamp = journal(run_journal.get_stamp, f'criteria:{spreadsheet_id}')
+        with _criteria_cache_lock:
+            cached = _criteria_cache.get(spreadsheet_id)
+        if (cached and not refresh and stamp is not None and cached[1] == stamp
+                and time.monotonic() - cached[0] < CRITERIA_CACHE_SECONDS):
+            return cached[2]
+
+    spreadsheet = get_spreadsheet(sheet_id)
+    try:
+        clients_worksheet = spreadsheet.worksheet('Clients')
+    except:
+        return None
+
+    all_values = clients_worksheet.get_all_values()
+    headers = all_values[0] if all_values else []
+    criteria_by_client = {}
+    for row in all_values[1:]:
+        if row and row[0] not in criteria_by_client:  # first column is Client Name
+            criteria_by_client[row[0]] = {
+                header: row[i] for i, header in enumerate(headers[1:], start=1) if i < len(row) and row[i]
+            }
+    if stamp is not None:
+        with _criteria_cache_lock:
+            _criteria_cache[spreadsheet_id] = (time.monotonic(), stamp, criteria_by_client)
+    return criteria_by_client
+
+def invalidate_criteria_cache(sheet_id=None):
+    """Drop the cached criteria here and, through the stamp, in every other worker"""
+    spreadsheet_id = sheet_id or DEFAULT_SPREADSHEET_ID
+    with _criteria_cache_lock:
+        _criteria_cache.pop(spreadsheet_id, None)
+    journal(run_journal.bump_stamp, f'criteria:{spreadsheet_id}')
+
+def reset_after_fork():
+    """
+    New locks and a gspread HTTP session for a forked worker - the cached criteria and
+    the gspread credentials (with their access token) are kept
+    """
+    global _criteria_cache_lock, _gspread_client_lock, _gspread_client
+    _criteria_cache_lock = threading.Lock()
+    _gspread_client_lock = threading.Lock()
+    if _gspread_client is not None:
+        _gspread_client = gspread.authorize(_gspread_client.http_client.auth)
+
 def get_client_criteria_from_sheet(client_name, sheet_id=None):
     """Get client criteria from the Clients tab in Google Sheets"""
     try:
-        spreadsheet = get_spreadsheet(sheet_id)
-        # Try to get the Clients worksheet
-        try:
-            clients_worksheet = spreadsheet.worksheet('Clients')
-        except:
+        criteria_by_client = load_clients_criteria(sheet_id)
+        if criteria_by_client is not None and client_name not in criteria_by_client:
+            # Possibly added since the cache was filled (e.g. by another worker)
+            criteria_by_client = load_clients_criteria(sheet_id, refresh=True)
+        if criteria_by_client is None:
             print("Warning: 'Clients' tab not found, falling back to JSON")
             return get_client_criteria_from_json(client_name)
-        
-        all_values = clients_worksheet.get_all_values()
-        if not all_values:
-            return None
-        
-        headers = all_values[0]
-        
-        # Find the row for this client
-        for row in all_values[1:]:
-            if row[0] == client_name:  # Assuming first column is Client Name
-                criteria = {}
-                for i, header in enumerate(headers[1:], start=1):  # Skip first column (Client Name)
-                    if i < len(row) and row[i]:
-                        criteria[header] = row[i]
-                return criteria
+        if client_name in criteria_by_client:
+            return dict(criteria_by_client[client_name])
         
         print(f"Warning: Client '{client_name}' not found in Clients tab")
         return None
@@ -754,38 +1521,48 @@ def get_client_criteria_from_json(client_name):
         print(f"Warning: Could not load client criteria from JSON: {e}")
     return None
 
-def analyze_applications_ai(applications, client, job_description, supporting_references=''):
-    """Analyze applications using OpenAI"""
-    
-    # Load client criteria from Google Sheets (with JSON fallback)
-    sheet_id = applications[0].get('sheet_id') if applications else None
-    client_criteria = get_client_criteria_from_sheet(client, sheet_id)
+def build_scoring_messages(applications, client, job_description, supporting_references, client_criteria, with_reasons=True):
+    """
+    Build the system + user messages for one scoring call over `applications`.
+    With `with_reasons=False` the model is asked for the score line only (cascade triage).
+    """
+    # In the 7-question format the Yes/No questions are answered locally (see eligibility.py)
+    local_eligibility = eligibility.uses_local_eligibility(client, client_criteria)
+    local_questions = {f"Question {question[1:]}" for question in eligibility.DEFAULT_RULES} if local_eligibility else set()
     
     criteria_text = ""
     if isinstance(client_criteria, dict):
         for question_num, criteria in client_criteria.items():
-            criteria_text += f"\n{question_num}:\n{criteria}\n"
+            if question_num not in local_questions:
+                criteria_text += f"\n{question_num}:\n{criteria}\n"
     else:
         criteria_text = client_criteria if client_criteria else 'No specific criteria provided'
     
     supporting_text = f"\n\nSupporting References:\n{supporting_references}" if supporting_references else ""
     
-    # Format applications with row numbers - include Yes/No fields
+    # Format applications with row numbers - include Yes/No fields unless they're answered locally
+    # Oversized free-text answers are trimmed to their token budget (see field_budget.py)
     apps_formatted = []
     for app in applications:
+        app, _ = field_budget.budget_application(app)
         app_data = {
             'Row': app['row_number'],
             'Name': f"{app['first_name']} {app['surname']}",
             'University': app['university'],
-            'Course': app['course'],
-            'Right_to_work_UK': app.get('right_to_work', ''),
-            'Visa_sponsorship_required': app.get('visa_sponsorship', ''),
-            'GCSE_Maths_grade': app.get('gcse_maths', ''),
-            'Available_Sept_2026': app.get('available_sept_2026', ''),
+            'Course': app['course']
+        }
+        if not local_eligibility:
+            app_data.update({
+                'Right_to_work_UK': app.get('right_to_work', ''),
+                'Visa_sponsorship_required': app.get('visa_sponsorship', ''),
+                'GCSE_Maths_grade': app.get('gcse_maths', ''),
+                'Available_Sept_2026': app.get('available_sept_2026', '')
+            })
+        app_data.update({
             'Understanding_of_role': app.get('understanding_of_role', ''),
             'Why_EDF': app.get('why_edf', ''),
             'What_stands_out': app.get('what_stands_out', '')
-        }
+        })
         apps_formatted.append(app_data)
     
     # Determine number of questions and format type
@@ -800,50 +1577,21 @@ def analyze_applications_ai(applications, client, job_description, supporting_re
     # IMPORTANT: Use the actual criteria from the Clients tab
     scoring_criteria = ""
     
-    # Log what criteria we're using for verification
-    print(f"\n{'='*80}")
-    print(f"📋 CLIENT CRITERIA VERIFICATION for {client}")
-    print(f"{'='*80}")
-    if isinstance(client_criteria, dict) and client_criteria:
-        print(f"✅ Loaded {len(client_criteria)} questions from Clients tab:")
-        for q_num, q_criteria in sorted(client_criteria.items()):
-            print(f"  {q_num}: {q_criteria[:150]}{'...' if len(q_criteria) > 150 else ''}")
-        print(f"\n📊 How these criteria will be used:")
-        if is_7_question_format:
-            print(f"  - Q1, Q2, Q3, Q5: Yes/No questions (from application data)")
-            print(f"  - Q4: Scored against '{client_criteria.get('Question 4', 'N/A')[:80]}...'")
-            print(f"  - Q6: Scored against '{client_criteria.get('Question 6', 'N/A')[:80]}...'")
-            print(f"  - Q7: Scored against '{client_criteria.get('Question 7', 'N/A')[:80]}...'")
-        else:
-            for i, (q_num, q_criteria) in enumerate(sorted(client_criteria.items()), start=1):
-                print(f"  - Q{i}: Scored against '{q_criteria[:80]}...'")
-    else:
-        print(f"⚠️  No criteria found - using defaults")
-    print(f"{'='*80}\n")
-    
     if is_7_question_format:
-        # 7-question format: Q1-Q3 and Q5 are Yes/No, Q4/Q6/Q7 are scored
+        # 7-question format: Q1-Q3 and Q5 are Yes/No (answered locally), Q4/Q6/Q7 are scored
         # Map client criteria to questions (Question 1, Question 2, etc. from Clients tab)
-        q1_criteria = client_criteria.get('Question 1', '') if isinstance(client_criteria, dict) else ''
-        q2_criteria = client_criteria.get('Question 2', '') if isinstance(client_criteria, dict) else ''
-        q3_criteria = client_criteria.get('Question 3', '') if isinstance(client_criteria, dict) else ''
         q4_criteria = client_criteria.get('Question 4', '') if isinstance(client_criteria, dict) else ''
-        q5_criteria = client_criteria.get('Question 5', '') if isinstance(client_criteria, dict) else ''
         q6_criteria = client_criteria.get('Question 6', '') if isinstance(client_criteria, dict) else ''
         q7_criteria = client_criteria.get('Question 7', '') if isinstance(client_criteria, dict) else ''
         
         # Build scoring criteria using ACTUAL criteria from Clients tab
-        scoring_criteria = f"""- Q1: "{q1_criteria if q1_criteria else 'Right to work in the UK'}" (Yes/No - extract from Right_to_work_UK field)
-- Q2: "{q2_criteria if q2_criteria else 'Visa sponsorship required'}" (Yes/No - extract from Visa_sponsorship_required field)
-- Q3: "{q3_criteria if q3_criteria else 'GCSE Maths grade'}" (Yes/No - extract from GCSE_Maths_grade field)
-- Q4: "{q4_criteria if q4_criteria else 'Understanding of role'}" (1.00-5.00 stars with 2 decimal places - score based on Understanding_of_role answer using this criteria: {q4_criteria})
-- Q5: "{q5_criteria if q5_criteria else 'Available from September 2026'}" (Yes/No - extract from Available_Sept_2026 field)
+        scoring_criteria = f"""- Q4: "{q4_criteria if q4_criteria else 'Understanding of role'}" (1.00-5.00 stars with 2 decimal places - score based on Understanding_of_role answer using this criteria: {q4_criteria})
 - Q6: "{q6_criteria if q6_criteria else 'Why EDF Trading'}" (1.00-5.00 stars with 2 decimal places - score based on Why_EDF answer using this criteria: {q6_criteria})
 - Q7: "{q7_criteria if q7_criteria else 'What stands out about position'}" (1.00-5.00 stars with 2 decimal places - score based on What_stands_out answer using this criteria: {q7_criteria})"""
         
         max_score = 15  # Only Q4, Q6, Q7 are scored (3 questions × 5 stars = 15)
-        overall_score_text = "Calculate the OVERALL SCORE as the SUM of Q4, Q6, and Q7 only (max 15 stars). Express as a decimal with 2 decimal places. Q1, Q2, Q3, and Q5 are Yes/No informational questions."
-        score_format = "Q1: Yes/No Q2: Yes/No Q3: Yes/No Q4: [X.XX]* Q5: Yes/No Q6: [X.XX]* Q7: [X.XX]*"
+        overall_score_text = "Calculate the OVERALL SCORE as the SUM of Q4, Q6, and Q7 only (max 15 stars). Express as a decimal with 2 decimal places."
+        score_format = "Q4: [X.XX]* Q6: [X.XX]* Q7: [X.XX]*"
     elif isinstance(client_criteria, dict) and client_criteria:
         question_count = len(client_criteria)
         # Use actual criteria from Clients tab - map Question 1, Question 2, etc. to Q1, Q2, etc.
@@ -864,6 +1612,26 @@ def analyze_applications_ai(applications, client, job_description, supporting_re
         overall_score_text = "Calculate the OVERALL SCORE as the SUM of Q1, Q2, and Q3 (max 15 stars). Express as a decimal with 2 decimal places."
         score_format = "Q1: [X.XX]* Q2: [X.XX]* Q3: [X.XX]*"
 
+    if with_reasons:
+        uniqueness_rules = """🚨 UNIQUENESS CHECK - BEFORE SUBMITTING YOUR ANALYSIS:
+- Review ALL your brief reasons - if any 2 are similar, REWRITE them to be unique
+- Each candidate should have DIFFERENT wording, DIFFERENT focus, DIFFERENT structure
+- NO templates, NO copy-paste, NO generic phrases repeated across candidates
+- Use casual language - contractions, informal words, conversational tone
+- Avoid formal HR-speak like "demonstrates", "exhibits", "aligns with", "however\""""
+        line_format = f'"Row [row_number] - Overall Score **[X.XX]/{max_score}** - {score_format} - [brief reason]"'
+        reason_rules = """🚨 CRITICAL: The [brief reason] MUST be:
+- Maximum 1-2 sentences (20-30 words total)
+- Professional but simple - natural flow, NO question number mentions
+- Examples:
+  * "Has a solid grasp of the role, dives into quantitative aspects. Excited about the hands-on learning and ties in personal growth."
+  * "Shows a general idea of the role but lacks depth. Drawn to the market position but could've tied in more specifics.\""""
+    else:
+        # Triage pass - scores only, the reason is written later for shortlisted candidates
+        uniqueness_rules = ""
+        line_format = f'"Row [row_number] - Overall Score **[X.XX]/{max_score}** - {score_format}"'
+        reason_rules = """🚨 CRITICAL: SCORES ONLY - DO NOT write a reason or any other text after the scores."""
+
     prompt = f"""ANALYZE EACH APPLICATION INDIVIDUALLY FOR {client} USING ONLY THE CLIENT CRITERIA BELOW.
 
 🚨 CRITICAL RULES - FOLLOW EXACTLY:
@@ -880,8 +1648,8 @@ Job Description: {job_description}{supporting_text}
 
 Number of Applications: {len(applications)}
 
-Applications Data:
-{json.dumps(apps_formatted, indent=2)}
+Applications Data {encoding_note()}:
+{encode_records(apps_formatted)}
 
 🎯 MANDATORY CLIENT CRITERIA (SCORE ONLY ON THESE):
 {criteria_text}
@@ -922,34 +1690,22 @@ ALL SCORES MUST BE DECIMAL VALUES WITH 2 DECIMAL PLACES (e.g., 3.25*, 4.75*, 13.
 - If a candidate gives a generic answer, score low (e.g., 2.00-2.50*)
 - If a candidate gives a specific answer, score higher (e.g., 4.00-5.00*)
 
-🚨 UNIQUENESS CHECK - BEFORE SUBMITTING YOUR ANALYSIS:
-- Review ALL your brief reasons - if any 2 are similar, REWRITE them to be unique
-- Each candidate should have DIFFERENT wording, DIFFERENT focus, DIFFERENT structure
-- NO templates, NO copy-paste, NO generic phrases repeated across candidates
-- Use casual language - contractions, informal words, conversational tone
-- Avoid formal HR-speak like "demonstrates", "exhibits", "aligns with", "however"
+{uniqueness_rules}
 
 {"FOR 7-QUESTION FORMAT (Graduate Scheme):" if is_7_question_format else ""}
-{"- Q1, Q2, Q3, and Q5 are Yes/No questions - extract from Right_to_work_UK, Visa_sponsorship_required, GCSE_Maths_grade, and Available_Sept_2026 fields" if is_7_question_format else ""}
+{"- Q1, Q2, Q3, and Q5 (eligibility) are filled in separately - DO NOT output them" if is_7_question_format else ""}
 {"- ONLY Q4, Q6, and Q7 are scored (1.00-5.00 stars with 2 decimal places)" if is_7_question_format else ""}
-{"- DO NOT use brackets around Yes/No answers (write 'Q1: Yes' not 'Q1: [Yes]')" if is_7_question_format else ""}
-{"- DO NOT list Yes/No answers in brief reason - focus on Q4, Q6, Q7 content only" if is_7_question_format else ""}
+{"- DO NOT mention eligibility in brief reason - focus on Q4, Q6, Q7 content only" if is_7_question_format else ""}
 
 For each candidate, provide the format EXACTLY as shown (USE DECIMAL SCORES with 2 decimal places):
-"Row [row_number] - Overall Score **[X.XX]/{max_score}** - {score_format} - [brief reason]"
+{line_format}
 
-🚨 CRITICAL: The [brief reason] MUST be:
-- Maximum 1-2 sentences (20-30 words total)
-- Professional but simple - natural flow, NO question number mentions
-- Examples:
-  * "Has a solid grasp of the role, dives into quantitative aspects. Excited about the hands-on learning and ties in personal growth."
-  * "Shows a general idea of the role but lacks depth. Drawn to the market position but could've tied in more specifics."
+{reason_rules}
 
 REMEMBER: ALL SCORES MUST BE DECIMAL WITH 2 DECIMAL PLACES (e.g., Q4: 3.75* Q6: 4.25* Q7: 4.50* - Overall Score **12.50/15**)
 """
     
-    try:
-        system_content = f"""You are an early careers recruiter analyzing applications for {client}. Write like you're texting a colleague, not writing a formal report.
+    system_content = f"""You are an early careers recruiter analyzing applications for {client}. Write like you're texting a colleague, not writing a formal report.
 
 🚨 CRITICAL RULES - VIOLATION WILL RESULT IN REJECTION:
 
@@ -1029,29 +1785,456 @@ REMEMBER: ALL SCORES MUST BE DECIMAL WITH 2 DECIMAL PLACES (e.g., Q4: 3.75* Q6:
    - ALWAYS use 2 decimal places for ALL scores (e.g., 3.75*, NOT 3*)
    - Overall score must also have 2 decimals (e.g., 12.50/15, NOT 12/15)
    - Examples: Q4: 3.75* Q6: 4.25* Q7: 4.50* - Overall Score **12.50/15**"""
-        
+    
+    if is_7_question_format:
+        system_content += "\n\n9. FOR 7-QUESTION FORMAT:\n   - Q1-Q5 are already displayed separately\n   - Focus your brief reason on role understanding, motivation, and what stands out\n   - Maximum 1-2 sentences (20-30 words)\n   - Natural flow - DO NOT mention question numbers\n   - Example: 'Has a solid grasp of the role, dives into quantitative aspects. Excited about the hands-on learning and ties in personal growth.'\n   - Keep it professional but simple, and unique for each person\n   - REMEMBER: Score Q4, Q6, Q7 with 2 decimal places (e.g., 3.75*, 4.25*, 4.50*)"
+
+    return [
+        {"role": "system", "content": system_content},
+        {"role": "user", "content": prompt}
+    ]
+
+def rows_in_analysis(analysis):
+    """Return the set of row numbers (as strings) that have a score line in the analysis text"""
+    rows = set()
+    for line in analysis.split('\n'):
+        row_match = re.search(r'Row\s+(\d+)', line)
+        if row_match and 'Overall Score' in line:
+            rows.add(row_match.group(1))
+    return rows
+
+def run_scoring_pass(applications, build_messages, stats=None, depth=0):
+    """
+    Run one scoring pass over `applications`, recovering from oversized batches.
+    If the completion is cut off (finish_reason == "length") or some candidates have no
+    score line, the missing subset is split in half and re-requested recursively until
+    every candidate is scored or MAX_BISECT_DEPTH is reached.
+    `build_messages(apps)` returns the chat messages for a subset of applications.
+    Returns the combined analysis text for this pass.
+    """
+    started = time.monotonic()
+    try:
+        response = hedged_chat_completion(
+            purpose='consensus_scoring',
+            model="gpt-4o-mini",
+            messages=build_messages(applications),
+            max_tokens=4000,
+            temperature=0,
+            top_p=1
+        )
+    except Exception as e:
+        if is_timeout_error(e):
+            call_batch.record(len(applications), time.monotonic() - started, timed_out=True)
+        raise
+    choice = response.choices[0]
+    text = choice.message.content or ''
+    truncated = choice.finish_reason == 'length'
+    call_batch.record(len(applications), time.monotonic() - started, truncated=truncated)
+    if truncated:
+        # The last line was cut mid-way, so its scores can't be trusted
+        text = text.rsplit('\n', 1)[0] if '\n' in text else ''
+    
+    if stats is not None and depth > 0:
+        stats['extra_calls'] = stats.get('extra_calls', 0) + 1
+        stats['extra_seconds'] = stats.get('extra_seconds', 0.0) + (time.monotonic() - started)
+    
+    found_rows = rows_in_analysis(text)
+    missing = [app for app in applications if str(app['row_number']) not in found_rows]
+    if not missing:
+        return text
+    
+    if stats is not None:
+        stats['truncated_calls'] = stats.get('truncated_calls', 0) + (1 if truncated else 0)
+    
+    # A single candidate that still can't be scored, or too deep - give up on it
+    if len(applications) == 1 or depth >= MAX_BISECT_DEPTH:
+        print(f"  ⚠️  Giving up on rows {[app['row_number'] for app in missing]} after {depth} re-request level(s)")
+        return text
+    
+    reason = 'truncated output' if truncated else 'rows missing from output'
+    print(f"  ✂️  {reason}: re-requesting {len(missing)} of {len(applications)} candidates in halves (depth {depth + 1})")
+    if stats is not None:
+        stats['rerequested_rows'] = stats.get('rerequested_rows', 0) + len(missing)
+    
+    mid = (len(missing) + 1) // 2
+    halves = [missing[:mid], missing[mid:]] if len(missing) > 1 else [missing]
+    texts = [text]
+    for half in halves:
+        if not half:
+            continue
+        try:
+            texts.append(run_scoring_pass(half, build_messages, stats, depth + 1))
+        except Exception as e:
+            # Keep what this pass already scored; the missing rows are reported per row later
+            print(f"  ❌ Re-request for rows {[app['row_number'] for app in half]} failed: {e}")
+            if stats is not None:
+                stats.setdefault('rerequest_errors', []).append(str(e))
+    return '\n'.join(texts)
+
+def run_batched_scoring_pass(applications, build_messages, stats=None, anchors=None):
+    """
+    Run one scoring pass, splitting the candidates into LLM calls of the adaptive call batch size.
+    Candidates with extremely long answers (field_budget.is_outlier) get a call of their own
+    so they don't slow down or truncate everyone else's.
+    When the pass is split - or `anchors`, a calibration group's anchor applications, are
+    given - every call also scores the same calibration anchors and the output starts with
+    and separates calls by calibration.BATCH_MARKER lines - see calibration.calibrate_pass().
+    """
+    outliers = [app for app in applications if field_budget.is_outlier(app)]
+    if outliers and len(applications) > 1:
+        print(f"  🐘 Scoring rows {[app['row_number'] for app in outliers]} in their own call(s) - answers over {field_budget.OUTLIER_TOKEN_THRESHOLD} tokens")
+        applications = [app for app in applications if not field_budget.is_outlier(app)]
+    else:
+        outliers = []
+    texts = [run_scoring_pass([app], build_messages, stats) for app in outliers]
+    size = call_batch.recommended()
+    anchored = calibration.enabled_for(applications, size, anchors)
+    if anchored:
+        batches = calibration.anchored_batches(applications, size, anchors)
+        print(f"  📦 Splitting {len(applications)} candidates into {len(batches)} call(s) of {size}, each with {len(anchors or applications[:calibration.CALIBRATION_ANCHORS])} calibration anchor(s)")
+    else:
+        batches = [applications[i:i + size] for i in range(0, len(applications), size)]
+        if len(batches) > 1:
+            print(f"  📦 Splitting {len(applications)} candidates into calls of {size}")
+    texts.extend(run_scoring_pass(batch, build_messages, stats) for batch in batches)
+    if not anchored:
+        return '\n'.join(texts)
+    return ''.join(f'{calibration.BATCH_MARKER}\n{text}\n' for text in texts)
+
+def run_logprob_pass(applications, build_messages):
+    """
+    One scoring call with logprobs. Returns (analysis_text, confidence_by_row) where the
+    text has expected scores in place of the sampled ones. Rows missing from the output
+    are simply absent (the caller treats them as low confidence).
+    """
+    response = chat_completion(
+        purpose='logprob_scoring',
+        model="gpt-4o-mini",
+        messages=build_messages(applications),
+        max_tokens=4000,
+        temperature=0,
+        top_p=1,
+        logprobs=True,
+        top_logprobs=LOGPROB_TOP_N
+    )
+    choice = response.choices[0]
+    text = choice.message.content or ''
+    if choice.finish_reason == 'length':
+        # The last line was cut mid-way, so its scores can't be trusted
+        text = text.rsplit('\n', 1)[0] if '\n' in text else ''
+    
+    logprob_content = getattr(choice.logprobs, 'content', None) or []
+    token_logprobs = [
+        (item.token, [(alt.token, alt.logprob) for alt in (item.top_logprobs or [])])
+        for item in logprob_content
+    ]
+    scored = expected_scores_from_logprobs(text, token_logprobs)
+    return '\n'.join(entry['line'] for entry in scored.values()), {row: entry['confidence'] for row, entry in scored.items()}
+
+def run_triage_pass(applications, build_messages, stats=None, run_id=None, calibration_group=None):
+    """
+    Cascade triage: one scores-only pass over `applications`, calibrated like the
+    scoring passes (see calibrate_scoring_pass()).
+    Returns (band_applications, triage_only_text, summary): the candidates whose triage
+    score is inside the cascade band (or who got no triage score), and the triage lines -
+    marked as triage only - for everyone else.
+    """
+    triage_key = f"triage:{run_journal.pass_key_for(app['row_number'] for app in applications)}"
+    saved_passes = (journal(run_journal.get_pass_outputs, run_id, triage_key) or {}) if run_id else {}
+    if 1 in saved_passes:
+        print(f"  ♻️  Triage pass restored from run journal")
+        triage_text = saved_passes[1]
+    else:
+        print(f"  🔎 Triage pass (scores only) for {len(applications)} candidate(s)...")
+        triage_text = run_batched_scoring_pass(applications, build_messages, stats, (calibration_group or {}).get('anchors'))
+        if run_id:
+            journal(run_journal.save_pass_output, run_id, triage_key, 1, triage_text)
+    triage_text, _, _ = calibrate_scoring_pass(triage_text, 'triage', calibration_group, {str(app['row_number']) for app in applications})
+    
+    triage_lines = {}
+    for line in triage_text.split('\n'):
+        row_match = re.search(r'Row\s+(\d+)', line)
+        score_match = re.search(r'Overall Score[*\s]+(\d+\.?\d*)/(\d+)', line)
+        if row_match and score_match and int(score_match.group(2)):
+            triage_lines[row_match.group(1)] = (float(score_match.group(1)) / int(score_match.group(2)), line)
+    
+    band_applications = []
+    triage_only_rows = []
+    triage_only_lines = []
+    for app in applications:
+        row_num = str(app['row_number'])
+        if row_num not in triage_lines or CASCADE_BAND_MIN <= triage_lines[row_num][0] <= CASCADE_BAND_MAX:
+            band_applications.append(app)
+        else:
+            # Drop anything the model wrote after the last score and mark the row
+            line = re.sub(r'(\d\*)[^*]*$', r'\1', triage_lines[row_num][1].rstrip())
+            triage_only_rows.append(app['row_number'])
+            triage_only_lines.append(f"{line} - {CASCADE_TRIAGE_REASON}")
+    
+    print(f"  🎯 {len(band_applications)} candidate(s) in the cascade band get full scoring, {len(triage_only_lines)} triage only")
+    summary = {
+        'band': [CASCADE_BAND_MIN, CASCADE_BAND_MAX],
+        'triaged': len(triage_lines),
+        'full_scoring_rows': [app['row_number'] for app in band_applications],
+        'triage_only_rows': triage_only_rows
+    }
+    return band_applications, '\n'.join(triage_only_lines), summary
+
+def calibration_anchors(calibration_group, applications, client, is_7_question_format):
+    """
+    The anchor applications of a calibration group: the first CALIBRATION_ANCHORS of its
+    candidate rows that get scored - eligible, with answers no earlier candidate shares
+    and not outliers. Every part of the group picks the same ones from the same rows.
+    """
+    candidates = calibration_group.get('candidates')
+    if candidates is None:
+        apps_by_row = {app['row_number']: app for app in applications}
+        candidates = [apps_by_row[row] for row in calibration_group['anchor_rows'] if row in apps_by_row]
+    if is_7_question_format and candidates:
+        eligibility_results, skip_ineligible = eligibility.evaluate_applications(candidates, client)
+        if skip_ineligible:
+            candidates = [app for app in candidates if eligibility_results.get(str(app['row_number']), {}).get('eligible', True)]
+    candidates, _ = answer_dedupe.group_duplicates(candidates)
+    return [app for app in candidates if not field_budget.is_outlier(app)][:calibration.CALIBRATION_ANCHORS]
+
+def calibrate_scoring_pass(pass_output, pass_id, calibration_group=None, keep_rows=None):
+    """
+    calibration.calibrate_pass() for one pass. In a calibration group the first part to
+    score pass `pass_id` fixes the anchor reference (in the run journal) and every part
+    is mapped onto it; anchor lines of rows outside `keep_rows` are dropped.
+    """
+    reference_lines = None
+    if calibration_group and calibration.BATCH_MARKER in pass_output:
+        lines = calibration.anchor_lines(pass_output, [app['row_number'] for app in calibration_group['anchors']])
+        if lines:
+            reference_lines = journal(run_journal.claim_calibration_reference, calibration_group['key'], str(pass_id), lines)
+    return calibration.calibrate_pass(pass_output, reference_lines, keep_rows)
+
+def calibrate_passes(analyses, pass_numbers, calibration_group=None, keep_rows=None):
+    """
+    calibrate_scoring_pass() for every pass. Returns (analyses, uncalibrated_overall_by_row,
+    summaries) - the average uncalibrated overall score per row only if a pass was calibrated.
+    """
+    calibrated = []
+    raw_overall_runs = []
+    summaries = []
+    for pass_output, pass_number in zip(analyses, pass_numbers):
+        text, raw_overall, summary = calibrate_scoring_pass(pass_output, pass_number, calibration_group, keep_rows)
+        calibrated.append(text)
+        raw_overall_runs.append(raw_overall if summary else None)
+        if summary:
+            summaries.append(summary)
+    uncalibrated_overall_by_row = calibration.uncalibrated_overall(analyses, raw_overall_runs) if summaries else {}
+    if summaries:
+        print(f"  📐 Calibrated {len(summaries)} pass(es) on anchor rows {summaries[0]['anchor_rows']}{' (group ' + calibration_group['key'] + ')' if calibration_group else ''}")
+    return calibrated, uncalibrated_overall_by_row, summaries
+
+def with_anchor_candidates(calibration_group, worksheet, rows, sheet_id=None):
+    """`calibration_group` with its candidate anchor applications, reading rows missing from `rows`"""
+    if not calibration_group:
+        return None
+    missing = [row_num for row_num in calibration_group['anchor_rows'] if row_num not in rows]
+    if missing:
+        rows = dict(rows, **read_sheet_rows(worksheet, missing))
+    candidates = [build_application_from_row(rows[row_num], row_num, sheet_id) for row_num in calibration_group['anchor_rows'] if rows.get(row_num)]
+    return dict(calibration_group, candidates=candidates)
+
+def analyze_applications_ai(applications, client, job_description, supporting_references='', stats=None, run_id=None, deadline=None, scoring_mode=None, calibration_group=None):
+    """
+    Analyze applications using OpenAI.
+    Runs 3 scoring passes and averages whichever passes succeed - a failed pass no
+    longer throws away the others. If `stats` is a dict it is filled with pass counts/errors.
+    In 'logprob' scoring mode the first pass is a single logprob-scored call and passes
+    2-3 only cover candidates whose confidence is below LOGPROB_CONFIDENCE_THRESHOLD.
+    In 'cascade' scoring mode a scores-only triage pass runs first and the 3 passes only
+    cover candidates whose triage score falls inside the cascade band.
+    With a `run_id`, each pass output is saved to the run journal and passes already
+    journaled for the same rows are reused instead of re-requested.
+    With a `deadline`, passes after the first are only started if they can finish in time.
+    With a `calibration_group` (see calibration.new_group()) every pass carries the group's
+    anchors and is calibrated onto the group's reference, so the parts of a selection
+    scored in separate requests share one scale.
+    Returns (analysis_text, raw_scores_by_row), or (None, {}) if every pass failed.
+    """
+    
+    # Load client criteria from Google Sheets (with JSON fallback)
+    sheet_id = applications[0].get('sheet_id') if applications else None
+    client_criteria = get_client_criteria_from_sheet(client, sheet_id)
+    
+    # Determine format type for the verification log
+    is_7_question_format = False
+    if isinstance(client_criteria, dict) and client_criteria:
+        is_7_question_format = (len(client_criteria) == 7) or ("Graduate" in client and len(client_criteria) >= 7)
+    
+    # Log what criteria we're using for verification
+    print(f"\n{'='*80}")
+    print(f"📋 CLIENT CRITERIA VERIFICATION for {client}")
+    print(f"{'='*80}")
+    if isinstance(client_criteria, dict) and client_criteria:
+        print(f"✅ Loaded {len(client_criteria)} questions from Clients tab:")
+        for q_num, q_criteria in sorted(client_criteria.items()):
+            print(f"  {q_num}: {q_criteria[:150]}{'...' if len(q_criteria) > 150 else ''}")
+        print(f"\n📊 How these criteria will be used:")
         if is_7_question_format:
-            system_content += "\n\n9. FOR 7-QUESTION FORMAT:\n   - Q1-Q5 are already displayed separately\n   - Focus your brief reason on role understanding, motivation, and what stands out\n   - Maximum 1-2 sentences (20-30 words)\n   - Natural flow - DO NOT mention question numbers\n   - Example: 'Has a solid grasp of the role, dives into quantitative aspects. Excited about the hands-on learning and ties in personal growth.'\n   - Keep it professional but simple, and unique for each person\n   - REMEMBER: Score Q4, Q6, Q7 with 2 decimal places (e.g., 3.75*, 4.25*, 4.50*)"
-        
+            print(f"  - Q1, Q2, Q3, Q5: Yes/No questions (answered locally from application data)")
+            print(f"  - Q4: Scored against '{client_criteria.get('Question 4', 'N/A')[:80]}...'")
+            print(f"  - Q6: Scored against '{client_criteria.get('Question 6', 'N/A')[:80]}...'")
+            print(f"  - Q7: Scored against '{client_criteria.get('Question 7', 'N/A')[:80]}...'")
+        else:
+            for i, (q_num, q_criteria) in enumerate(sorted(client_criteria.items()), start=1):
+                print(f"  - Q{i}: Scored against '{q_criteria[:80]}...'")
+    else:
+        print(f"⚠️  No criteria found - using defaults")
+    print(f"{'='*80}\n")
+    
+    # Yes/No questions of the 7-question format are answered locally; candidates failing
+    # a hard rule can skip the model entirely
+    eligibility_results, skip_ineligible = eligibility.evaluate_applications(applications, client) if is_7_question_format else ({}, False)
+    skipped_rows = [row for row, result in eligibility_results.items() if not result['eligible']] if skip_ineligible else []
+    scored_applications = [app for app in applications if str(app['row_number']) not in skipped_rows]
+    if skipped_rows:
+        print(f"🚫 {len(skipped_rows)} candidate(s) fail hard eligibility and won't be scored: rows {', '.join(skipped_rows)}")
+    # Candidates with identical answers are scored once
+    scored_applications, duplicate_of = answer_dedupe.group_duplicates(scored_applications)
+    if duplicate_of:
+        print(f"👯 {len(duplicate_of)} candidate(s) have the same answers as another row and reuse its scores: rows {', '.join(duplicate_of)}")
+    budget_summary = field_budget.budget_report(scored_applications)
+    if budget_summary['trimmed']:
+        print(f"✂️  Answers trimmed to {field_budget.FIELD_TOKEN_CAP} tokens for rows {', '.join(budget_summary['trimmed'])}")
+    if calibration_group:
+        if 'anchors' not in calibration_group:
+            calibration_group = dict(calibration_group, anchors=calibration_anchors(calibration_group, applications, client, is_7_question_format))
+        if not calibration_group['anchors']:
+            calibration_group = None
+    keep_rows = {str(app['row_number']) for app in scored_applications}
+
+    try:
         # Run analysis 3 times and average scores for consistency
-        print(f"\n🔄 Running 3 analysis passes for {len(applications)} candidates to ensure scoring consistency...")
+        print(f"\n🔄 Running 3 analysis passes for {len(scored_applications)} candidates to ensure scoring consistency...")
+        def build_messages(apps):
+            return build_scoring_messages(apps, client, job_description, supporting_references, client_criteria)
+        
+        def build_triage_messages(apps):
+            return build_scoring_messages(apps, client, job_description, supporting_references, client_criteria, with_reasons=False)
+        
+        scoring_mode = scoring_mode or SCORING_MODE
         analyses = []
+        # Pass number of each entry of `analyses` - the key of its calibration reference
+        pass_numbers = []
+        pass_errors = []
+        rerequest_stats = {}
+        confidence_by_row = {}
+        triage_only_text = ''
+        cascade_summary = None
+        if scoring_mode == 'cascade' and scored_applications:
+            try:
+                scored_applications, triage_only_text, cascade_summary = run_triage_pass(scored_applications, build_triage_messages, rerequest_stats, run_id, calibration_group)
+            except Exception as e:
+                # Without triage scores everyone gets full scoring
+                print(f"  ❌ Triage pass failed, scoring every candidate in full: {e}")
+                pass_errors.append({'pass': 'triage', 'error': str(e)})
+        pass_key = run_journal.pass_key_for(app['row_number'] for app in scored_applications)
+        if scoring_mode == 'logprob':
+            pass_key = f"logprob:{pass_key}"
+        saved_passes = (journal(run_journal.get_pass_outputs, run_id, pass_key) or {}) if run_id else {}
+        passes_skipped = 0
+        pass_timeouts = 0
+        # Candidates the next pass covers - narrowed to low-confidence rows in logprob mode
+        pass_applications = scored_applications
         for run_num in range(1, 4):
-            print(f"  📊 Analysis run {run_num}/3...")
-            response = openai_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_content},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=4000,
-                temperature=0,
-                top_p=1
-            )
-            analyses.append(response.choices[0].message.content)
-        
-        print("  ✅ Averaging scores from 3 runs...")
-        analysis_text, raw_scores_by_row = average_analysis_scores_sheets(analyses)
+            if not pass_applications:
+                if run_num > 1:
+                    print(f"  ✅ Every candidate scored with confidence >= {LOGPROB_CONFIDENCE_THRESHOLD} - no extra passes needed")
+                break
+            logprob_pass = scoring_mode == 'logprob' and run_num == 1
+            if run_num in saved_passes:
+                print(f"  ♻️  Analysis run {run_num}/3 restored from run journal")
+                pass_output = saved_passes[run_num]
+                if logprob_pass:
+                    saved = json.loads(pass_output)
+                    pass_output, confidence_by_row = saved['text'], saved['confidence']
+                    pass_applications = [app for app in scored_applications if confidence_by_row.get(str(app['row_number']), 0.0) < LOGPROB_CONFIDENCE_THRESHOLD]
+                analyses.append(pass_output)
+                pass_numbers.append(run_num)
+                continue
+            if deadline and analyses and not deadline.can_start_calls('consensus_scoring'):
+                passes_skipped = 4 - run_num
+                print(f"  ⏳ {passes_skipped} analysis run(s) skipped - {deadline.remaining():.1f}s left in time budget")
+                break
+            print(f"  📊 Analysis run {run_num}/3{' (logprob)' if logprob_pass else ''} for {len(pass_applications)} candidate(s)...")
+            try:
+                if logprob_pass:
+                    pass_output, confidence_by_row = run_logprob_pass(scored_applications, build_messages)
+                    pass_applications = [app for app in scored_applications if confidence_by_row.get(str(app['row_number']), 0.0) < LOGPROB_CONFIDENCE_THRESHOLD]
+                    print(f"  🎯 {len(scored_applications) - len(pass_applications)} confident, {len(pass_applications)} need extra passes")
+                    journal_output = json.dumps({'text': pass_output, 'confidence': confidence_by_row})
+                else:
+                    pass_output = run_batched_scoring_pass(pass_applications, build_messages, rerequest_stats, (calibration_group or {}).get('anchors'))
+                    journal_output = pass_output
+                analyses.append(pass_output)
+                pass_numbers.append(run_num)
+                if run_id:
+                    journal(run_journal.save_pass_output, run_id, pass_key, run_num, journal_output)
+            except CircuitOpenError as e:
+                # Provider is down - don't queue up more doomed calls, salvage what we have
+                print(f"  ❌ Analysis run {run_num}/3 skipped: {e}")
+                pass_errors.append({'pass': run_num, 'error': str(e)})
+                break
+            except Exception as e:
+                print(f"  ❌ Analysis run {run_num}/3 failed: {e}")
+                pass_errors.append({'pass': run_num, 'error': str(e)})
+                pass_timeouts += 1 if is_timeout_error(e) else 0
+        
+        if stats is not None:
+            stats['passes_requested'] = 3
+            stats['passes_succeeded'] = len(analyses)
+            stats['pass_errors'] = pass_errors
+            stats['passes_skipped_for_deadline'] = passes_skipped
+            stats['pass_timeouts'] = pass_timeouts
+            stats['scoring_mode'] = scoring_mode
+            if scoring_mode == 'logprob':
+                stats['logprob'] = {
+                    'threshold': LOGPROB_CONFIDENCE_THRESHOLD,
+                    'confident_rows': sum(1 for c in confidence_by_row.values() if c >= LOGPROB_CONFIDENCE_THRESHOLD),
+                    'fallback_rows': len(scored_applications) - sum(1 for c in confidence_by_row.values() if c >= LOGPROB_CONFIDENCE_THRESHOLD),
+                    'confidence': confidence_by_row
+                }
+            stats['rerequests'] = {
+                'extra_calls': rerequest_stats.get('extra_calls', 0),
+                'extra_seconds': round(rerequest_stats.get('extra_seconds', 0.0), 2),
+                'rerequested_rows': rerequest_stats.get('rerequested_rows', 0),
+                'truncated_calls': rerequest_stats.get('truncated_calls', 0),
+                'errors': rerequest_stats.get('rerequest_errors', [])
+            }
+            stats['eligibility'] = eligibility.summarize(eligibility_results, skipped_rows) if eligibility_results else None
+            stats['cascade'] = cascade_summary
+            stats['field_budget'] = budget_summary
+            stats['dedupe'] = answer_dedupe.summarize(applications, duplicate_of) if duplicate_of else None
+        
+        if not analyses and scored_applications:
+            print("  ❌ No analysis pass succeeded")
+            return None, {}
+        
+        # Passes split over several calls (or part of a calibration group) are calibrated onto a common scale
+        analyses, uncalibrated_overall_by_row, calibration_summaries = calibrate_passes(analyses, pass_numbers, calibration_group, keep_rows)
+        if stats is not None:
+            stats['calibration'] = calibration_summaries or None
+        
+        if analyses:
+            print(f"  ✅ Averaging scores from {len(analyses)} successful run(s)...")
+            analysis_text, raw_scores_by_row = average_analysis_scores_sheets(analyses)
+            for row_num, raw_overall in uncalibrated_overall_by_row.items():
+                if row_num in raw_scores_by_row:
+                    raw_scores_by_row[row_num]['uncalibrated_overall'] = round(raw_overall, 2)
+        else:
+            analysis_text, raw_scores_by_row = '', {}
+        if triage_only_text:
+            triage_analysis, triage_raw_scores = average_analysis_scores_sheets([triage_only_text])
+            analysis_text = '\n'.join(part for part in (analysis_text, triage_analysis) if part)
+            raw_scores_by_row.update(triage_raw_scores)
+        analysis_text, raw_scores_by_row = answer_dedupe.expand_analysis(analysis_text, raw_scores_by_row, duplicate_of)
+        if eligibility_results:
+            analysis_text, raw_scores_by_row = eligibility.apply_to_analysis(analysis_text, raw_scores_by_row, eligibility_results, skipped_rows)
         
         # Debug: Save a snippet of the analysis to see the format
         print(f"\n{'='*80}")
@@ -1242,7 +2425,7 @@ def extract_scores_for_row(analysis, row_number, all_values, client_criteria=Non
     return None
 
 def ensure_ai_column_header(worksheet, start_col=22, question_count=7):
-    """Ensure 'AI %' header exists in row 1 after all analysis columns"""
+    """Ensure the 'AI %' and 'Similar To' headers exist in row 1 after all analysis columns"""
     try:
         all_values = worksheet.get_all_values()
         headers_row = all_values[0] if all_values else []
@@ -1258,6 +2441,10 @@ def ensure_ai_column_header(worksheet, start_col=22, question_count=7):
             col_letter = column_index_to_letter(ai_col_index_1based)
             worksheet.update(values=[['AI %']], range_name=f'{col_letter}1', value_input_option='USER_ENTERED')
             print(f"Added 'AI %' header at column {col_letter} (index {ai_col_index_1based})")
+        if ai_col_index_0based + 1 >= len(headers_row) or headers_row[ai_col_index_0based + 1] != 'Similar To':
+            col_letter = column_index_to_letter(ai_col_index_1based + 1)
+            worksheet.update(values=[['Similar To']], range_name=f'{col_letter}1', value_input_option='USER_ENTERED')
+            print(f"Added 'Similar To' header at column {col_letter} (index {ai_col_index_1based + 1})")
     except Exception as e:
         print(f"Warning: Could not ensure AI % header exists: {e}")
 
@@ -1286,7 +2473,8 @@ If the text seems likely AI-generated, return a high number (70-100).
 If uncertain, return a middle number (40-60).
 """
         
-        response = openai_client.chat.completions.create(
+        response = hedged_chat_completion(
+            purpose='ai_detection',
             model="gpt-4o-mini",  # Using gpt-4o-mini for cost efficiency
             messages=[
                 {"role": "system", "content": "You are an expert at detecting AI-generated text. Respond with only a number between 0-100 representing AI probability percentage."},
@@ -1319,6 +2507,28 @@ If uncertain, return a middle number (40-60).
         print(f"Error in detect_ai_percentage_chunk: {e}")
         return None
 
+def split_ai_detection_chunks(text, split_type='sentence'):
+    """Split text into the chunks AI detection scores one call at a time (TypeTruth's approach)"""
+    if split_type == 'sentence':
+        # Split by sentences (period followed by space or newline)
+        chunks = re.split(r'[.!?]+\s+', text)
+        # Filter out empty chunks and very short chunks
+        chunks = [chunk.strip() + '.' for chunk in chunks if chunk.strip() and len(chunk.strip()) > 10]
+    elif split_type == 'paragraph':
+        # Split by paragraphs (double newlines or single newlines)
+        chunks = re.split(r'\n\s*\n+', text)
+        # Filter out empty chunks
+        chunks = [chunk.strip() for chunk in chunks if chunk.strip()]
+    else:
+        # Default to sentence splitting
+        chunks = re.split(r'[.!?]+\s+', text)
+        chunks = [chunk.strip() + '.' for chunk in chunks if chunk.strip() and len(chunk.strip()) > 10]
+    
+    if not chunks:
+        # If no chunks found, analyze the whole text as one chunk
+        chunks = [text.strip()]
+    return chunks
+
 def detect_ai_percentage_with_gpt4(text, split_type='sentence'):
     """
     Use GPT-4 to detect AI-generated text using TypeTruth's chunking approach
@@ -1339,25 +2549,7 @@ def detect_ai_percentage_with_gpt4(text, split_type='sentence'):
             print(f"Warning: Text too short for AI detection ({len(text) if text else 0} chars)")
             return None
         
-        # Split text into chunks based on split_type (following TypeTruth's approach)
-        if split_type == 'sentence':
-            # Split by sentences (period followed by space or newline)
-            chunks = re.split(r'[.!?]+\s+', text)
-            # Filter out empty chunks and very short chunks
-            chunks = [chunk.strip() + '.' for chunk in chunks if chunk.strip() and len(chunk.strip()) > 10]
-        elif split_type == 'paragraph':
-            # Split by paragraphs (double newlines or single newlines)
-            chunks = re.split(r'\n\s*\n+', text)
-            # Filter out empty chunks
-            chunks = [chunk.strip() for chunk in chunks if chunk.strip()]
-        else:
-            # Default to sentence splitting
-            chunks = re.split(r'[.!?]+\s+', text)
-            chunks = [chunk.strip() + '.' for chunk in chunks if chunk.strip() and len(chunk.strip()) > 10]
-        
-        if not chunks:
-            # If no chunks found, analyze the whole text as one chunk
-            chunks = [text.strip()]
+        chunks = split_ai_detection_chunks(text, split_type)
         
         print(f"Analyzing {len(chunks)} chunk(s) using {split_type} splitting...")
         
@@ -1392,30 +2584,17 @@ def detect_ai_percentage_with_gpt4(text, split_type='sentence'):
         traceback.print_exc()
         return None
 
-def detect_ai_and_write_to_sheet(selected_rows, sheet_id=None, gid=None):
+def detect_ai_and_write_to_sheet(selected_rows, sheet_id=None, gid=None, deadline=None):
     """
     Run AI detection on selected analyzed applications and write AI % to Google Sheets
     Uses GPT-4 to detect AI-generated text instead of deprecated TypeTruth API
+    With a `deadline`, a row is only started if its chunk calls are expected to finish in
+    time; the rest are returned as `remaining_rows` with a continuation token.
     """
     try:
         spreadsheet = get_spreadsheet(sheet_id)
         
-        # Get worksheet by gid if provided, otherwise use first sheet
-        if gid:
-            try:
-                worksheet = None
-                for sheet in spreadsheet.worksheets():
-                    if str(sheet.id) == str(gid):
-                        worksheet = sheet
-                        break
-                if not worksheet:
-                    print(f"Warning: Worksheet with gid={gid} not found, using first sheet")
-                    worksheet = spreadsheet.get_worksheet(0)
-            except Exception as e:
-                print(f"Error finding worksheet by gid: {e}, using first sheet")
-                worksheet = spreadsheet.get_worksheet(0)
-        else:
-            worksheet = spreadsheet.get_worksheet(0)
+        worksheet = get_worksheet(spreadsheet, gid)
         
         print(f"Running AI detection on worksheet: {worksheet.title} (id: {worksheet.id})")
         
@@ -1443,12 +2622,22 @@ def detect_ai_and_write_to_sheet(selected_rows, sheet_id=None, gid=None):
         # Calculate AI % column position
         ai_col_index_1based = 22 + 8 + question_count  # start_col + overall_score + question_count + metadata
         ai_col_letter = column_index_to_letter(ai_col_index_1based)
+        # Nearest near-duplicate candidate goes in the column after AI %
+        similar_col_letter = column_index_to_letter(ai_col_index_1based + 1)
+        sheet_key = similarity_index.sheet_key_for(sheet_id, gid)
+        try:
+            similarity_index.index_rows(sheet_key, {row_idx: row for row_idx, row in enumerate(all_values[1:], start=2) if row}, full_sheet=True)
+            nearest = similarity_index.nearest_similar(sheet_key, selected_rows)
+        except Exception as e:
+            print(f"Warning: Could not update similarity index: {e}")
+            nearest = {}
         
         results = []
         failed_rows = []
+        remaining_rows = []
         
         # Process each selected row
-        for row_num in selected_rows:
+        for index, row_num in enumerate(selected_rows):
             try:
                 row = all_values[row_num - 1]  # Convert to 0-indexed
                 
@@ -1460,6 +2649,12 @@ def detect_ai_and_write_to_sheet(selected_rows, sheet_id=None, gid=None):
                 # Combine all text answers
                 combined_text = f"{understanding_of_role}\n\n{why_edf}\n\n{what_stands_out}".strip()
                 
+                # One call per sentence chunk - stop before a row that can't finish in time
+                if deadline and index > 0 and not deadline.can_start_calls('ai_detection', len(split_ai_detection_chunks(combined_text))):
+                    remaining_rows = list(selected_rows[index:])
+                    print(f"⏳ Time budget nearly spent ({deadline.remaining():.1f}s left) - deferring {len(remaining_rows)} row(s)")
+                    break
+                
                 if not combined_text or len(combined_text) < 50:
                     print(f"Warning: Row {row_num} has insufficient text ({len(combined_text)} chars), skipping")
                     failed_rows.append({
@@ -1481,13 +2676,15 @@ def detect_ai_and_write_to_sheet(selected_rows, sheet_id=None, gid=None):
                     # Format as percentage string
                     ai_percentage_str = f"{ai_percentage:.2f}%"
                     
-                    # Write AI % to sheet
-                    worksheet.update(values=[[ai_percentage_str]], range_name=f'{ai_col_letter}{row_num}', value_input_option='USER_ENTERED')
+                    # Write AI % and the nearest similar candidate to sheet
+                    similar_to = similarity_index.format_similarity(nearest.get(row_num))
+                    worksheet.update(values=[[ai_percentage_str, similar_to]], range_name=f'{ai_col_letter}{row_num}:{similar_col_letter}{row_num}', value_input_option='USER_ENTERED')
                     
                     results.append({
                         'row': row_num,
                         'name': f"{row[2] if len(row) > 2 else ''} {row[3] if len(row) > 3 else ''}",
-                        'ai_percentage': ai_percentage_str
+                        'ai_percentage': ai_percentage_str,
+                        'similar_to': similar_to
                     })
                     
                     print(f"✅ Row {row_num}: AI % = {ai_percentage_str}")
@@ -1512,12 +2709,23 @@ def detect_ai_and_write_to_sheet(selected_rows, sheet_id=None, gid=None):
                     'error': str(e)
                 })
         
+        continuation_token = None
+        if remaining_rows:
+            continuation_token = encode_continuation({
+                'kind': 'ai_detection',
+                'selectedRows': remaining_rows,
+                'sheetId': sheet_id,
+                'gid': gid
+            })
+        
         return {
             'success': True,
             'detected_count': len(results),
             'failed_count': len(failed_rows),
             'results': results,
-            'failed': failed_rows
+            'failed': failed_rows,
+            'remaining_rows': remaining_rows,
+            'continuation_token': continuation_token
         }
         
     except Exception as e:
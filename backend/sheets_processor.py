@@ -6,10 +6,10 @@ Reads applications from Google Sheets and writes AI analysis to a new tab
 
 import gspread
 from google.oauth2.service_account import Credentials
-import os
 import json
 from dotenv import load_dotenv
-import openai
+from llm_gateway import chat_completion
+from prompt_encoding import encode_records, encoding_note
 from datetime import datetime
 
 # Load environment variables
@@ -20,9 +20,6 @@ SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 SPREADSHEET_URL = "https://docs.google.com/spreadsheets/d/1jDJDQXPoZE6NTAqfTaCILv8ULXpM_vl5WeiEVSplChU/edit?gid=0#gid=0"
 SPREADSHEET_ID = "1jDJDQXPoZE6NTAqfTaCILv8ULXpM_vl5WeiEVSplChU"
 
-# OpenAI configuration
-openai.api_key = os.getenv('OPENAI_API_KEY')
-
 # Column mapping based on your headers
 COLUMN_MAPPING = {
     'Form_ID': 0,
@@ -128,8 +125,8 @@ def analyze_applications(applications, client="EDF Trading - Graduate Scheme"):
 
 Number of Applications: {len(applications)}
 
-Applications Data:
-{json.dumps(applications, indent=2)}
+Applications Data {encoding_note()}:
+{encode_records(applications)}
 
 Client Scoring Criteria (7 Questions):
 {criteria_text}
@@ -147,15 +144,12 @@ For each candidate, provide the format EXACTLY as shown (use decimal scores with
 "1. **User [Form_ID] - Overall Score **[X.XX]/15** - Q1: Yes/No Q2: Yes/No Q3: Yes/No Q4: [X.XX]* Q5: Yes/No Q6: [X.XX]* Q7: [X.XX]* - [brief reason]**"
 
 DO NOT use brackets around Yes/No answers (write "Q1: Yes" not "Q1: [Yes]")
-
-After the main analysis, provide detailed reasoning for each user in this format:
-"DETAILED REASONING:
-User [Form_ID]: [Detailed explanation of why they received this score, including specific examples from their answers and how they align with the scoring criteria]"
 """
     
     try:
         print("🤖 Analyzing applications with AI...")
-        response = openai.chat.completions.create(
+        response = chat_completion(
+            purpose='sheets_processor',
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "You are an expert HR analyst for EDF Trading. CRITICAL: Use decimal scores with EXACTLY 2 decimal places (e.g., 3.75*, 4.25*, 12.50/15). Provide clear, actionable insights about job applications."},
@@ -184,15 +178,12 @@ def parse_analysis_to_results(analysis, applications):
         form_id = app.get('Form_ID', '')
         
         # Find the analysis line for this form_id
+        # (detailed reasoning is generated on demand - see reasoning.py)
         user_line = None
-        detailed_reasoning = None
         
-        for i, line in enumerate(lines):
+        for line in lines:
             if f"User {form_id}" in line and "Overall Score" in line:
                 user_line = line
-                
-            if f"User {form_id}:" in line and "DETAILED REASONING" in '\n'.join(lines[:i]):
-                detailed_reasoning = line.replace(f"User {form_id}:", "").strip()
         
         if user_line:
             # Extract scores from the line (with decimal support)
@@ -218,7 +209,6 @@ def parse_analysis_to_results(analysis, applications):
                 'Q6_Why_EDF': f"{q6_score}*",
                 'Q7_What_Stands_Out': f"{q7_score}*",
                 'Brief_Reason': brief_reason,
-                'Detailed_Reasoning': detailed_reasoning or 'N/A',
                 'Analyzed_Date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             })
     
@@ -247,7 +237,6 @@ def write_results_to_sheet(spreadsheet, results):
             'Q6_Why_EDF',
             'Q7_What_Stands_Out',
             'Brief_Reason',
-            'Detailed_Reasoning',
             'Analyzed_Date'
         ]
         
@@ -264,7 +253,7 @@ def write_results_to_sheet(spreadsheet, results):
         print(f"✅ Wrote {len(results)} analyzed results to 'AI Analysis' tab")
         
         # Format the header row (bold)
-        worksheet.format('A1:J1', {
+        worksheet.format('A1:I1', {
             'textFormat': {'bold': True},
             'backgroundColor': {'red': 0.9, 'green': 0.9, 'blue': 0.9}
         })
@@ -315,7 +304,7 @@ def main():
         print("=" * 80)
         print(f"\nProcessed: {len(results)} applications")
         print(f"View results: {SPREADSHEET_URL}")
-        print("Check the 'AI Analysis' tab for detailed scores and reasoning")
+        print("Check the 'AI Analysis' tab for detailed scores")
         print("=" * 80)
     else:
         print("\n❌ Failed to write results")
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate answer index (MinHash + LSH), persisted in SQLite.
+Each row's free-text answers (columns O-Q) become a set of word shingles, summarised
+by a MinHash signature of SIMILARITY_NUM_PERM values. The signature is split into
+SIMILARITY_BANDS bands; rows sharing any band bucket are candidate pairs, and only
+those are compared - so finding a row's nearest neighbour doesn't mean comparing it
+against every other applicant. Rows are (re)indexed only when their answers change,
+so re-reading a sheet just adds the new rows.
+"""
+
+import hashlib
+import os
+import random
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+from answer_dedupe import normalize_answer
+
+# Serverless filesystems are read-only apart from /tmp
+_default_dir = '/tmp' if os.getenv('VERCEL') else os.path.dirname(os.path.abspath(__file__))
+SIMILARITY_INDEX_PATH = os.getenv('SIMILARITY_INDEX_PATH', os.path.join(_default_dir, 'similarity_index.sqlite3'))
+
+SIMILARITY_NUM_PERM = int(os.getenv('SIMILARITY_NUM_PERM', '128'))
+SIMILARITY_BANDS = int(os.getenv('SIMILARITY_BANDS', '32'))
+SIMILARITY_SHINGLE_WORDS = int(os.getenv('SIMILARITY_SHINGLE_WORDS', '3'))
+# Nearest neighbours below this estimated Jaccard similarity are not reported
+SIMILARITY_MIN = float(os.getenv('SIMILARITY_MIN', '0.5'))
+
+# Free-text answer columns O, P, Q
+TEXT_COLUMNS = (14, 15, 16)
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_rng = random.Random(1)  # fixed seed - signatures must be comparable across processes
+_PERM_A = np.array([_rng.randrange(1, _MERSENNE_PRIME) for _ in range(SIMILARITY_NUM_PERM)], dtype=np.uint64)
+_PERM_B = np.array([_rng.randrange(0, _MERSENNE_PRIME) for _ in range(SIMILARITY_NUM_PERM)], dtype=np.uint64)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    sheet_key TEXT NOT NULL,
+    row_number INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    signature BLOB NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (sheet_key, row_number)
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    sheet_key TEXT NOT NULL,
+    band INTEGER NOT NULL,
+    bucket TEXT NOT NULL,
+    row_number INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS buckets_lookup ON buckets (sheet_key, band, bucket);
+CREATE INDEX IF NOT EXISTS buckets_row ON buckets (sheet_key, row_number);
+"""
+
+_initialized = False
+
+
+@contextmanager
+def _db():
+    """Open a connection, commit on success, always close"""
+    global _initialized
+    conn = sqlite3.connect(SIMILARITY_INDEX_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        if not _initialized:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+            _initialized = True
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def sheet_key_for(sheet_id=None, gid=None):
+    return f"{sheet_id or 'default'}:{gid or '0'}"
+
+
+def answer_text(row):
+    """The normalized free-text answers of a sheet row"""
+    return ' '.join(normalize_answer(row[i]) for i in TEXT_COLUMNS if len(row) > i and row[i].strip())
+
+
+def shingles(text):
+    words = text.split()
+    size = SIMILARITY_SHINGLE_WORDS
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash_signature(shingle_set):
+    """MinHash signature (uint64 array) of a set of shingles"""
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=4).digest(), 'little') for s in shingle_set],
+        dtype=np.uint64
+    )
+    # (a * x + b) mod p for every permutation/shingle pair - fits in uint64 as a, x < 2^32
+    permuted = (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _MERSENNE_PRIME
+    return permuted.min(axis=1)
+
+
+def band_buckets(signature):
+    """One bucket id per LSH band"""
+    rows_per_band = len(signature) // SIMILARITY_BANDS
+    return [
+        hashlib.blake2b(signature[band * rows_per_band:(band + 1) * rows_per_band].tobytes(), digest_size=8).hexdigest()
+        for band in range(SIMILARITY_BANDS)
+    ]
+
+
+def estimated_similarity(signature_a, signature_b):
+    """Estimated Jaccard similarity - the share of equal MinHash values"""
+    return float(np.mean(signature_a == signature_b))
+
+
+def index_rows(sheet_key, rows_by_number, full_sheet=False):
+    """
+    Add or refresh rows in the index. `rows_by_number` maps sheet row number -> row values.
+    Rows whose answers haven't changed since they were indexed are skipped, and rows with
+    too little text to shingle are removed. With `full_sheet` the rows are the whole sheet,
+    so indexed rows missing from them (deleted, or shifted up) are removed too.
+    Returns the number of rows (re)indexed.
+    """
+    with _db() as conn:
+        known = {
+            row['row_number']: row['content_hash']
+            for row in conn.execute('SELECT row_number, content_hash FROM documents WHERE sheet_key = ?', (sheet_key,))
+        }
+    updates = []
+    removals = []
+    for row_number, row in rows_by_number.items():
+        text = answer_text(row)
+        content_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        if known.get(row_number) == content_hash:
+            continue
+        shingle_set = shingles(text)
+        if not shingle_set:
+            if row_number in known:
+                removals.append(row_number)
+            continue
+        updates.append((row_number, content_hash, minhash_signature(shingle_set)))
+    if full_sheet:
+        removals.extend(row_number for row_number in known if row_number not in rows_by_number)
+    if not (updates or removals):
+        return 0
+
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    with _db() as conn:
+        for row_number in removals + [update[0] for update in updates]:
+            conn.execute('DELETE FROM buckets WHERE sheet_key = ? AND row_number = ?', (sheet_key, row_number))
+            conn.execute('DELETE FROM documents WHERE sheet_key = ? AND row_number = ?', (sheet_key, row_number))
+        for row_number, content_hash, signature in updates:
+            conn.execute(
+                'INSERT INTO documents (sheet_key, row_number, content_hash, signature, updated_at) VALUES (?, ?, ?, ?, ?)',
+                (sheet_key, row_number, content_hash, signature.tobytes(), now)
+            )
+            conn.executemany(
+                'INSERT INTO buckets (sheet_key, band, bucket, row_number) VALUES (?, ?, ?, ?)',
+                [(sheet_key, band, bucket, row_number) for band, bucket in enumerate(band_buckets(signature))]
+            )
+    print(f"🧬 Similarity index {sheet_key}: {len(updates)} row(s) indexed, {len(removals)} removed")
+    return len(updates)
+
+
+def nearest_similar(sheet_key, row_numbers):
+    """
+    {row_number: {'row': nearest_row, 'similarity': 0.0-1.0}} for each of `row_numbers`
+    whose nearest LSH candidate is at least SIMILARITY_MIN similar.
+    """
+    nearest = {}
+    with _db() as conn:
+        for row_number in row_numbers:
+            own = conn.execute('SELECT signature FROM documents WHERE sheet_key = ? AND row_number = ?', (sheet_key, row_number)).fetchone()
+            if not own:
+                continue
+            signature = np.frombuffer(own['signature'], dtype=np.uint64)
+            candidates = conn.execute(
+                """SELECT DISTINCT d.row_number, d.signature FROM buckets mine
+                   JOIN buckets other ON other.sheet_key = mine.sheet_key AND other.band = mine.band AND other.bucket = mine.bucket
+                   JOIN documents d ON d.sheet_key = other.sheet_key AND d.row_number = other.row_number
+                   WHERE mine.sheet_key = ? AND mine.row_number = ? AND other.row_number != ?""",
+                (sheet_key, row_number, row_number)
+            ).fetchall()
+            best = None
+            for candidate in candidates:
+                similarity = estimated_similarity(signature, np.frombuffer(candidate['signature'], dtype=np.uint64))
+                if best is None or similarity > best['similarity'] or (similarity == best['similarity'] and candidate['row_number'] < best['row']):
+                    best = {'row': candidate['row_number'], 'similarity': round(similarity, 3)}
+            if best and best['similarity'] >= SIMILARITY_MIN:
+                nearest[row_number] = best
+    return nearest
+
+
+def format_similarity(match):
+    """Sheet cell text for a nearest_similar entry"""
+    return f"Row {match['row']} ({match['similarity'] * 100:.0f}%)" if match else ''
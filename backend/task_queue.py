@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Durable task queue (SQLite) for draining large analysis backlogs with a fleet of
+worker processes (see queue_worker.py).
+A task is one batch of sheet rows. Workers lease a task for a visibility timeout and
+keep the lease alive with heartbeats; if a worker dies its lease expires and the task
+becomes visible to other workers again, up to TASK_MAX_ATTEMPTS attempts.
+"""
+
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+import calibration
+
+_default_dir = '/tmp' if os.getenv('VERCEL') else os.path.dirname(os.path.abspath(__file__))
+TASK_QUEUE_PATH = os.getenv('TASK_QUEUE_PATH', os.path.join(_default_dir, 'task_queue.sqlite3'))
+# Rollback journaling works on shared (network) filesystems, WAL only on one host
+TASK_QUEUE_JOURNAL_MODE = os.getenv('TASK_QUEUE_JOURNAL_MODE', 'DELETE').upper()
+
+# Rows per task, lease length (seconds) and attempts before a task is marked failed
+TASK_QUEUE_BATCH_SIZE = int(os.getenv('TASK_QUEUE_BATCH_SIZE', '10'))
+TASK_LEASE_SECONDS = int(os.getenv('TASK_LEASE_SECONDS', '300'))
+TASK_MAX_ATTEMPTS = int(os.getenv('TASK_MAX_ATTEMPTS', '3'))
+
+TASK_STATES = ('pending', 'leased', 'done', 'failed')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    batch_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_expires);
+CREATE INDEX IF NOT EXISTS tasks_batch ON tasks (batch_id);
+"""
+
+_initialized = False
+
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+@contextmanager
+def _db():
+    """
+    Open a connection inside a write transaction (BEGIN IMMEDIATE), so a lease's
+    select-then-update can't race another worker. Commit on success, always close.
+    """
+    global _initialized
+    conn = sqlite3.connect(TASK_QUEUE_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        if not _initialized:
+            conn.execute(f'PRAGMA journal_mode={TASK_QUEUE_JOURNAL_MODE}')
+            conn.executescript(_SCHEMA)
+            _initialized = True
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+    finally:
+        conn.close()
+
+
+def _task_view(row):
+    return {
+        'task_id': row['task_id'],
+        'batch_id': row['batch_id'],
+        'payload': json.loads(row['payload']),
+        'status': row['status'],
+        'attempts': row['attempts'],
+        'lease_owner': row['lease_owner'],
+        'result': json.loads(row['result']) if row['result'] else None,
+        'error': row['error']
+    }
+
+
+def enqueue_analysis(selected_rows, client, job_description, supporting_references='', sheet_id=None, gid=None, batch_size=None):
+    """
+    Split the selected rows into tasks and queue them. Returns {batch_id, tasks}.
+    The tasks of a batch share a calibration group keyed by the batch id.
+    """
+    batch_size = max(1, int(batch_size or TASK_QUEUE_BATCH_SIZE))
+    batch_id = uuid.uuid4().hex
+    now = _now()
+    params = {
+        'client': client,
+        'job_description': job_description,
+        'supporting_references': supporting_references,
+        'sheet_id': sheet_id,
+        'gid': gid
+    }
+    if len(selected_rows) > batch_size:
+        params['calibration'] = calibration.new_group(batch_id, selected_rows[:calibration.CALIBRATION_ANCHOR_CANDIDATES])
+    tasks = []
+    for i in range(0, len(selected_rows), batch_size):
+        payload = dict(params, rows=selected_rows[i:i + batch_size])
+        tasks.append((uuid.uuid4().hex, batch_id, json.dumps(payload), 'pending', TASK_MAX_ATTEMPTS, now, now))
+    with _db() as conn:
+        conn.executemany(
+            'INSERT INTO tasks (task_id, batch_id, payload, status, max_attempts, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            tasks
+        )
+    print(f"📥 Queued batch {batch_id}: {len(selected_rows)} rows in {len(tasks)} task(s) of up to {batch_size}")
+    return {'batch_id': batch_id, 'tasks': len(tasks)}
+
+
+def lease(worker_id, lease_seconds=TASK_LEASE_SECONDS):
+    """
+    Lease the oldest visible task (pending, or leased with an expired lease) for
+    `worker_id`. Expired tasks that are out of attempts are marked failed.
+    Returns the task, or None if nothing is available.
+    """
+    now = time.time()
+    with _db() as conn:
+        conn.execute(
+            "UPDATE tasks SET status = 'failed', error = COALESCE(error, 'Lease expired'), lease_owner = NULL, updated_at = ? "
+            "WHERE status = 'leased' AND lease_expires < ? AND attempts >= max_attempts",
+            (_now(), now)
+        )
+        row = conn.execute(
+            "SELECT * FROM tasks WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+            "ORDER BY created_at, rowid LIMIT 1",
+            (now,)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            "UPDATE tasks SET status = 'leased', attempts = attempts + 1, lease_owner = ?, lease_expires = ?, updated_at = ? WHERE task_id = ?",
+            (worker_id, now + lease_seconds, _now(), row['task_id'])
+        )
+        row = conn.execute('SELECT * FROM tasks WHERE task_id = ?', (row['task_id'],)).fetchone()
+    return _task_view(row)
+
+
+def heartbeat(task_id, worker_id, lease_seconds=TASK_LEASE_SECONDS):
+    """Extend a lease. Returns False if the worker no longer owns the task."""
+    with _db() as conn:
+        cursor = conn.execute(
+            "UPDATE tasks SET lease_expires = ?, updated_at = ? WHERE task_id = ? AND lease_owner = ? AND status = 'leased'",
+            (time.time() + lease_seconds, _now(), task_id, worker_id)
+        )
+        return cursor.rowcount == 1
+
+
+def complete(task_id, worker_id, result):
+    """Mark a leased task done. Returns False if the lease was lost to another worker."""
+    with _db() as conn:
+        cursor = conn.execute(
+            "UPDATE tasks SET status = 'done', result = ?, error = NULL, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE task_id = ? AND lease_owner = ? AND status = 'leased'",
+            (json.dumps(result), _now(), task_id, worker_id)
+        )
+        return cursor.rowcount == 1
+
+
+def fail(task_id, worker_id, error):
+    """Release a leased task after an error: retried later, or failed once out of attempts"""
+    with _db() as conn:
+        cursor = conn.execute(
+            "UPDATE tasks SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END, "
+            "error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE task_id = ? AND lease_owner = ? AND status = 'leased'",
+            (error, _now(), task_id, worker_id)
+        )
+        return cursor.rowcount == 1
+
+
+def batch_status(batch_id):
+    """Return per-state task counts and merged per-row results for a batch, or None if unknown"""
+    with _db() as conn:
+        rows = conn.execute('SELECT * FROM tasks WHERE batch_id = ? ORDER BY created_at, rowid', (batch_id,)).fetchall()
+    if not rows:
+        return None
+    counts = {state: 0 for state in TASK_STATES}
+    results = []
+    failed = []
+    for row in rows:
+        task = _task_view(row)
+        counts[task['status']] += 1
+        if task['status'] == 'done':
+            results.extend(task['result'].get('results', []))
+            failed.extend(task['result'].get('failed', []))
+        elif task['status'] == 'failed':
+            failed.extend({'row': row_num, 'name': '', 'error': task['error']} for row_num in task['payload']['rows'])
+    return {
+        'batch_id': batch_id,
+        'tasks': counts,
+        'finished': counts['pending'] == 0 and counts['leased'] == 0,
+        'analyzed_count': len(results),
+        'failed_count': len(failed),
+        'results': results,
+        'failed': failed
+    }
@@ -0,0 +1,60 @@
+import pytest
+
+import eligibility
+
+
+@pytest.mark.parametrize('value', ['', '  ', 'N/A', 'n/a', 'NA', 'Not applicable', 'unknown', '-'])
+def test_grade_not_answered(value):
+    assert eligibility._grade_answer(value, 4) == 'N/A'
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('9', 'Yes'), ('4', 'Yes'), ('3', 'No'), ('1', 'No'),
+    ('Grade 7', 'Yes'), ('5 (strong pass)', 'Yes'),
+])
+def test_numeric_grades(value, expected):
+    assert eligibility._grade_answer(value, 4) == expected
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('A*', 'Yes'), ('a', 'Yes'), ('B', 'Yes'), ('C', 'Yes'), ('Grade C', 'Yes'),
+    ('D', 'No'), ('U', 'No'),
+])
+def test_letter_grades(value, expected):
+    assert eligibility._grade_answer(value, 4) == expected
+
+
+def test_letter_must_be_whole_value():
+    # The "A" in words is not a grade
+    assert eligibility._grade_answer('Yes, passed', 4) == 'Yes'
+    assert eligibility._grade_answer('No GCSE', 4) == 'No'
+
+
+def test_min_grade_applies():
+    assert eligibility._grade_answer('C', 5) == 'No'
+    assert eligibility._grade_answer('5', 5) == 'Yes'
+
+
+def test_yes_no_not_answered_never_fails():
+    rules = eligibility.DEFAULT_RULES
+    result = eligibility.evaluate_application({'right_to_work': 'N/A', 'visa_sponsorship': 'No', 'gcse_maths': 'N/A', 'available_sept_2026': 'Yes'}, rules)
+    assert result['answers'] == {'Q1': 'N/A', 'Q2': 'No', 'Q3': 'N/A', 'Q5': 'Yes'}
+    assert result['eligible']
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('Yes', 'Yes'), ('y', 'Yes'), ('TRUE', 'Yes'), ('Yes, I have settled status', 'Yes'),
+    ('No', 'No'), ('N', 'No'), ('false', 'No'), ('No - I will need sponsorship', 'No'),
+    ('Not yet - applying', 'N/A'), ('Not sure', 'N/A'), ('Yet to confirm', 'N/A'),
+    ('Nationality pending', 'N/A'), ('Yesterday', 'N/A'),
+])
+def test_yes_no_reads_whole_words(value, expected):
+    assert eligibility._yes_no_answer(value) == expected
+
+
+def test_free_text_never_hard_fails():
+    rules = eligibility.DEFAULT_RULES
+    result = eligibility.evaluate_application({'right_to_work': 'Not yet - applying', 'visa_sponsorship': 'Not sure', 'gcse_maths': '5', 'available_sept_2026': 'Yes'}, rules)
+    assert result['answers']['Q1'] == 'N/A'
+    assert result['answers']['Q2'] == 'N/A'
+    assert result['eligible']
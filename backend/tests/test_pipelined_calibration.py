@@ -0,0 +1,86 @@
+import itertools
+import re
+import threading
+
+import pytest
+
+import run_journal
+import sheets_api
+
+
+def _row(row_num, answer=None):
+    row = [''] * 17
+    row[2], row[3] = f'First{row_num}', 'Surname'
+    row[14] = answer or f'Answer of row {row_num}'
+    return row
+
+
+def _base(row_num):
+    return 1.5 + (row_num % 4) * 0.5
+
+
+@pytest.fixture
+def fake_sheet(monkeypatch, tmp_path):
+    monkeypatch.setattr(run_journal, 'RUN_JOURNAL_PATH', str(tmp_path / 'run_journal.sqlite3'))
+    monkeypatch.setattr(run_journal, '_initialized', False)
+    monkeypatch.setattr(sheets_api, 'get_spreadsheet', lambda sheet_id=None: None)
+    monkeypatch.setattr(sheets_api, 'get_worksheet', lambda spreadsheet, gid=None: type('Worksheet', (), {'title': 'Sheet1', 'id': 0})())
+    monkeypatch.setattr(sheets_api, 'get_client_criteria_from_sheet', lambda client, sheet_id=None: {})
+    monkeypatch.setattr(sheets_api, 'ensure_headers_exist', lambda *args, **kwargs: None)
+    monkeypatch.setattr(sheets_api, 'read_sheet_rows', lambda worksheet, row_numbers: {row_num: _row(row_num) for row_num in row_numbers})
+
+    # Every call scores everyone a different amount too high
+    calls = itertools.count()
+    calls_lock = threading.Lock()
+
+    def fake_scoring_pass(applications, build_messages, stats=None):
+        with calls_lock:
+            bias = next(calls) % 3 * 0.5
+        lines = []
+        for app in applications:
+            scores = [_base(app['row_number']) + bias + step for step in (0.0, 0.5, 1.0)]
+            lines.append(f"Row {app['row_number']} - Overall Score **{sum(scores):.2f}/15** - "
+                         + ' '.join(f"Q{q}: {score:.2f}*" for q, score in enumerate(scores, start=1)))
+        return '\n'.join(lines)
+    monkeypatch.setattr(sheets_api, 'run_scoring_pass', fake_scoring_pass)
+
+    written = []
+    written_lock = threading.Lock()
+
+    def fake_write_shard(worksheet, applications, analysis, raw_scores_by_row, analysis_stats, *args):
+        with written_lock:
+            written.append((applications, analysis, analysis_stats))
+        return [{'row': app['row_number']} for app in applications], []
+    monkeypatch.setattr(sheets_api, 'write_shard', fake_write_shard)
+    return written
+
+
+def test_calibration_runs_across_shards(fake_sheet):
+    selected_rows = list(range(2, 32))
+    result = sheets_api.analyze_and_write_pipelined(selected_rows, 'Client', 'Job', shard_size=10)
+
+    assert result['analyzed_count'] == len(selected_rows)
+    assert len(fake_sheet) == 3
+    overall_by_row = {}
+    for applications, analysis, analysis_stats in fake_sheet:
+        # Every shard is calibrated on the job's anchors, not just the first one
+        assert analysis_stats['calibration']
+        assert {tuple(summary['anchor_rows']) for summary in analysis_stats['calibration']} == {(2, 3)}
+        for row_num, overall in re.findall(r'Row (\d+) - Overall Score \*\*(\d+\.\d+)', analysis):
+            overall_by_row[int(row_num)] = float(overall)
+    assert sorted(overall_by_row) == selected_rows
+
+    # Same answers quality, same score - whichever shard and call a row was scored in
+    for row_num, overall in overall_by_row.items():
+        assert overall == pytest.approx(overall_by_row[2 + (row_num - 2) % 4], abs=0.02)
+
+
+def test_duplicates_share_a_shard():
+    applications = [sheets_api.build_application_from_row(_row(row_num), row_num) for row_num in range(2, 26)]
+    applications.append(sheets_api.build_application_from_row(_row(26, 'Answer of row 3'), 26))
+
+    shards = sheets_api.plan_shards(applications, 'Client', False, shard_size=10)
+
+    assert sum(len(shard) for shard in shards) == len(applications)
+    first_rows = [app['row_number'] for app in shards[0]]
+    assert 3 in first_rows and 26 in first_rows
@@ -19,8 +19,10 @@ function App() {
   const [loadingSheets, setLoadingSheets] = useState(false);
   const [loadingAnalyzed, setLoadingAnalyzed] = useState(false);
   const [activeTab, setActiveTab] = useState('unanalyzed'); // 'unanalyzed' or 'analyzed'
+  const [sortByPrerank, setSortByPrerank] = useState(false);
   const [failedApplications, setFailedApplications] = useState([]);
   const [showFailedModal, setShowFailedModal] = useState(false);
+  const [reasoningModal, setReasoningModal] = useState(null); // {row, name, reasoning, loading, error, cached}
   const [spreadsheetUrl, setSpreadsheetUrl] = useState('https://docs.google.com/spreadsheets/d/1jDJDQXPoZE6NTAqfTaCILv8ULXpM_vl5WeiEVSplChU/edit?gid=0#gid=0');
   const [clients, setClients] = useState([]);
   const [loadingClients, setLoadingClients] = useState(false);
@@ -159,7 +161,8 @@ function App() {
     try {
       // Add cache busting timestamp and gid
       const timestamp = new Date().getTime();
-      const response = await fetch(`${API_URL}/sheets/unanalyzed?sheetId=${sheetId}&gid=${gid}&_t=${timestamp}`, {
+      const clientParam = selectedClient ? `&client=${encodeURIComponent(selectedClient)}` : '';
+      const response = await fetch(`${API_URL}/sheets/unanalyzed?sheetId=${sheetId}&gid=${gid}${clientParam}&_t=${timestamp}`, {
         cache: 'no-store'
       });
       const result = await response.json();
@@ -215,6 +218,27 @@ function App() {
     }
   };
 
+  // Detailed reasoning is generated on demand (then cached server-side) when a recruiter opens a row
+  const openReasoning = async (app) => {
+    const sheetId = extractSheetId(spreadsheetUrl);
+    const gid = extractGid(spreadsheetUrl);
+    const name = `${app.first_name} ${app.surname}`;
+    setReasoningModal({row: app.row_number, name, loading: true});
+    
+    try {
+      const response = await fetch(`${API_URL}/sheets/reasoning?row=${app.row_number}&sheetId=${sheetId}&gid=${gid}`);
+      const result = await response.json();
+      
+      if (result.success) {
+        setReasoningModal({row: app.row_number, name, reasoning: result.reasoning, cached: result.cached});
+      } else {
+        setReasoningModal({row: app.row_number, name, error: result.error});
+      }
+    } catch (error) {
+      setReasoningModal({row: app.row_number, name, error: error.message});
+    }
+  };
+
   const toggleSheetRowSelection = (rowNumber) => {
     if (selectedSheetRows.includes(rowNumber)) {
       setSelectedSheetRows(selectedSheetRows.filter(r => r !== rowNumber));
@@ -325,6 +349,142 @@ function App() {
     }
   };
 
+  // Analyze via the Server-Sent Events endpoint so each candidate shows up as soon as it's scored.
+  // Returns the final summary (same shape as /sheets/analyze), or null if streaming isn't available.
+  const analyzeWithStream = async (rows, sheetId, gid) => {
+    const response = await fetch(`${API_URL}/sheets/analyze/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({
+        selectedRows: rows,
+        client: selectedClient,
+        jobDescription: jobDescription,
+        supportingReferences: supportingReferences,
+        sheetId: sheetId,
+        gid: gid
+      })
+    });
+
+    if (!response.ok || !response.body) {
+      return null;
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let total = rows.length;
+    let provisionalCount = 0;
+    let finalCount = 0;
+    let summary = null;
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const rawEvent = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+
+        let eventName = 'message';
+        let data = '';
+        rawEvent.split('\n').forEach(line => {
+          if (line.startsWith('event: ')) eventName = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        });
+        if (!data) continue;
+        const payload = JSON.parse(data);
+
+        if (eventName === 'start') {
+          total = payload.total || total;
+        } else if (eventName === 'row' && !payload.final) {
+          // First (streamed) pass fills the first half of the progress bar
+          provisionalCount += 1;
+          setProcessingProgress((provisionalCount / total) * 50);
+          addTerminalLog(`  ⚡ Row ${payload.row}: ${payload.name} - ${payload.score} (first pass)`);
+        } else if (eventName === 'row' && payload.final) {
+          finalCount += 1;
+          setProcessingProgress(50 + (finalCount / total) * 50);
+        } else if (eventName === 'done') {
+          summary = payload;
+        } else if (eventName === 'error') {
+          throw new Error(payload.error);
+        }
+      }
+    }
+
+    if (!summary) {
+      throw new Error('Analysis stream ended before completion');
+    }
+    return summary;
+  };
+
+  // Recommended candidates per request from the backend's adaptive batch controller
+  const fetchRecommendedBatchSize = async () => {
+    try {
+      const response = await fetch(`${API_URL}/sheets/batch-size`);
+      if (response.ok) {
+        const result = await response.json();
+        if (result.candidates_per_request) {
+          return result.candidates_per_request;
+        }
+      }
+    } catch (error) {
+      console.error('Batch size lookup failed:', error);
+    }
+    return 10;
+  };
+
+  // Serverless handlers stop starting new work near their time limit and return a
+  // continuation token for the rows they didn't get to - resubmit it until none is left.
+  const followContinuations = async (endpoint, result) => {
+    let merged = result;
+    while (merged.success && merged.continuation_token) {
+      addTerminalLog(`⏳ ${merged.remaining_rows.length} applications deferred by the server time limit, continuing...`);
+      try {
+        const response = await fetch(`${API_URL}${endpoint}`, {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json',
+          },
+          body: JSON.stringify({ continuationToken: merged.continuation_token })
+        });
+
+        if (!response.ok) {
+          throw new Error(`Continuation request failed: ${response.status}`);
+        }
+
+        const next = await response.json();
+        if (!next.success) {
+          throw new Error(next.error || 'Continuation request failed');
+        }
+
+        merged = {
+          ...next,
+          analyzed_count: (merged.analyzed_count || 0) + (next.analyzed_count || 0),
+          detected_count: (merged.detected_count || 0) + (next.detected_count || 0),
+          failed_count: (merged.failed_count || 0) + (next.failed_count || 0),
+          results: [...(merged.results || []), ...(next.results || [])],
+          failed: [...(merged.failed || []), ...(next.failed || [])]
+        };
+      } catch (error) {
+        // Report the deferred rows as failed so they can be retried
+        const deferred = merged.remaining_rows.map(row => ({ row: row, name: '', error: error.message }));
+        merged = {
+          ...merged,
+          failed_count: (merged.failed_count || 0) + deferred.length,
+          failed: [...(merged.failed || []), ...deferred],
+          remaining_rows: [],
+          continuation_token: null
+        };
+      }
+    }
+    return merged;
+  };
+
   const analyzeSelectedSheets = async () => {
     if (selectedSheetRows.length === 0) {
       addTerminalLog('Error: Please select at least one application');
@@ -348,31 +508,31 @@ function App() {
     setProcessingProgress(0);
 
     try {
-      const BATCH_SIZE = 10; // Batch size to avoid serverless timeout
+      // Batch size to avoid serverless timeout - adapted by the backend to observed latency
+      let batchSize = await fetchRecommendedBatchSize();
       const totalApplications = selectedSheetRows.length;
       
-      // Check if we need to batch (10+ applications)
-      if (totalApplications >= BATCH_SIZE) {
-        addTerminalLog(`📦 Batching ${totalApplications} applications into groups of ${BATCH_SIZE} to avoid timeout...`);
-        
-        // Split into batches
-        const batches = [];
-        for (let i = 0; i < selectedSheetRows.length; i += BATCH_SIZE) {
-          batches.push(selectedSheetRows.slice(i, i + BATCH_SIZE));
-        }
-        
-        addTerminalLog(`Created ${batches.length} batches`);
+      // Check if we need to batch
+      if (totalApplications >= batchSize) {
+        addTerminalLog(`📦 Batching ${totalApplications} applications into groups of ${batchSize} to avoid timeout...`);
         
         let totalAnalyzed = 0;
         let allFailedApplications = [];
         
         try {
-          for (let batchIndex = 0; batchIndex < batches.length; batchIndex++) {
-            const batch = batches[batchIndex];
-            const batchNum = batchIndex + 1;
+          // Batches are cut one at a time so each can use the latest recommended size
+          let offset = 0;
+          // Every batch is scored against the same calibration anchors
+          const calibrationKey = `${sheetId}-${gid}-${Date.now()}`;
+          const anchorRows = selectedSheetRows.slice(0, 5);
+          let batchNum = 0;
+          while (offset < selectedSheetRows.length) {
+            const batch = selectedSheetRows.slice(offset, offset + batchSize);
+            offset += batch.length;
+            batchNum += 1;
             
-            addTerminalLog(`\n🔄 Processing batch ${batchNum}/${batches.length} (${batch.length} applications)...`);
-            setProcessingProgress((batchNum / batches.length) * 90);
+            addTerminalLog(`\n🔄 Processing batch ${batchNum} (${batch.length} applications, ${selectedSheetRows.length - offset} left after this)...`);
+            setProcessingProgress((offset / selectedSheetRows.length) * 90);
             
             try {
               const response = await fetch(`${API_URL}/sheets/analyze`, {
@@ -386,7 +546,9 @@ function App() {
                   jobDescription: jobDescription,
                   supportingReferences: supportingReferences,
                   sheetId: sheetId,
-                  gid: gid
+                  gid: gid,
+                  calibrationKey: calibrationKey,
+                  anchorRows: anchorRows
                 })
               });
 
@@ -394,12 +556,17 @@ function App() {
                 throw new Error(`Batch ${batchNum} failed: ${response.status}`);
               }
 
-              const result = await response.json();
+              const result = await followContinuations('/sheets/analyze', await response.json());
               
               if (result.success) {
                 totalAnalyzed += result.analyzed_count;
                 addTerminalLog(`✅ Batch ${batchNum} complete: ${result.analyzed_count} analyzed, ${result.failed_count} failed`);
                 
+                if (result.recommended_batch_size && result.recommended_batch_size !== batchSize) {
+                  batchSize = result.recommended_batch_size;
+                  addTerminalLog(`📐 Batch size adjusted to ${batchSize}`);
+                }
+                
                 // Collect failed applications
                 if (result.failed && result.failed.length > 0) {
                   allFailedApplications = [...allFailedApplications, ...result.failed];
@@ -455,40 +622,46 @@ function App() {
         }
         
       } else {
-        // Single batch (less than 10 applications)
+        // Single batch (fewer applications than the batch size)
         addTerminalLog(`Analyzing ${totalApplications} selected applications...`);
         
         try {
-          const progressInterval = setInterval(() => {
-            setProcessingProgress(prev => {
-              if (prev >= 90) return prev;
-              return prev + Math.random() * 10;
+          let result = await analyzeWithStream(selectedSheetRows, sheetId, gid);
+
+          if (!result) {
+            // Streaming endpoint not available (e.g. serverless deployment) - use the standard request
+            const progressInterval = setInterval(() => {
+              setProcessingProgress(prev => {
+                if (prev >= 90) return prev;
+                return prev + Math.random() * 10;
+              });
+            }, 500);
+
+            const response = await fetch(`${API_URL}/sheets/analyze`, {
+              method: 'POST',
+              headers: {
+                'Content-Type': 'application/json',
+              },
+              body: JSON.stringify({
+                selectedRows: selectedSheetRows,
+                client: selectedClient,
+                jobDescription: jobDescription,
+                supportingReferences: supportingReferences,
+                sheetId: sheetId,
+                gid: gid
+              })
             });
-          }, 500);
-
-          const response = await fetch(`${API_URL}/sheets/analyze`, {
-            method: 'POST',
-            headers: {
-              'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-              selectedRows: selectedSheetRows,
-              client: selectedClient,
-              jobDescription: jobDescription,
-              supportingReferences: supportingReferences,
-              sheetId: sheetId,
-              gid: gid
-            })
-          });
 
-          clearInterval(progressInterval);
-          setProcessingProgress(100);
+            clearInterval(progressInterval);
+
+            if (!response.ok) {
+              throw new Error(`API request failed: ${response.status}`);
+            }
 
-          if (!response.ok) {
-            throw new Error(`API request failed: ${response.status}`);
+            result = await followContinuations('/sheets/analyze', await response.json());
           }
 
-          const result = await response.json();
+          setProcessingProgress(100);
           
           if (result.success) {
             addTerminalLog(`✅ Analysis complete! ${result.analyzed_count} applications analyzed and written to Google Sheets`);
@@ -576,7 +749,7 @@ function App() {
         throw new Error(`API request failed: ${response.status}`);
       }
 
-      const result = await response.json();
+      const result = await followContinuations('/sheets/ai-detection', await response.json());
       
       if (result.success) {
         addTerminalLog(`✅ AI detection complete! ${result.detected_count} applications analyzed and written to Google Sheets`);
@@ -594,7 +767,7 @@ function App() {
         // Show results
         if (result.results && result.results.length > 0) {
           result.results.forEach(res => {
-            addTerminalLog(`  ✅ Row ${res.row}: AI % = ${res.ai_percentage}`);
+            addTerminalLog(`  ✅ Row ${res.row}: AI % = ${res.ai_percentage}${res.similar_to ? ` - similar to ${res.similar_to}` : ''}`);
           });
         }
         
@@ -713,8 +886,16 @@ function App() {
                 >
                   {selectedSheetRows.length === sheetApplications.length ? 'Deselect All' : 'Select All'}
                 </button>
+                {sheetApplications.some(app => app.prerank) && (
+                  <button
+                    onClick={() => setSortByPrerank(!sortByPrerank)}
+                    style={{marginLeft: '10px', padding: '4px 8px', fontSize: '12px'}}
+                  >
+                    {sortByPrerank ? 'Sort by Row' : 'Sort by Pre-rank'}
+                  </button>
+                )}
               </div>
-              {sheetApplications.map(app => (
+              {(sortByPrerank ? [...sheetApplications].sort((a, b) => (a.prerank || Infinity) - (b.prerank || Infinity)) : sheetApplications).map(app => (
                 <div key={app.row_number} style={{display: 'flex', alignItems: 'center', padding: '8px', borderBottom: '1px solid #eee', cursor: 'pointer'}} onClick={() => toggleSheetRowSelection(app.row_number)}>
                   <input
                     type="checkbox" 
@@ -723,8 +904,14 @@ function App() {
                     style={{marginRight: '10px'}}
                   />
                   <div style={{flex: 1}}>
-                    <div style={{fontWeight: 'bold'}}>{app.first_name} {app.surname}</div>
+                    <div style={{fontWeight: 'bold'}}>
+                      {app.first_name} {app.surname}
+                      {app.prerank && <span style={{fontWeight: 'normal', fontSize: '12px', color: '#666', marginLeft: '8px'}}>Pre-rank #{app.prerank}</span>}
+                    </div>
                     <div style={{fontSize: '12px', color: '#666'}}>{app.university} - {app.course}</div>
+                    {app.similar_to_row && (
+                      <div style={{fontSize: '12px', color: '#b45309'}}>Similar answers to row {app.similar_to_row} ({Math.round(app.similarity * 100)}%)</div>
+                    )}
                   </div>
                 </div>
               ))}
@@ -760,6 +947,16 @@ function App() {
                   <div style={{marginLeft: '10px', fontWeight: 'bold', color: '#4285F4', fontSize: '16px'}}>
                     {app.overall_score}
                   </div>
+                  <button
+                    onClick={(e) => {
+                      e.stopPropagation();
+                      openReasoning(app);
+                    }}
+                    style={{marginLeft: '10px', padding: '4px 8px', fontSize: '12px'}}
+                    title="Show detailed reasoning"
+                  >
+                    Reasoning
+                  </button>
                 </div>
               ))}
             </div>
@@ -937,6 +1134,28 @@ function App() {
         </div>
       </div>
 
+      {/* Reasoning Modal */}
+      {reasoningModal && (
+        <div className="modal-overlay" onClick={() => setReasoningModal(null)}>
+          <div className="modal-content" onClick={(e) => e.stopPropagation()} style={{maxWidth: '600px'}}>
+            <div className="modal-header">
+              <h3>Row {reasoningModal.row}: {reasoningModal.name}</h3>
+              <button className="close-button" onClick={() => setReasoningModal(null)}>×</button>
+            </div>
+            
+            <div className="modal-body">
+              {reasoningModal.loading && <p>Generating detailed reasoning...</p>}
+              {reasoningModal.error && <p style={{color: '#dc3545'}}>Error: {reasoningModal.error}</p>}
+              {reasoningModal.reasoning && (
+                <div style={{whiteSpace: 'pre-wrap', maxHeight: '400px', overflowY: 'auto'}}>
+                  {reasoningModal.reasoning}
+                </div>
+              )}
+            </div>
+          </div>
+        </div>
+      )}
+
       {/* Failed Applications Modal */}
       {showFailedModal && (
         <div className="modal-overlay" onClick={() => setShowFailedModal(false)}>